@@ -15,363 +15,1070 @@ import numpy as np
 import datetime as dt
 from datetime import date
 import os
+import json
+from urllib.parse import urlencode
 from dash import dash_table
 from kpi_duck_card import kpi_duck_card
-from duck_card import create_card_A
+from duck_card import duck_card_page, page_count, CARDS_PER_PAGE
+from duck_loader import load_ducks
+from duck_engine import prepare_ducks
+from duck_store import AggregateStore, appended_rows, row_hashes
+from duck_watcher import DatasetWatcher
+from duck_series import PurchaseSeries, GRANULARITIES, ROLLING_WINDOWS
+from duck_table import TableIndex, TABLE_COLUMNS, PAGE_SIZE
+from figure_registry import FigureRegistry
+from duck_geo import GeoClusters, GeoIndex, cell_for_scale, circle_points, grid_clusters, CLUSTER_MIN_POINTS
+from duck_lod import LodScatter, camera_region
+from duck_cube import build_cube, filter_frame, filtered_tables, filters_active
+from duck_db import DuckDB, SqlGeoClusters, SqlGeoIndex, SqlLodScatter, SqlSearch, DB_PATH
+from duck_api import ApiCache, register_api, query_filters
+from duck_search import SearchIndex
+from duck_similar import SimilarDucks, SIMILAR_DIMS
+from duck_thumbs import ThumbnailStore, THUMB_DIR, DEFAULT_IMAGE
+from flask import request, abort, send_from_directory
 
 style = "/assets/analyducks.css"
 
 ## start up the app, and provide title and bootstrap ref
 app = dash.Dash(
     external_stylesheets=[dbc.themes.BOOTSTRAP,style],
-    
+
 )
 app.title="Analyducks"
+## tab bodies (and the components inside them) are added to the page by callbacks
+app.config.suppress_callback_exceptions = True
 server=app.server
 # server.wsgi_app = WhiteNoise(server.wsgi_app, root='static/')
 
+## workbook to serve (overridable so benchmarks can point the app at a bigger collection)
+DATA_PATH = os.environ.get("ANALYDUCKS_DATA_PATH", "./data/duck_data.xlsx")
 
-## -------------------------------------------------------------------------------------------------
-# data load
+## "xlsx" loads the workbook into pandas; "sqlite" serves the database written by `python duck_db.py`,
+## with the aggregates, table pages and point layers queried from its indexes instead of held in memory
+BACKEND = os.environ.get("ANALYDUCKS_BACKEND", "xlsx")
+DB_FILE = os.environ.get("ANALYDUCKS_DB_PATH", DB_PATH)
 
-## read in excel dataset
-df = pd.read_excel("./data/duck_data.xlsx", sheet_name="Ducks")
+## seconds between checks of the workbook for new purchases
+RELOAD_INTERVAL = float(os.environ.get("ANALYDUCKS_RELOAD_INTERVAL", "5"))
 
-## convert date bought col to date, and extract year into a column
-df['Date_Bought'] = pd.to_datetime(df['Date_Bought']).dt.date
-df['Year'] = pd.DatetimeIndex(df['Date_Bought']).year
-df = df.sort_values(by=['Date_Bought'], ascending=True)
+## set to 1 to assert that incrementally updated aggregates match a full rebuild on every reload
+CHECK_AGGREGATES = os.environ.get("ANALYDUCKS_CHECK_AGGREGATES") == "1"
 
-## find avg weight measure, needed for rows where more than 1 duck is included in the total weight
-df['Avg_Weight'] = np.round(df.Total_Weight/df.Quantity,2)
+## starting grid cell (degrees) for clustered purchase markers on each map, halved per zoom level
+MAP_BASE_CELLS = {"country-map": 4.0, "state-map": 1.0}
 
-## transform and create new dfs to find ducks bought by state, country, purchase method, buyer, year, weight, and cumulative weight
-state_df = df.groupby(["Purchase_State"]).agg({"Quantity":"sum"}).reset_index()
-state_df = state_df[state_df["Purchase_State"]!=""]
+## set by gunicorn.conf.py: the master builds the dataset before forking and the workers share it
+PRELOAD = os.environ.get("ANALYDUCKS_PRELOAD") == "1"
 
-county_df = df.groupby(["ISO_Code","Purchase_Country"]).agg({"Quantity":"sum"}).reset_index()
+## "lat,lon" the distance-from-home stats are measured from (default: the city most ducks were bought in)
+HOME = os.environ.get("ANALYDUCKS_HOME")
 
-purchase_method_df = df.groupby(["Purchase_Method"]).agg({"Quantity":"sum"}).reset_index()
+## columns the geo query index keeps per duck
+GEO_COLUMNS = ["Name", "Latitude", "Longitude", "Purchase_City", "Purchase_Country", "Quantity"]
 
-buyer_df = df.groupby(["Buyer"]).agg({"Quantity":"sum"}).reset_index()
+## most points the 3d scatter sends to the browser before it is voxel-binned
+POINT_BUDGET = int(os.environ.get("ANALYDUCKS_3D_POINT_BUDGET", "5000"))
 
-yearly_df = df.groupby(["Year"]).agg({"Quantity":"sum"}).reset_index()
+## content-hashed thumbnails of the duck pictures, served from /thumbs
+thumbnails = ThumbnailStore()
+THUMB_URL = "/thumbs"
 
-weight_df = df.groupby(["Year"]).agg({"Total_Weight":"sum"}).reset_index()
+def duck_image(name):
+    return thumbnails.img_html(name, THUMB_URL)
+
+## names for a card's "ducks like me" panel
+def similar_names(dataset):
+    return lambda duck_id: [name for _, name, _ in dataset["similar"].similar(duck_id)]
 
-weight_cum_df = df.groupby(['Year']).sum(numeric_only=True).cumsum().reset_index()
 
 ## -------------------------------------------------------------------------------------------------
 ## figs
 
-## bar plot showing ducks bought by purchaser
+## 3d scatter of length, height, width; `points` is the full frame or its level-of-detail reduction
+def build_three_d_fig(points):
+    ## binned points stand for several ducks, so show the count on hover
+    binned = bool(len(points)) and points["Count"].max() > 1
 
-owner_bar = px.bar(buyer_df,x="Buyer", y="Quantity")
-owner_bar.update_layout(title_text="Rubber Duck Distribution by Purchaser", 
-                        title_x=0.5,
-                        xaxis_title="Purchaser", 
-                        yaxis_title="Quantity",
-                        paper_bgcolor="rgba(0,0,0,0)",
-                        xaxis={'categoryorder':'total descending'}
-                        )
+    three_d_fig = px.scatter_3d(points, x='Length',
+                                y='Width',
+                                z="Height",
+                                size='Avg_Weight',
+                                color='Avg_Weight',
+                                hover_name="Name" if binned else None,
+                                hover_data=["Count"] if binned else None,
+                                labels={'Avg_Weight':'Avg. Weight'}
+                                )
+
+    three_d_fig.update_layout(title_text="Rubber Duck Length vs Width vs Height (cm)",
+                              title_x=0.5,
+                              paper_bgcolor="rgba(0,0,0,0)",
+                              ## keep the user's camera when the refine callback swaps in denser points
+                              uirevision="scatter"
+                              )
+    camera = dict(
+        eye=dict(x=0, y=2, z=1),
+        # up=dict(x=1, y=1, z=0),
+    )
+
+    # camera = dict(
+    #     center=dict(x=0, y=0, z=0))
+
+    three_d_fig.update_layout(scene_camera=camera)
+    return three_d_fig
+
+## one builder per figure, all taking (df, aggregates, geo_clusters, lod_scatter), so a filtered tab rebuilds only its own charts
+
+## bar plot showing ducks bought by purchaser
+def build_owner_bar(df, aggregates, geo_clusters, lod_scatter):
+    owner_bar = px.bar(aggregates["buyer_df"],x="Buyer", y="Quantity")
+    owner_bar.update_layout(title_text="Rubber Duck Distribution by Purchaser",
+                            title_x=0.5,
+                            xaxis_title="Purchaser",
+                            yaxis_title="Quantity",
+                            paper_bgcolor="rgba(0,0,0,0)",
+                            xaxis={'categoryorder':'total descending'}
+                            )
+    return owner_bar
 
 ## pie chart showing purchase method of ducks
+def build_purchase_fig(df, aggregates, geo_clusters, lod_scatter):
+    purchase_fig = px.pie(aggregates["purchase_method_df"], values='Quantity', names='Purchase_Method')
+    purchase_fig.update_layout(title_text="Purchase Method Distribution",
+                               title_x=0.5,
+                               paper_bgcolor="rgba(0,0,0,0)"
+                               )
+    return purchase_fig
+
+## 3d scatter of length, height, width (voxel-binned down to the point budget for large collections)
+def build_lod_three_d_fig(df, aggregates, geo_clusters, lod_scatter):
+    return build_three_d_fig(lod_scatter.points())
+
+## bar plot showing weight of ducks bought each year
+def build_weight_bar(df, aggregates, geo_clusters, lod_scatter):
+    weight_bar = px.bar(aggregates["weight_df"],x="Year", y="Total_Weight")
+    weight_bar.update_layout(title_text="Weight (g) of Annual Purchases",
+                             title_x=0.5,
+                             xaxis_title="Purchase Year",
+                             yaxis_title="Weight (g)",
+                             paper_bgcolor="rgba(0,0,0,0)"
+                             )
+    return weight_bar
+
+## bar plot showing weight of ducks bought each year, cumulative
+def build_weight_bar_cumulative(df, aggregates, geo_clusters, lod_scatter):
+    weight_bar_cumulative = px.line(aggregates["weight_cum_df"],x="Year", y="Total_Weight")
+    weight_bar_cumulative.update_layout(title_text="Cumulative Collection Weight (g)",
+                                        title_x=0.5,
+                                        xaxis_title="Purchase Year",
+                                        yaxis_title="Cumulative Weight (g)",
+                                        paper_bgcolor="rgba(0,0,0,0)"
+                                        )
+    return weight_bar_cumulative
 
-purchase_fig = px.pie(purchase_method_df, values='Quantity', names='Purchase_Method')
-purchase_fig.update_layout(title_text="Purchase Method Distribution",
+## bar plot showing number of ducks bought per year
+def build_year_bar(df, aggregates, geo_clusters, lod_scatter):
+    year_bar = px.bar(aggregates["yearly_df"],x="Year", y="Quantity")
+    year_bar.update_layout(title_text="Rubber Ducks Bought Per Year",
                            title_x=0.5,
+                           xaxis_title="Purchase Year",
+                           yaxis_title="Quantity",
                            paper_bgcolor="rgba(0,0,0,0)"
                            )
+    return year_bar
 
-## 3d scatter of length, height, width
+## bar plot showing number of ducks bought per year, cumulative
+def build_year_bar_cumulative(df, aggregates, geo_clusters, lod_scatter):
+    year_bar_cumulative = px.line(aggregates["weight_cum_df"],x="Year", y="Quantity")
+    year_bar_cumulative.update_layout(title_text="Total Rubber Ducks Owned",
+                                      title_x=0.5,
+                                      xaxis_title="Purchase Year",
+                                      yaxis_title="Quantity",
+                                      paper_bgcolor="rgba(0,0,0,0)"
+                                      )
+    return year_bar_cumulative
 
-three_d_fig = px.scatter_3d(df, x='Length', 
-                            y='Width', 
-                            z="Height",
-                            size='Avg_Weight',
-                            color='Avg_Weight',
-                            labels={'Avg_Weight':'Avg. Weight'}
-                            )
+## purchase locations overlaid on both maps; one marker per duck for small collections,
+## grid clusters sized by duck count once the collection is large
+def build_map_fig(df, aggregates, geo_clusters, lod_scatter):
+    return go.Figure(geo_clusters.trace(MAP_BASE_CELLS["country-map"]))
 
-three_d_fig.update_layout(title_text="Rubber Duck Length vs Width vs Height (cm)",
-                          title_x=0.5,
-                          paper_bgcolor="rgba(0,0,0,0)"
-                          )
-camera = dict(
-    eye=dict(x=0, y=2, z=1),
-    # up=dict(x=1, y=1, z=0),
-)
+## choropleth showing duck purchase by country
+def build_country_fig(df, aggregates, geo_clusters, lod_scatter):
+    country_fig = px.choropleth(aggregates["county_df"], locations="ISO_Code",
+                        color="Quantity",
+                        hover_name="Purchase_Country"
+                        # color_continuous_scale="YlGn"
+                        )
+    country_fig.add_trace(geo_clusters.trace(MAP_BASE_CELLS["country-map"]))
+
+    country_fig.update_geos(
+        visible=True, resolution=50, scope="world", showcountries=True, countrycolor="Black"
+    )
+    country_fig.update_geos(projection_type="natural earth")
+    country_fig.update_layout(title_text="Rubber Duck Purchase By Country",title_x=0.5,width=1000,uirevision="map")
+    return country_fig
 
-# camera = dict(
-#     center=dict(x=0, y=0, z=0))
+## choropleth showing duck purchase by US state
+def build_state_fig(df, aggregates, geo_clusters, lod_scatter):
+    state_fig = px.choropleth(aggregates["state_df"],locations="Purchase_State",
+                              locationmode="USA-states",
+                              color="Quantity",
+                              scope="usa"
+                            #   color_continuous_scale="YlGn"
+                              )
+    state_fig.update_layout(title_text="Rubber Duck Purchase By State",title_x=0.5,uirevision="map")
+    state_fig.add_trace(geo_clusters.trace(MAP_BASE_CELLS["state-map"]))
+    return state_fig
 
-three_d_fig.update_layout(scene_camera=camera)
+FIGURE_BUILDERS = {
+    "owner_bar": build_owner_bar,
+    "purchase_fig": build_purchase_fig,
+    "three_d_fig": build_lod_three_d_fig,
+    "weight_bar": build_weight_bar,
+    "weight_bar_cumulative": build_weight_bar_cumulative,
+    "year_bar": build_year_bar,
+    "year_bar_cumulative": build_year_bar_cumulative,
+    "map_fig": build_map_fig,
+    "country_fig": build_country_fig,
+    "state_fig": build_state_fig,
+}
 
+## figures drawn from individual ducks rather than the chart tables, so cross-filters don't change them
+ROW_LEVEL_FIGURES = {"three_d_fig", "map_fig"}
 
-## bar plot showing weight of ducks bought each year
+def build_figures(df, aggregates, geo_clusters, lod_scatter, names=None):
+    names = FIGURE_BUILDERS if names is None else names
+    return {name: FIGURE_BUILDERS[name](df, aggregates, geo_clusters, lod_scatter) for name in names}
 
-weight_bar = px.bar(weight_df,x="Year", y="Total_Weight")
-weight_bar.update_layout(title_text="Weight (g) of Annual Purchases",
-                         title_x=0.5,
-                         xaxis_title="Purchase Year",
-                         yaxis_title="Weight (g)",
-                         paper_bgcolor="rgba(0,0,0,0)"
-                         )
+## purchases per calendar bucket (day / week / month), from the cached resampled series
+def build_series_fig(series, granularity):
+    series_fig = px.bar(series.resample(granularity), x="Date", y="Quantity")
+    series_fig.update_layout(title_text="Rubber Ducks Bought ({})".format(GRANULARITIES[granularity]),
+                             title_x=0.5,
+                             xaxis_title="Purchase Date",
+                             yaxis_title="Quantity",
+                             paper_bgcolor="rgba(0,0,0,0)"
+                             )
+    return series_fig
 
-## bar plot showing weight of ducks bought each year, cumulative
+## ducks and grams bought over a trailing window, weight on its own axis
+def build_rolling_fig(series, window):
+    frame = series.rolling(window)
+    rolling_fig = go.Figure([
+        go.Scatter(x=frame["Date"], y=frame["Quantity"], name="Ducks", mode="lines"),
+        go.Scatter(x=frame["Date"], y=frame["Total_Weight"], name="Weight (g)", mode="lines", yaxis="y2"),
+    ])
+    rolling_fig.update_layout(title_text="Purchases Over The Trailing {} Days".format(window),
+                              title_x=0.5,
+                              xaxis_title="Purchase Date",
+                              yaxis=dict(title="Quantity"),
+                              yaxis2=dict(title="Weight (g)", overlaying="y", side="right"),
+                              legend=dict(orientation="h", y=-0.2),
+                              paper_bgcolor="rgba(0,0,0,0)"
+                              )
+    return rolling_fig
 
-weight_bar_cumulative = px.line(weight_cum_df,x="Year", y="Total_Weight")
-weight_bar_cumulative.update_layout(title_text="Cumulative Collection Weight (g)",
-                                    title_x=0.5,
-                                    xaxis_title="Purchase Year", 
-                                    yaxis_title="Cumulative Weight (g)",
-                                    paper_bgcolor="rgba(0,0,0,0)"
-                                    )
+## -------------------------------------------------------------------------------------------------
+### Tab setup
 
-## bar plot showing number of ducks bought per year 
+## graphs whose figure the browser fetches from /figures/<name>.json, by graph id. the tab bodies only carry
+## each figure's url (in a `<graph id>-src` store), so page loads and tab switches don't re-send figure json
+## and a repeat visitor's browser revalidates the figures with their etags (a 304 when nothing changed)
+FETCHED_GRAPHS = {
+    'owner-bar': "owner_bar",
+    '3d-scatter': "three_d_fig",
+    'method-pie': "purchase_fig",
+    'year-bar': "year_bar",
+    'year-bar-cumulative': "year_bar_cumulative",
+    'weight-bar': "weight_bar",
+    'weight-bar-cumulative': "weight_bar_cumulative",
+    'state-map': "state_fig",
+    'country-map': "country_fig",
+}
 
-year_bar = px.bar(yearly_df,x="Year", y="Quantity")
-year_bar.update_layout(title_text="Rubber Ducks Bought Per Year", 
-                       title_x=0.5,
-                       xaxis_title="Purchase Year",
-                       yaxis_title="Quantity",
-                       paper_bgcolor="rgba(0,0,0,0)"
-                       )
+## url of a figure for a cross-filter selection, with the filters in the query string duck_api.query_filters reads;
+## the data version is part of it so a reload changes every url
+def figure_url(dataset, name, filters=None):
+    filters = filters or {}
+    args = {"v": dataset["version"]}
+    if "years" in filters:
+        args["years"] = "{}-{}".format(*filters["years"])
+    for key in ("iso", "methods", "buyers"):
+        if filters.get(key):
+            args[key] = ",".join(filters[key])
+    return "/figures/{}.json?{}".format(name, urlencode(args))
 
-## bar plot showing number of ducks bought per year, cumulative
+## the url stores the fetch_figure clientside callbacks read, one per graph
+def figure_sources(dataset, filters, graph_ids):
+    return [dcc.Store(id=graph_id + '-src', data=figure_url(dataset, FETCHED_GRAPHS[graph_id], filters))
+            for graph_id in graph_ids]
+
+def build_general_tab(dataset, filters):
+    return html.Div([
+        html.Div([
+                  *figure_sources(dataset, filters, ['owner-bar', '3d-scatter', 'method-pie']),
+                  html.H4("General Data",
+                            style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }),
+                  dcc.Graph(id='owner-bar',className='graph1',style={'width': '33%', 'display': 'inline-block'}),
+                  dcc.Store(id='3d-scatter-region'),
+                  dcc.Graph(id='3d-scatter',className='graph1',style={'width': '33%', 'display': 'inline-block'}),
+                  dcc.Graph(id='method-pie',className='graph1',style={'width': '33%', 'display': 'inline-block'})
+                ],
+                    # className="graph-container",
+                    style={'background-color': '#ebcc34'})
+    ])
+
+def build_year_weight_tab(dataset, filters):
+    return html.Div([
+          html.Div([
+                  *figure_sources(dataset, filters, ['year-bar', 'year-bar-cumulative', 'weight-bar', 'weight-bar-cumulative']),
+                  html.Div([
+                            html.H4("Purchase Year Data",
+                            # className='title1',
+                            style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }
+                            ),
+                            dcc.Graph(id='year-bar',className='graph2', style={'width': '50%','display': 'inline-block'}),
+                            dcc.Graph(id='year-bar-cumulative',className='graph2', style={'width': '50%','display': 'inline-block'})
+                            ],
+                            # className="split-container-left",
+                            style={
+                                            'display': 'inline-block',
+                                            'width': '50%',
+                                            'background-color': '#f0e246'
+                                        }
+                            ),
+                  html.Div([
+                            html.H4("Collection Weight Data",
+                                # className='title1',
+                                style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }
+                                ),
+                            dcc.Graph(id='weight-bar',className='graph2', style={'width': '50%','display': 'inline-block'}),
+                            dcc.Graph(id='weight-bar-cumulative',className='graph2', style={'width': '50%','display': 'inline-block'})],
+                                        # className="split-container-right",
+                                        style={
+                                            'display': 'inline-block',
+                                            'width': '50%',
+                                            'background-color': '#f0ed69'
+                                        }
+                                        )
+                            ]),
+          ## calendar-resampled and rolling-window purchases; the graphs are filled in by update_series
+          html.Div([
+                  html.H4("Purchases Over Time",
+                          style={
+                              'text-align': 'center',
+                              'text-decoration': 'underline',
+                              'font-weight': 'bold',
+                              'padding-top': '10px'
+                          }
+                          ),
+                  html.Div([
+                      dcc.RadioItems(id='series-granularity', value='M', inline=True,
+                                     options=[{'label': label, 'value': key} for key, label in GRANULARITIES.items()],
+                                     inputStyle={'margin-left': '15px', 'margin-right': '5px'}),
+                      dcc.RadioItems(id='series-window', value=ROLLING_WINDOWS[1], inline=True,
+                                     options=[{'label': "{} days".format(days), 'value': days} for days in ROLLING_WINDOWS],
+                                     inputStyle={'margin-left': '15px', 'margin-right': '5px'}),
+                  ], style={'display': 'flex', 'justify-content': 'space-around'}),
+                  dcc.Graph(id='purchase-series',className='graph2', style={'width': '50%','display': 'inline-block'}),
+                  dcc.Graph(id='rolling-series',className='graph2', style={'width': '50%','display': 'inline-block'})
+                  ],
+                  style={'background-color': '#f0e246'}
+                  )
+    ])
 
-year_bar_cumulative = px.line(weight_cum_df,x="Year", y="Quantity")
-year_bar_cumulative.update_layout(title_text="Total Rubber Ducks Owned",
-                                  title_x=0.5,
-                                  xaxis_title="Purchase Year", 
-                                  yaxis_title="Quantity",
-                                  paper_bgcolor="rgba(0,0,0,0)"
-                                  )
+## location search inputs on the geo tab: radius mode reads the first three, box mode the last four
+GEO_INPUTS = [('geo-lat', "Latitude"), ('geo-lon', "Longitude"), ('geo-km', "Radius (km)"),
+              ('geo-south', "South"), ('geo-west', "West"), ('geo-north', "North"), ('geo-east', "East")]
 
-map_fig = px.scatter_geo(df,
-        lon = 'Longitude',
-        lat = 'Latitude',
-        hover_name="Name"      
-        )
+def build_geo_tab(dataset, filters):
+    return html.Div([
+      html.Div([
+                    html.Div([html.H4("Geographic Purchase Visualization")],
+                                className="title1",
+                                style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }
+                                ),
+                    dcc.Store(id='state-map-cell', data=MAP_BASE_CELLS["state-map"]),
+                    *figure_sources(dataset, filters, ['state-map', 'country-map']),
+                    dcc.Store(id='country-map-cell', data=MAP_BASE_CELLS["country-map"]),
+                    dcc.Graph(id='state-map',className="map", style={'width': '47%', 'display': 'inline-block'}),
+                    dcc.Graph(id='country-map',className="map", style={'width': '47%', 'display': 'inline-block'})
+                ]),
+      ## radius / box search over purchase locations; matches are highlighted on both maps by zoom_map
+      html.Div([
+                    html.H4("Find Ducks By Location",
+                            style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }),
+                    dcc.RadioItems(id='geo-mode', value='radius', inline=True,
+                                   options=[{'label': 'Within a radius', 'value': 'radius'},
+                                            {'label': 'Inside a box', 'value': 'box'}],
+                                   inputStyle={'margin-left': '15px', 'margin-right': '5px'}),
+                    html.Div([dcc.Input(id=input_id, type='number', placeholder=label, debounce=True,
+                                        style={'width': '12%', 'margin': '5px'})
+                              for input_id, label in GEO_INPUTS]),
+                    html.Div(id='geo-summary', style={'padding-bottom': '10px'})
+                ], style={'text-align': 'center', 'background-color': '#f0e246'}),
+      html.Div([
+                    html.H4("Distance From Home",
+                            style={
+                                'text-align': 'center',
+                                'text-decoration': 'underline',
+                                'font-weight': 'bold',
+                                'padding-top': '10px'
+                            }),
+                    dash_table.DataTable(
+                        data=dataset["city_distances"].to_dict("records"),
+                        columns=[{"name": c.replace("_", " "), "id": c}
+                                 for c in ["Purchase_City", "Purchase_Country", "Ducks", "Distance_km"]],
+                        page_size=10, sort_action="native",
+                        style_table={'width': '60%', 'margin': 'auto', 'padding-bottom': '10px'})
+                ], style={'background-color': '#f0ed69'})
 
-map_fig.update_traces(marker=dict(color="Red"))
 
-## choropleth showing duck purchase by country
+    ])
 
-country_fig = px.choropleth(county_df, locations="ISO_Code",
-                    color="Quantity", 
-                    hover_name="Purchase_Country"
-                    # color_continuous_scale="YlGn"
-                    )
-country_fig.add_trace(map_fig.data[0])
+## cards are rendered a page at a time by the render_personality_page callback once the tab is opened
+def build_personality_tab(dataset, filters):
+    return html.Div([
+        dbc.Pagination(id='personality-pages', active_page=1, max_value=page_count(len(dataset["table"])),
+                       fully_expanded=False, previous_next=True, first_last=True,
+                       style={'justify-content': 'center', 'padding-top': '10px'}),
+        html.Div(id='personality-cards')
+    ])
 
-country_fig.update_geos(
-    visible=True, resolution=50, scope="world", showcountries=True, countrycolor="Black"
-)
-country_fig.update_geos(projection_type="natural earth")
-country_fig.update_layout(title_text="Rubber Duck Purchase By Country",title_x=0.5,width=1000)
+## figures each tab shows
+TAB_FIGURES = {
+    'general-tab': ["owner_bar", "three_d_fig", "purchase_fig"],
+    'year-weight-tab': ["year_bar", "year_bar_cumulative", "weight_bar", "weight_bar_cumulative"],
+    'geo-tab': ["state_fig", "country_fig"],
+    'personality-tab': [],
+}
 
-## choropleth showing duck purchase by US state
+TAB_BUILDERS = {
+    'general-tab': build_general_tab,
+    'year-weight-tab': build_year_weight_tab,
+    'geo-tab': build_geo_tab,
+    'personality-tab': build_personality_tab,
+}
 
-state_fig = px.choropleth(state_df,locations="Purchase_State", 
-                          locationmode="USA-states", 
-                          color="Quantity", 
-                          scope="usa"
-                        #   color_continuous_scale="YlGn"
-                          )
-state_fig.update_layout(title_text="Rubber Duck Purchase By State",title_x=0.5)
-state_fig.add_trace(map_fig.data[0])
+DEFAULT_TAB = 'general-tab'
 
-## calcs for KPI cards
+## tab bodies are built the first time a tab is opened and then cached on the dataset version;
+## their graphs are filled in from /figures (see FETCHED_GRAPHS)
+def tab_content(dataset, tab_id, filters=None):
+    if filters_active(filters):
+        return filtered_tab_content(dataset, tab_id, filters)
+    cache = dataset["tab_cache"]
+    if tab_id not in cache:
+        cache[tab_id] = TAB_BUILDERS[tab_id](dataset, {})
+    return cache[tab_id]
 
-# weight KPI
-duck_weight = df["Total_Weight"].sum()
+## a tab's figures for a cross-filter selection: the chart tables are reductions over the cube, then the figures are rebuilt from them
+def filtered_figures(dataset, tab_id, filters):
+    key = (tab_id, json.dumps(filters, sort_keys=True))
+    cache = dataset["filtered_figure_cache"]
+    if key not in cache:
+        aggregates = dataset["filtered_tables"](filters)
+        names = [name for name in TAB_FIGURES[tab_id] if name not in ROW_LEVEL_FIGURES]
+        figures = build_figures(None, aggregates, filtered_geo_clusters(dataset, filters), dataset["lod_scatter"], names)
+        figures.update({name: dataset["figures"][name] for name in TAB_FIGURES[tab_id] if name in ROW_LEVEL_FIGURES})
+        if len(cache) > 32:
+            cache.clear()
+        cache[key] = FigureRegistry(dataset["version"], figures)
+    return cache[key]
 
-# total ducks bought KPI
-total_ducks = df["Quantity"].sum()
+## purchase markers of the ducks in a cross-filter selection, cached per selection (the shared layers when nothing is filtered)
+def filtered_geo_clusters(dataset, filters):
+    if not filters_active(filters):
+        return dataset["geo_clusters"]
+    key = json.dumps(filters, sort_keys=True)
+    cache = dataset["filtered_geo_cache"]
+    if key not in cache:
+        if len(cache) > 32:
+            cache.clear()
+        cache[key] = dataset["filter_geo_clusters"](filters)
+    return cache[key]
 
-# unique purchase countries KPI
-unique_countries = df.Purchase_Country.nunique()
+## the figures a tab shows for a filter selection (the shared registry when nothing is filtered)
+def tab_figures(dataset, tab_id, filters=None):
+    if filters_active(filters):
+        return filtered_figures(dataset, tab_id, filters)
+    return dataset["figure_registry"]
 
-# unique purchase cities KPI
-unique_cities = df.Purchase_City.nunique()
+## tab body for a cross-filter selection
+def filtered_tab_content(dataset, tab_id, filters):
+    key = (tab_id, json.dumps(filters, sort_keys=True))
+    cache = dataset["filtered_tab_cache"]
+    if key not in cache:
+        if len(cache) > 32:
+            cache.clear()
+        cache[key] = TAB_BUILDERS[tab_id](dataset, filters)
+    return cache[key]
 
-# ducks bought within last year KPI
-today = date.today()
-today_yr = today.year
-today_day = today.day
-today_month = today.month
-ducks_bought_last_year = df[df["Date_Bought"]>=dt.date(today_yr-1,today_month,today_day)].Quantity.sum()
+## values the filter panel offers, from the prepared frame (DuckDB.filter_options gives the same from sqlite)
+def filter_options(df):
+    countries = df.dropna(subset=["ISO_Code"]).drop_duplicates("ISO_Code").sort_values("Purchase_Country")
+    return {
+        "years": [int(y) for y in sorted(df["Year"].dropna().unique())],
+        "countries": list(zip(countries.ISO_Code, countries.Purchase_Country)),
+        "methods": sorted(df["Purchase_Method"].dropna().unique()),
+        "buyers": sorted(df["Buyer"].dropna().unique()),
+    }
+
+## year range + country/method/buyer selectors above the tabs
+def build_filter_panel(options):
+    years = options["years"]
+    dropdown_style = {'width': '25%', 'display': 'inline-block', 'padding': '0 1%'}
+    return html.Div([
+        html.Div(dcc.RangeSlider(id='filter-years', min=years[0], max=years[-1], step=1,
+                                 value=[years[0], years[-1]],
+                                 marks={int(y): str(y) for y in years}),
+                 style={'padding': '0 3%'}),
+        html.Div([
+            html.Div(dcc.Dropdown(id='filter-iso', multi=True, placeholder="All countries",
+                                  options=[{'label': c, 'value': i} for i, c in options["countries"]]),
+                     style=dropdown_style),
+            html.Div(dcc.Dropdown(id='filter-methods', multi=True, placeholder="All purchase methods",
+                                  options=options["methods"]),
+                     style=dropdown_style),
+            html.Div(dcc.Dropdown(id='filter-buyers', multi=True, placeholder="All purchasers",
+                                  options=options["buyers"]),
+                     style=dropdown_style),
+        ], style={'text-align': 'center'}),
+        ## narrows the collection table and the duck cards (not the charts) to the ranked matches
+        html.Div(dcc.Input(id='duck-search', type='search', value='',
+                           placeholder="Search ducks by name, story, city or shop",
+                           style={'width': '100%'}),
+                 style={'padding': '10px 3% 0 3%'})
+    ],
+    style={
+        'padding-top': '10px',
+        'padding-bottom': '10px',
+        'background-color': 'skyblue'
+    })
+
+## filter dict from the panel values; the full year range counts as no year filter
+def panel_filters(years, iso, methods, buyers, year_bounds):
+    filters = {}
+    if years and (years[0] > year_bounds[0] or years[1] < year_bounds[1]):
+        filters["years"] = [int(years[0]), int(years[1])]
+    for key, value in (("iso", iso), ("methods", methods), ("buyers", buyers)):
+        if value:
+            filters[key] = sorted(value)
+    return filters
+
+## filter dict from the panel values, against the year range of `dataset`
+def current_filters(dataset, years, iso, methods, buyers):
+    year_options = dataset["filter_options"]["years"]
+    return panel_filters(years, iso, methods, buyers, (year_options[0], year_options[-1]))
 
 ## -------------------------------------------------------------------------------------------------
-### Tab setup
+# data load
 
-general_tab = html.Div([
-    html.Div([
-              html.H4("General Data",
-                        style={
-                            'text-align': 'center',
-                            'text-decoration': 'underline',
-                            'font-weight': 'bold',
-                            'padding-top': '10px'
-                        }),
-              dcc.Graph(id='owner-bar',figure=owner_bar,className='graph1',style={'width': '33%', 'display': 'inline-block'}),
-              dcc.Graph(id='3d-scatter',figure=three_d_fig,className='graph1',style={'width': '33%', 'display': 'inline-block'}),
-              dcc.Graph(id='method-pie',figure=purchase_fig,className='graph1',style={'width': '33%', 'display': 'inline-block'})
-            ],
-                # className="graph-container",
-                style={'background-color': '#ebcc34'})
-])
+## where the distance-from-home stats are measured from
+def home_point(geo_index):
+    if HOME:
+        lat, lon = HOME.split(",")
+        return (float(lat), float(lon))
+    return geo_index.default_home()
 
-year_weight_tab = html.Div([
-      html.Div([
-              html.Div([
-                        html.H4("Purchase Year Data",
-                        # className='title1',
-                        style={
-                            'text-align': 'center',
-                            'text-decoration': 'underline',
-                            'font-weight': 'bold',
-                            'padding-top': '10px'
-                        }
-                        ),
-                        dcc.Graph(id='year-bar',figure=year_bar,className='graph2', style={'width': '50%','display': 'inline-block'}), 
-                        dcc.Graph(id='year-bar-cumulative',figure=year_bar_cumulative,className='graph2', style={'width': '50%','display': 'inline-block'})
-                        ],
-                        # className="split-container-left",
-                        style={
-                                        'display': 'inline-block',
-                                        'width': '50%',
-                                        'background-color': '#f0e246'
-                                    }
-                        ),
-              html.Div([
-                        html.H4("Collection Weight Data",
-                            # className='title1',
-                            style={
-                            'text-align': 'center',
-                            'text-decoration': 'underline',
-                            'font-weight': 'bold',
-                            'padding-top': '10px'
-                        }
-                            ),
-                        dcc.Graph(id='weight-bar',figure=weight_bar,className='graph2', style={'width': '50%','display': 'inline-block'}),
-                        dcc.Graph(id='weight-bar-cumulative',figure=weight_bar_cumulative,className='graph2', style={'width': '50%','display': 'inline-block'})],
-                                    # className="split-container-right",
-                                    style={
-                                        'display': 'inline-block',
-                                        'width': '50%',
-                                        'background-color': '#f0ed69'
-                                    }
-                                    )
-                        ])
-])
-
-geo_tab = html.Div([
-  html.Div([
-                html.Div([html.H4("Geographic Purchase Visualization")],
-                            className="title1",
-                            style={
-                            'text-align': 'center',
-                            'text-decoration': 'underline',
-                            'font-weight': 'bold',
-                            'padding-top': '10px'
-                        }
-                            ),
-                dcc.Graph(id='state-map',figure=state_fig,className="map", style={'width': '47%', 'display': 'inline-block'}),
-                dcc.Graph(id='country-map',figure=country_fig,className="map", style={'width': '47%', 'display': 'inline-block'})
-            ])
+## everything derived from one version of the workbook; rebuilt off the request path by the watcher
+def build_dataset(path, signature, previous=None):
+    ## read in excel dataset (served from the pickled snapshot unless the workbook changed)
+    raw = load_ducks(path, sheet_name="Ducks")
+    hashes = row_hashes(raw)
+    new_rows = appended_rows(previous["row_hashes"], raw, hashes) if previous is not None else None
 
+    if new_rows is None:
+        ## first load, or existing rows were edited/deleted: convert dates, add year + avg weight and rebuild
+        ## the state, country, purchase method, buyer, year, weight, and cumulative weight tables from scratch
+        df = prepare_ducks(raw)
+        store = AggregateStore(df)
+    else:
+        ## purchases were only appended: fold just the new rows into a copy of the previous running sums
+        new_df = prepare_ducks(new_rows)
+        df = pd.concat([previous["df"], new_df]).sort_values(by=['Date_Bought'], ascending=True, kind="mergesort")
+        store = previous["store"].copy().append(new_df)
 
-])
+    kpi_index = store.kpi_index()
+    series = PurchaseSeries(kpi_index)
+    if CHECK_AGGREGATES:
+        store.check(df)
+        kpi_index.check(df)
 
-# personality_tab = html.Div(children=[create_card_A(x,y) for x,y in zip(df.Name,df.Purchase_City)])
-personality_tab = html.Div(children=[create_card_A(name,about, city, country, dt, weight, height, width, length) 
-                                     for name,about, city, country, dt, weight, height, width, length in zip(df.Name,df['About Me'],df.Purchase_City,df.Purchase_Country,df.Date_Bought,df.Total_Weight,df.Height,df.Width,df.Length)])
+    aggregates = store.aggregates()
+    geo_clusters = GeoClusters(df)
+    lod_scatter = LodScatter(df, budget=POINT_BUDGET)
+    figures = build_figures(df, aggregates, geo_clusters, lod_scatter)
+
+    version = "{}-{}".format(signature[1], signature[2])
+    ## from the store's grain like the sqlite backend, so an append doesn't re-bin every row
+    cube = build_cube(aggregates["grain"])
+    ## the row-level indexes below are rebuilt from the whole frame on every version, appends included
+    geo_index = GeoIndex(df[GEO_COLUMNS])
+
+    return {
+        "version": version,
+        "row_hashes": hashes,
+        "df": df,
+        "filter_options": filter_options(df),
+        ## ducks start..stop in purchase order, and at given row positions, for the card pages
+        "ducks": lambda start, stop: df.iloc[start:stop],
+        "ducks_at": lambda positions: df.iloc[positions],
+        ## inverted index over name / about me / city / retailer, ranked matches as row positions
+        "search": SearchIndex(df),
+        ## nearest neighbours by size and weight, for the "ducks like me" panel on each card
+        "similar": SimilarDucks(df[["Name"] + SIMILAR_DIMS]),
+        ## radius / box queries over purchase locations, and per-city distances from home
+        "geo_index": geo_index,
+        "city_distances": geo_index.city_distances(home_point(geo_index)),
+        "store": store,
+        "aggregates": aggregates,
+        "geo_clusters": geo_clusters,
+        "lod_scatter": lod_scatter,
+        "figures": figures,
+        ## every figure serialized + compressed once, here on the watcher thread rather than per request
+        "figure_registry": FigureRegistry(version, figures).warm(),
+        ## calcs for KPI cards (weight, total ducks, unique countries/cities, ducks bought within last year),
+        ## evaluated per page load so "last year" moves with the calendar
+        "kpi_index": kpi_index,
+        ## day / week / month buckets and 30 / 90 / 365 day windows, off the same sorted dates + running sums
+        "series": series,
+        "series_figures": {},
+        "tab_cache": {},
+        ## dense Year x ISO x State x Method x Buyer sums behind the cross-filter panel (None if too large)
+        "cube": cube,
+        "filtered_tables": lambda filters: filtered_tables(cube, df, filters),
+        "filter_geo_clusters": lambda filters: GeoClusters(filter_frame(df, filters)),
+        "filtered_geo_cache": {},
+        "filtered_figure_cache": {},
+        "filtered_tab_cache": {},
+        "table": TableIndex(df),
+        ## duck cards, memoized per duck as pages of the personality tab are viewed
+        "cards": {},
+        ## encoded /api/v1 responses for this version
+        "api": ApiCache(version),
+    }
+
+## the same dataset over an imported sqlite database: only the aggregates come into memory, the ducks stay on disk
+## (re-running the importer replaces the file, which the watcher picks up like an edited workbook)
+def build_dataset_sql(path, signature, previous=None):
+    db = DuckDB(path)
+    aggregates = db.aggregates()
+    kpi_index = db.kpi_index()
+    geo_clusters = SqlGeoClusters(db)
+    lod_scatter = SqlLodScatter(db, budget=POINT_BUDGET)
+    figures = build_figures(None, aggregates, geo_clusters, lod_scatter)
+    version = "{}-{}".format(signature[1], signature[2])
+    ## the grain is already grouped, so the cube is built from it rather than from the rows
+    cube = build_cube(aggregates["grain"])
+    ## radius / box queries are indexed range scans in sqlite, only their matches are loaded
+    geo_index = SqlGeoIndex(db, GEO_COLUMNS)
+
+    return {
+        "version": version,
+        "db": db,
+        "filter_options": db.filter_options(),
+        "ducks": db.ducks,
+        "ducks_at": db.ducks_at,
+        ## full-text search runs in sqlite's fts5 index rather than in-process postings
+        "search": SqlSearch(db),
+        ## the one per-duck structure the sqlite backend keeps in memory (brute force / kd-tree search needs every
+        ## point at hand): four floats plus ids per duck, with names looked up in sqlite for the few neighbours shown
+        "similar": SimilarDucks(db.columns(SIMILAR_DIMS), names=db.names),
+        "geo_index": geo_index,
+        "city_distances": geo_index.city_distances(home_point(geo_index)),
+        "aggregates": aggregates,
+        "geo_clusters": geo_clusters,
+        "lod_scatter": lod_scatter,
+        "figures": figures,
+        "figure_registry": FigureRegistry(version, figures).warm(),
+        "kpi_index": kpi_index,
+        "series": PurchaseSeries(kpi_index),
+        "series_figures": {},
+        "tab_cache": {},
+        "cube": cube,
+        "filtered_tables": cube.tables if cube is not None else db.aggregates,
+        "filter_geo_clusters": lambda filters: SqlGeoClusters(db, filters=filters),
+        "filtered_geo_cache": {},
+        "filtered_figure_cache": {},
+        "filtered_tab_cache": {},
+        "table": db,
+        "cards": {},
+        "api": ApiCache(version),
+    }
+
+## poll the workbook (or the database) in the background and swap new versions in atomically
+if BACKEND == "sqlite":
+    dataset_watcher = DatasetWatcher(DB_FILE, build_dataset_sql, interval=RELOAD_INTERVAL)
+else:
+    dataset_watcher = DatasetWatcher(DATA_PATH, build_dataset, interval=RELOAD_INTERVAL)
+## everything a request would otherwise build lazily, done up front so forked workers inherit one shared copy
+def warm_dataset(dataset):
+    for name in dataset["figures"]:
+        dataset["figure_registry"].figure_json(name)
+    for tab_id in TAB_BUILDERS:
+        tab_content(dataset, tab_id)
+    ## (sqlite sorts with its own indexes, nothing to precompute)
+    if isinstance(dataset["table"], TableIndex):
+        for column in TABLE_COLUMNS:
+            for direction in ("asc", "desc"):
+                dataset["table"].order(column, direction)
+    duck_card_page(dataset["ducks"](0, CARDS_PER_PAGE), 1, dataset["cards"], image=duck_image,
+                   similar=similar_names(dataset))
+    dataset["series"].warm()
+    return dataset
+
+if PRELOAD:
+    ## workers start their own watcher after the fork (see post_fork in gunicorn.conf.py)
+    warm_dataset(dataset_watcher.current)
+elif RELOAD_INTERVAL > 0:
+    dataset_watcher.start()
 
-# create_card_A(name,about, city, country, date, weight, height, width, length, description)
-# for duck in df: personality_tab.append(html.Div([create_card_A(df.Name,df.Purchase_City)]))
 ## -------------------------------------------------------------------------------------------------
 ### App layout
 
-app.layout = html.Div([
-    html.Div([
-        html.H1("Analyducks",style={"margin-left":"3%","margin-right":"3%"}),
-        html.H4("A visual analysis of Allan K's rubber duck collection",style={"margin-left":"3%","margin-right":"3%"}),
-        html.P("You've heard of a data lake, now welcome to my data pond! I am an avid rubber duck collector, and after extensive searching I could not find any analytics about them. Of course, I had to rectify that so I have created the world's first repository of rubber duck analytics. Please enjoy the below charting and descriptive statistics on my flock's weight, purchase years, origin and personalities.",style={"margin-bottom":"0px", "margin-left":"5%","margin-right":"5%"}),
-    ],className="title",
-    style={
-        'text-align': 'center',
-        'background-color': 'skyblue',
-        'padding-bottom': '5px'
-    }
-    ),
-    html.Div([
-        kpi_duck_card(total_ducks,"Total Ducks In My Collection"),
-        kpi_duck_card(ducks_bought_last_year,"Ducks Bought In Last Year"),
-        kpi_duck_card(duck_weight,"Duck Collection Weight (g)"),
-        kpi_duck_card(unique_countries,"Unique Countries of Purchase"),
-        kpi_duck_card(unique_cities,"Unique Cities of Purchase")
-        ],
+## dash calls this on every page load, so each visitor gets whichever version is current right now
+def serve_layout():
+    dataset = dataset_watcher.current
+    kpis = dataset["kpi_index"].kpis()
+    first_page, table_pages = dataset["table"].page(0, PAGE_SIZE)
+
+    return html.Div([
+        html.Div([
+            html.H1("Analyducks",style={"margin-left":"3%","margin-right":"3%"}),
+            html.H4("A visual analysis of Allan K's rubber duck collection",style={"margin-left":"3%","margin-right":"3%"}),
+            html.P("You've heard of a data lake, now welcome to my data pond! I am an avid rubber duck collector, and after extensive searching I could not find any analytics about them. Of course, I had to rectify that so I have created the world's first repository of rubber duck analytics. Please enjoy the below charting and descriptive statistics on my flock's weight, purchase years, origin and personalities.",style={"margin-bottom":"0px", "margin-left":"5%","margin-right":"5%"}),
+        ],className="title",
         style={
-            'float': 'center',
-            'padding-top': '15px',
-            'padding-bottom': '15px',
-            'background-color': 'skyblue'
-        }),
-    html.Div([dbc.Tabs([
-                dbc.Tab(general_tab,label="General Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
-                dbc.Tab(year_weight_tab,label="Year & Weight Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
-                dbc.Tab(geo_tab,label="Geographical Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
-                dbc.Tab(personality_tab,label="Personality Tab",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"})
-                                # dbc.Tab(bi_tab, label="Data Analytics", className="custom-tab",active_tab_class_name='custom-tab--selected',tab_style={"width":"49%"}),
-                        ],style={"background-color":"#adadad","font-weight":"bold","height":"44px"})]),
-    html.Div([
-        
-        html.Img(src='./assets/DuckFamily.jpg',width="60%")
-    ],style={
-                                        'background-color': 'lightgray',
-                                        'text-align':'center'
-                                    }
-    ),
-    html.Br(),
-    html.Div(
-             dash_table.DataTable(
-                # id="table",
-                # style={'align-content': 'center', 'text-align': 'center'},
-                data=df.to_dict('records'),
-                columns=[{"name": i, "id": i} for i in df[["Name","Purchase_City","Purchase_Country","Date_Bought","About Me","Total_Weight","Height","Width","Length"]].columns],
-                fixed_rows={'headers': True, 'data': 0 },
-                style_cell={'textAlign': 'left'},
-                style_header={
-                    'backgroundColor': 'rgb(210, 210, 210)',
-                    'color': 'black',
-                    'fontWeight': 'bold',
-                    'align-content': 'center', 
-                    'text-align': 'center'
-                    },
-                style_data={
-                    'whiteSpace': 'normal',
-                    'height': 'auto',
-                    'minWidth':'60px',
-                    'width': '120px',
-                    'lineHeight': '20px',
-                    'color': 'black',
-                    'backgroundColor': 'white',
-                    'align-content': 'center',
-                    'text-align': 'center'
-                    },
-                style_data_conditional=[{
-                    'if': {'row_index': 'odd'},
-                    'backgroundColor': 'rgb(220, 220, 220)',
-                    }]
-    )),
-    html.Br()
-    
-])
+            'text-align': 'center',
+            'background-color': 'skyblue',
+            'padding-bottom': '5px'
+        }
+        ),
+        html.Div([
+            kpi_duck_card(kpis["total_ducks"],"Total Ducks In My Collection"),
+            kpi_duck_card(kpis["ducks_bought_last_year"],"Ducks Bought In Last Year"),
+            kpi_duck_card(kpis["duck_weight"],"Duck Collection Weight (g)"),
+            kpi_duck_card(kpis["unique_countries"],"Unique Countries of Purchase"),
+            kpi_duck_card(kpis["unique_cities"],"Unique Cities of Purchase")
+            ],
+            style={
+                'float': 'center',
+                'padding-top': '15px',
+                'padding-bottom': '15px',
+                'background-color': 'skyblue'
+            }),
+        build_filter_panel(dataset["filter_options"]),
+        ## only the default tab's body ships with the page; the others are fetched by render_tab when clicked
+        html.Div([dbc.Tabs(id='tabs', active_tab=DEFAULT_TAB, children=[
+                    dbc.Tab(tab_id='general-tab',label="General Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
+                    dbc.Tab(tab_id='year-weight-tab',label="Year & Weight Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
+                    dbc.Tab(tab_id='geo-tab',label="Geographical Stats",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"}),
+                    dbc.Tab(tab_id='personality-tab',label="Personality Tab",className="custom-tab",active_tab_class_name='custom-tab--selected', tab_style={"width":"25%"})
+                                    # dbc.Tab(bi_tab, label="Data Analytics", className="custom-tab",active_tab_class_name='custom-tab--selected',tab_style={"width":"49%"}),
+                            ],style={"background-color":"#adadad","font-weight":"bold","height":"44px"}),
+                  html.Div(tab_content(dataset, DEFAULT_TAB), id='tab-content')]),
+        html.Div([
+
+            dcc.Markdown(thumbnails.img_html("Duck Family", THUMB_URL, sizes="60vw", style="width:60%", path=DEFAULT_IMAGE),
+                         dangerously_allow_html=True)
+        ],style={
+                                            'background-color': 'lightgray',
+                                            'text-align':'center'
+                                        }
+        ),
+        html.Br(),
+        html.Div(
+                 dash_table.DataTable(
+                    id="duck-table",
+                    # style={'align-content': 'center', 'text-align': 'center'},
+                    ## only the first page ships with the layout; paging, sorting and filtering run server side
+                    data=first_page,
+                    columns=[{"name": i, "id": i} for i in TABLE_COLUMNS],
+                    page_current=0,
+                    page_size=PAGE_SIZE,
+                    page_count=table_pages,
+                    page_action='custom',
+                    sort_action='custom',
+                    sort_mode='single',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
+                    fixed_rows={'headers': True, 'data': 0 },
+                    style_cell={'textAlign': 'left'},
+                    style_header={
+                        'backgroundColor': 'rgb(210, 210, 210)',
+                        'color': 'black',
+                        'fontWeight': 'bold',
+                        'align-content': 'center',
+                        'text-align': 'center'
+                        },
+                    style_data={
+                        'whiteSpace': 'normal',
+                        'height': 'auto',
+                        'minWidth':'60px',
+                        'width': '120px',
+                        'lineHeight': '20px',
+                        'color': 'black',
+                        'backgroundColor': 'white',
+                        'align-content': 'center',
+                        'text-align': 'center'
+                        },
+                    style_data_conditional=[{
+                        'if': {'row_index': 'odd'},
+                        'backgroundColor': 'rgb(220, 220, 220)',
+                        }]
+        )),
+        html.Br()
+
+    ])
+
+app.layout = serve_layout
+
+## -------------------------------------------------------------------------------------------------
+### Routes
+
+## pre-serialized figure json, compressed, with etags so repeat fetches are 304s. the graphs on the tabs load
+## their figures from here; cross-filters come in the query string (?years=2019-2021&iso=USA,CAN&methods=..&buyers=..)
+@server.route("/figures/<name>.json")
+def figure_endpoint(name):
+    dataset = dataset_watcher.current
+    tab_id = next((tab_id for tab_id, names in TAB_FIGURES.items() if name in names), None)
+    registry = tab_figures(dataset, tab_id, query_filters(request.args)) if tab_id else dataset["figure_registry"]
+    if name not in registry:
+        abort(404)
+    return registry.payload(name).response(request)
+
+## thumbnail names change with their content, so browsers can keep them for good
+@server.route(THUMB_URL + "/<name>")
+def thumbnail_endpoint(name):
+    return send_from_directory(os.path.abspath(THUMB_DIR), name, max_age=31536000)
+
+## json for other tools: kpis, per year / country / state / method / buyer tables and paged duck records,
+## cached per data version with the same etag + gzip handling as the figures
+register_api(server, lambda: dataset_watcher.current)
+
+## -------------------------------------------------------------------------------------------------
+### Callbacks
+
+## load a graph's figure from the url in its store; fetch() revalidates with the etag, so an unchanged figure is a 304
+FETCH_FIGURE = """
+async function(src) {
+    if (!src) {
+        return window.dash_clientside.no_update;
+    }
+    const response = await fetch(src);
+    return response.ok ? response.json() : window.dash_clientside.no_update;
+}
+"""
+
+for graph_id in FETCHED_GRAPHS:
+    app.clientside_callback(FETCH_FIGURE, Output(graph_id, 'figure'), Input(graph_id + '-src', 'data'))
+
+## page, sort and filter the collection table against the pre-indexed frame of the current dataset
+@callback(
+    Output('duck-table', 'data'),
+    Output('duck-table', 'page_count'),
+    Input('duck-table', 'page_current'),
+    Input('duck-table', 'page_size'),
+    Input('duck-table', 'sort_by'),
+    Input('duck-table', 'filter_query'),
+    Input('duck-search', 'value'))
+def update_table(page_current, page_size, sort_by, filter_query, search):
+    dataset = dataset_watcher.current
+    hits = dataset["search"].query(search or "")
+    return dataset["table"].page(page_current, page_size, sort_by, filter_query, hits)
+
+## swap in the body of the clicked tab, for the current cross-filter selection
+@callback(
+    Output('tab-content', 'children'),
+    Input('tabs', 'active_tab'),
+    Input('filter-years', 'value'),
+    Input('filter-iso', 'value'),
+    Input('filter-methods', 'value'),
+    Input('filter-buyers', 'value'),
+    prevent_initial_call=True)
+def render_tab(active_tab, years, iso, methods, buyers):
+    dataset = dataset_watcher.current
+    filters = current_filters(dataset, years, iso, methods, buyers)
+    return tab_content(dataset, active_tab or DEFAULT_TAB, filters)
+
+## purchase charts for the picked calendar granularity / rolling window, each figure built once per data version
+@callback(
+    Output('purchase-series', 'figure'),
+    Output('rolling-series', 'figure'),
+    Input('series-granularity', 'value'),
+    Input('series-window', 'value'))
+def update_series(granularity, window):
+    dataset = dataset_watcher.current
+    cache = dataset["series_figures"]
+    granularity = granularity if granularity in GRANULARITIES else 'M'
+    window = window if window in ROLLING_WINDOWS else ROLLING_WINDOWS[1]
+    if ("resample", granularity) not in cache:
+        cache[("resample", granularity)] = build_series_fig(dataset["series"], granularity)
+    if ("rolling", window) not in cache:
+        cache[("rolling", window)] = build_rolling_fig(dataset["series"], window)
+    return cache[("resample", granularity)], cache[("rolling", window)]
+
+## build duck cards one page at a time; the pager only exists once the personality tab is opened.
+## a search narrows the cards to its ranked matches and starts over at the first page
+@callback(
+    Output('personality-cards', 'children'),
+    Output('personality-pages', 'max_value'),
+    Output('personality-pages', 'active_page'),
+    Input('personality-pages', 'active_page'),
+    Input('duck-search', 'value'))
+def render_personality_page(active_page, search):
+    dataset = dataset_watcher.current
+    if any(t["prop_id"] == "duck-search.value" for t in dash.callback_context.triggered):
+        active_page = 1
+    page = max(active_page or 1, 1)
+    start = (page - 1) * CARDS_PER_PAGE
+    hits = dataset["search"].query(search or "")
+    if hits is None:
+        rows, n_ducks = dataset["ducks"](start, start + CARDS_PER_PAGE), len(dataset["table"])
+    else:
+        rows, n_ducks = dataset["ducks_at"](hits[start:start + CARDS_PER_PAGE]), len(hits)
+    cards = duck_card_page(rows, 1, dataset["cards"], image=duck_image, similar=similar_names(dataset))
+    return cards, page_count(n_ducks), page
+
+## ducks matching the location search inputs (None until the inputs for the mode are filled in)
+def geo_matches(dataset, mode, values):
+    lat, lon, km, south, west, north, east = values
+    if mode == 'box':
+        if None in (south, west, north, east):
+            return None
+        return dataset["geo_index"].box(float(south), float(west), float(north), float(east))
+    if None in (lat, lon, km) or km <= 0:
+        return None
+    return dataset["geo_index"].within(float(lat), float(lon), float(km))
+
+## map overlay for a location search: the searched area's outline and the matched ducks (clustered when there are many)
+def geo_highlight(mode, values, matches):
+    if matches is None:
+        return []
+    lat, lon, km, south, west, north, east = values
+    if mode == 'box':
+        outline_lat, outline_lon = [south, south, north, north, south], [west, east, east, west, west]
+    else:
+        outline_lat, outline_lon = circle_points(float(lat), float(lon), float(km))
+    traces = [go.Scattergeo(lat=np.round(outline_lat, 4), lon=np.round(outline_lon, 4), mode="lines",
+                            line=dict(color="Green", width=2), hoverinfo="skip", showlegend=False)]
+    if len(matches) > CLUSTER_MIN_POINTS:
+        c = grid_clusters(matches["Latitude"], matches["Longitude"], matches["Quantity"].fillna(0), matches["Name"], 0.25)
+        lat, lon, label = np.round(c["lat"], 4), np.round(c["lon"], 4), c["label"]
+    else:
+        lat, lon, label = matches["Latitude"], matches["Longitude"], matches["Name"].astype(str)
+    traces.append(go.Scattergeo(lat=lat, lon=lon, hovertext=label, hovertemplate="%{hovertext}<extra></extra>",
+                                mode="markers", marker=dict(color="LimeGreen", size=9, line=dict(width=1, color="DarkGreen")),
+                                showlegend=False))
+    return [trace.to_plotly_json() for trace in traces]
+
+## re-bin the clustered purchase markers when a map is zoomed far enough to change the grid cell, and
+## overlay the location search matches (uirevision on the figures keeps the user's zoom while traces are swapped).
+## both start from the map as the cross-filter panel currently draws it
+def register_map_zoom(map_id, figure_name):
+    @callback(
+        Output(map_id, 'figure', allow_duplicate=True),
+        Output(map_id + '-cell', 'data'),
+        Input(map_id, 'relayoutData'),
+        Input('geo-mode', 'value'),
+        *[Input(input_id, 'value') for input_id, _ in GEO_INPUTS],
+        State(map_id + '-cell', 'data'),
+        State('filter-years', 'value'),
+        State('filter-iso', 'value'),
+        State('filter-methods', 'value'),
+        State('filter-buyers', 'value'),
+        prevent_initial_call=True)
+    def zoom_map(relayout, mode, *values):
+        *values, current_cell, years, iso, methods, buyers = values
+        dataset = dataset_watcher.current
+        filters = current_filters(dataset, years, iso, methods, buyers)
+        ## markers for the selected ducks only, re-binned at the zoomed cell
+        clusters = filtered_geo_clusters(dataset, filters)
+        cell = current_cell
+        if any(t["prop_id"] == map_id + ".relayoutData" for t in dash.callback_context.triggered):
+            if not clusters.clustered or not relayout or "geo.projection.scale" not in relayout:
+                return dash.no_update, dash.no_update
+            cell = cell_for_scale(relayout["geo.projection.scale"], MAP_BASE_CELLS[map_id])
+            if cell == current_cell:
+                return dash.no_update, dash.no_update
+        fig = dict(tab_figures(dataset, 'geo-tab', filters).figure_json(figure_name))
+        ## the cached figure ends with the purchase markers at the map's base cell
+        markers = clusters.trace_json(cell) if clusters.clustered else fig["data"][-1]
+        fig["data"] = fig["data"][:-1] + [markers] + geo_highlight(mode, values, geo_matches(dataset, mode, values))
+        return fig, cell
+    return zoom_map
+
+## match count for the location search, plus the nearest ducks for a radius search
+@callback(
+    Output('geo-summary', 'children'),
+    Input('geo-mode', 'value'),
+    *[Input(input_id, 'value') for input_id, _ in GEO_INPUTS],
+    prevent_initial_call=True)
+def summarize_geo(mode, *values):
+    matches = geo_matches(dataset_watcher.current, mode, values)
+    if matches is None:
+        return "Enter a latitude, longitude and radius." if mode == 'radius' else "Enter the south, west, north and east edges."
+    summary = "{:,} ducks bought in {:,} cities".format(int(matches["Quantity"].fillna(0).sum()),
+                                                        matches["Purchase_City"].nunique())
+    if mode == 'radius' and len(matches):
+        nearest = ", ".join("{} ({} km)".format(name, km) for name, km in
+                            zip(matches["Name"].head(5), matches["Distance_km"].head(5)))
+        summary += ". Nearest: " + nearest
+    return summary
+
+register_map_zoom('country-map', 'country_fig')
+register_map_zoom('state-map', 'state_fig')
+
+## when the 3d scatter is zoomed in, spend the point budget on the region in view (coarse backdrop elsewhere)
+@callback(
+    Output('3d-scatter', 'figure', allow_duplicate=True),
+    Output('3d-scatter-region', 'data'),
+    Input('3d-scatter', 'relayoutData'),
+    State('3d-scatter-region', 'data'),
+    prevent_initial_call=True)
+def refine_three_d(relayout, current_region):
+    dataset = dataset_watcher.current
+    lod = dataset["lod_scatter"]
+    if not lod.downsampled or not relayout or 'scene.camera' not in relayout:
+        return dash.no_update, dash.no_update
+    region = camera_region(relayout['scene.camera'], *lod.bounds())
+    if region is not None:
+        region = np.round(np.asarray(region), 2).tolist()
+    if region == current_region:
+        return dash.no_update, dash.no_update
+    if region is None:
+        return dataset["figure_registry"].figure_json("three_d_fig"), None
+    return build_three_d_fig(lod.points(region=region)), region
 
 
 ## -------------------------------------------------------------------------------------------------
 # run app
 if __name__=="__main__":
-    app.run_server()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,164 @@
+## imports
+
+import threading
+from datetime import date
+
+import pandas as pd
+from flask import request, abort
+
+from figure_registry import Payload, dumps
+from duck_series import GRANULARITIES, ROLLING_WINDOWS
+from duck_table import TABLE_COLUMNS, PAGE_SIZE
+
+## url prefix of every endpoint
+API_PREFIX = "/api/v1"
+
+## largest page of duck records one request can ask for
+MAX_PAGE_SIZE = 500
+
+## most distinct responses (filters, pages, sorts) kept per data version before the cache starts over
+MAX_CACHED = 256
+
+## aggregate endpoints: table in the dataset's aggregates and the columns it returns
+AGGREGATES = {
+    "countries": ("county_df", ["ISO_Code", "Purchase_Country", "Quantity"]),
+    "states": ("state_df", ["Purchase_State", "Quantity"]),
+    "methods": ("purchase_method_df", ["Purchase_Method", "Quantity"]),
+    "buyers": ("buyer_df", ["Buyer", "Quantity"]),
+}
+
+
+## serialized responses of one dataset version: each distinct request is encoded and compressed once,
+## then every repeat (or If-None-Match revalidation) is a dict lookup
+class ApiCache:
+
+    def __init__(self, version):
+        self.version = version
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def payload(self, key, build):
+        payload = self._payloads.get(key)
+        if payload is None:
+            payload = Payload(dumps(dict(version=self.version, **build())))
+            with self._lock:
+                if len(self._payloads) > MAX_CACHED:
+                    self._payloads.clear()
+                self._payloads[key] = payload
+        return payload
+
+
+## rows of a frame as plain records (dates as iso strings, blanks as null)
+def records(frame):
+    frame = frame.copy()
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = frame[col].dt.strftime("%Y-%m-%d")
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict("records")
+
+
+## cross-filter from the query string: ?years=2019-2021&iso=USA,CAN&methods=Online&buyers=Allan
+def query_filters(args):
+    filters = {}
+    years = args.get("years")
+    if years:
+        try:
+            lo, _, hi = years.partition("-")
+            filters["years"] = [int(lo), int(hi or lo)]
+        except ValueError:
+            abort(400, "years must look like 2019 or 2019-2021")
+    for key in ("iso", "methods", "buyers"):
+        if args.get(key):
+            filters[key] = sorted(v for v in args[key].split(",") if v)
+    return filters
+
+
+def _int_arg(args, name, default, lo, hi):
+    try:
+        value = int(args.get(name, default))
+    except ValueError:
+        abort(400, "{} must be an integer".format(name))
+    return min(max(value, lo), hi)
+
+
+## chart tables for the filters in the query string (the unfiltered ones are already built)
+def _tables(dataset, filters):
+    return dataset["filtered_tables"](filters) if filters else dataset["aggregates"]
+
+
+## add the /api/v1 routes to a flask server; `current` returns the dataset version to answer from,
+## so a request started before a reload finishes against the version it began with
+def register_api(server, current):
+
+    def respond(key, build):
+        dataset = current()
+        return dataset["api"].payload(key, lambda: build(dataset)).response(request)
+
+    @server.route(API_PREFIX + "/kpis")
+    def api_kpis():
+        ## "bought in the last year" moves with the calendar, so the day is part of the key
+        today = date.today()
+        return respond(("kpis", today), lambda dataset: {
+            "date": today.isoformat(),
+            "kpis": {name: float(value) if name == "duck_weight" else int(value)
+                     for name, value in dataset["kpi_index"].kpis(today).items()},
+        })
+
+    @server.route(API_PREFIX + "/years")
+    def api_years():
+        filters = query_filters(request.args)
+
+        def build(dataset):
+            tables = _tables(dataset, filters)
+            yearly = tables["weight_cum_df"].rename(columns={"Quantity": "Cumulative_Quantity",
+                                                             "Total_Weight": "Cumulative_Weight"})
+            yearly.insert(1, "Quantity", tables["yearly_df"]["Quantity"].to_numpy())
+            yearly.insert(2, "Total_Weight", tables["weight_df"]["Total_Weight"].to_numpy())
+            return {"filters": filters, "years": records(yearly)}
+        return respond(("years", repr(filters)), build)
+
+    def register_aggregate(name, table, columns):
+        def api_aggregate():
+            filters = query_filters(request.args)
+            return respond((name, repr(filters)), lambda dataset: {
+                "filters": filters, name: records(_tables(dataset, filters)[table][columns])})
+        server.add_url_rule(API_PREFIX + "/" + name, "api_" + name, api_aggregate)
+
+    for name, (table, columns) in AGGREGATES.items():
+        register_aggregate(name, table, columns)
+
+    ## purchases resampled by day / week / month, or over a trailing window: ?granularity=W or ?window=90
+    @server.route(API_PREFIX + "/series")
+    def api_series():
+        granularity = request.args.get("granularity", "M")
+        window = request.args.get("window")
+        if granularity not in GRANULARITIES:
+            abort(400, "granularity must be one of {}".format(", ".join(GRANULARITIES)))
+        if window is not None and (not window.isdigit() or int(window) not in ROLLING_WINDOWS):
+            abort(400, "window must be one of {}".format(", ".join(map(str, ROLLING_WINDOWS))))
+        window = int(window) if window else None
+        return respond(("series", granularity, window), lambda dataset: {
+            "granularity": None if window else granularity, "window": window,
+            "series": records(dataset["series"].query(granularity, window=window))})
+
+    ## the collection table's records: ?page=0&page_size=50&sort=Name&direction=desc&filter={Name} contains 'quack',
+    ## narrowed to ranked search matches with ?q=
+    @server.route(API_PREFIX + "/ducks")
+    def api_ducks():
+        page = _int_arg(request.args, "page", 0, 0, 10 ** 9)
+        page_size = _int_arg(request.args, "page_size", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        sort = request.args.get("sort")
+        if sort is not None and sort not in TABLE_COLUMNS:
+            abort(400, "sort must be one of {}".format(", ".join(TABLE_COLUMNS)))
+        direction = "desc" if request.args.get("direction") == "desc" else "asc"
+        sort_by = [{"column_id": sort, "direction": direction}] if sort else None
+        filter_query = request.args.get("filter", "")
+        search = request.args.get("q", "")
+
+        def build(dataset):
+            hits = dataset["search"].query(search)
+            rows, page_count = dataset["table"].page(page, page_size, sort_by, filter_query, hits)
+            return {"page": page, "page_size": page_size, "page_count": page_count,
+                    "matches": None if hits is None else len(hits), "ducks": rows}
+        return respond(("ducks", page, page_size, sort, direction, filter_query, search), build)
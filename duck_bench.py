@@ -0,0 +1,265 @@
+## imports
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from duck_synth import DuckCatalog, generate_ducks, write_ducks
+
+## collection sizes benchmarked by default
+SIZES = [133, 1_000, 10_000, 50_000]
+
+## workbook the synthetic datasets are learned from
+SOURCE_PATH = "./data/duck_data.xlsx"
+
+## where result files are written, one json per run
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_results")
+
+## how many times each warm callback is repeated (the median is reported)
+REPEAT = 5
+
+TABS = ['general-tab', 'year-weight-tab', 'geo-tab', 'personality-tab']
+
+
+## -------------------------------------------------------------------------------------------------
+## datasets
+
+## the real collection as-is at its own size, synthetic ducks learned from it beyond that
+def bench_ducks(catalog, n, seed=0):
+    if n <= len(catalog.raw):
+        return catalog.raw.head(n).copy()
+    return generate_ducks(n, seed, catalog)
+
+
+## -------------------------------------------------------------------------------------------------
+## measurements
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+## peak resident memory of this process so far, in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ## linux reports KB, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+## time each step of a dataset build separately: load, prepare, each groupby, each figure, cards, indexes
+def stage_timings(path):
+    from duck_loader import load_ducks, read_ducks
+    from duck_engine import prepare_ducks, build_grain, build_aggregates, build_kpis, _rollup
+    from duck_store import AggregateStore
+    from duck_kpis import KpiIndex
+    from duck_geo import GeoClusters
+    from duck_lod import LodScatter
+    from duck_cube import build_cube
+    from duck_table import TableIndex
+    from duck_card import duck_card_page, CARDS_PER_PAGE
+    from figure_registry import FigureRegistry
+    import analyducks
+
+    stages = {}
+    raw, stages["load.source"] = _timed(read_ducks, path)
+    load_ducks(path)
+    _, stages["load.snapshot"] = _timed(load_ducks, path)
+    df, stages["prepare"] = _timed(prepare_ducks, raw)
+
+    grain, stages["groupby.grain"] = _timed(build_grain, df)
+    for name, keys in [("state_df", ["Purchase_State"]), ("county_df", ["ISO_Code", "Purchase_Country"]),
+                       ("purchase_method_df", ["Purchase_Method"]), ("buyer_df", ["Buyer"])]:
+        _, stages["groupby." + name] = _timed(_rollup, grain, keys)
+    _, stages["groupby.year"] = _timed(lambda: grain.groupby("Year")[["Quantity", "Total_Weight"]].sum())
+    _, stages["groupby.all_from_rows"] = _timed(build_aggregates, df)
+    store, stages["store.rebuild"] = _timed(AggregateStore, df)
+    aggregates, stages["store.aggregates"] = _timed(store.aggregates)
+    _, stages["kpis"] = _timed(build_kpis, df)
+    kpi_index, stages["kpi_index"] = _timed(KpiIndex, df)
+    _, stages["kpi_index.kpis"] = _timed(kpi_index.kpis)
+
+    geo_clusters, stages["geo_clusters"] = _timed(GeoClusters, df)
+    lod_scatter, stages["lod_scatter"] = _timed(LodScatter, df, analyducks.POINT_BUDGET)
+    figures = {}
+    for name, builder in analyducks.FIGURE_BUILDERS.items():
+        figures[name], stages["figure." + name] = _timed(builder, df, aggregates, geo_clusters, lod_scatter)
+    _, stages["figure_registry.warm"] = _timed(lambda: FigureRegistry("bench", figures).warm())
+
+    _, stages["cube"] = _timed(build_cube, df)
+    _, stages["table_index"] = _timed(TableIndex, df)
+    _, stages["cards.first_page"] = _timed(duck_card_page, df, 1, {}, CARDS_PER_PAGE)
+    return {name: round(seconds, 6) for name, seconds in stages.items()}
+
+
+## dash callback request body for the flask test client; `changed` is how many of the leading inputs
+## triggered the call (all of them by default)
+def _dash_request(output, inputs, state=(), changed=None):
+    body = {"inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+            "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+            "changedPropIds": ["{}.{}".format(i, p) for i, p, _ in inputs[:changed]]}
+    if "..." in output:
+        body["output"] = output
+        body["outputs"] = [{"id": o.split(".")[0], "property": o.split(".")[1]} for o in output.strip(".").split("...")]
+    else:
+        component, prop = output.split(".")
+        body["output"] = output
+        body["outputs"] = {"id": component, "property": prop}
+    return body
+
+
+## cold (first) and warm (median of `repeat`) time for each page/callback of a running app
+def callback_timings(client, years, repeat=REPEAT):
+    filters = [("filter-years", "value", years), ("filter-iso", "value", None),
+               ("filter-methods", "value", None), ("filter-buyers", "value", None)]
+    requests = {"get.layout": ("get", "/_dash-layout", None)}
+    for tab in TABS:
+        requests["tab." + tab] = ("post", "/_dash-update-component",
+                                  _dash_request("tab-content.children", [("tabs", "active_tab", tab)] + filters))
+    narrowed = [("filter-years", "value", [years[-1], years[-1]])] + filters[1:]
+    requests["tab.general-tab.filtered"] = ("post", "/_dash-update-component",
+                                            _dash_request("tab-content.children", [("tabs", "active_tab", "general-tab")] + narrowed))
+    table = [("duck-table", "page_current", 0), ("duck-table", "page_size", 20),
+             ("duck-table", "sort_by", []), ("duck-table", "filter_query", ""), ("duck-search", "value", "")]
+    table_output = "..duck-table.data...duck-table.page_count.."
+    requests["table.page"] = ("post", "/_dash-update-component",
+                              _dash_request(table_output, [table[0][:2] + (3,)] + table[1:]))
+    requests["table.sort"] = ("post", "/_dash-update-component",
+                              _dash_request(table_output, table[:2] + [table[2][:2] + ([{"column_id": "Name", "direction": "desc"}],)] + table[3:]))
+    requests["table.filter"] = ("post", "/_dash-update-component",
+                                _dash_request(table_output, table[:3] + [table[3][:2] + ("{Purchase_Country} contains US",)] + table[4:]))
+    requests["table.search"] = ("post", "/_dash-update-component",
+                                _dash_request(table_output, table[:4] + [table[4][:2] + ("duck",)]))
+    cards_output = "..personality-cards.children...personality-pages.max_value...personality-pages.active_page.."
+    requests["cards.page"] = ("post", "/_dash-update-component",
+                              _dash_request(cards_output, [("personality-pages", "active_page", 2), ("duck-search", "value", "")], changed=1))
+    requests["figure.json"] = ("get", "/figures/three_d_fig.json", None)
+    ## tab bodies only carry figure urls since the graphs fetch their figures; a filtered tab's figures are built here
+    requests["figure.json.filtered"] = ("get", "/figures/owner_bar.json?years={0}-{0}".format(years[-1]), None)
+
+    timings = {}
+    for name, (method, url, body) in requests.items():
+        runs = []
+        size = None
+        for _ in range(repeat + 1):
+            start = time.perf_counter()
+            if method == "get":
+                response = client.get(url, headers={"Accept-Encoding": "gzip"})
+            else:
+                response = client.post(url, json=body)
+            runs.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError("{} returned {}: {}".format(name, response.status_code, response.data[:200]))
+            size = len(response.data)
+        timings[name] = {"cold_s": round(runs[0], 6), "warm_s": round(float(np.median(runs[1:])), 6), "bytes": size}
+    return timings
+
+
+## everything measured inside one fresh process serving `path`
+def measure_dash(path, repeat=REPEAT):
+    os.environ["ANALYDUCKS_DATA_PATH"] = path
+    os.environ["ANALYDUCKS_RELOAD_INTERVAL"] = "0"
+
+    start = time.perf_counter()
+    import analyducks
+    import_to_ready = time.perf_counter() - start
+    from duck_table import layout_payload_size
+
+    dataset = analyducks.dataset_watcher.current
+    years = [dataset["filter_options"]["years"][0], dataset["filter_options"]["years"][-1]]
+    return {
+        "rows": len(dataset["table"]),
+        "import_to_ready_s": round(import_to_ready, 6),
+        "layout_bytes": layout_payload_size(analyducks.serve_layout()),
+        "tab_bytes": {tab: layout_payload_size(analyducks.tab_content(dataset, tab)) for tab in TABS},
+        "callbacks": callback_timings(analyducks.server.test_client(), years, repeat),
+        "stages": stage_timings(path),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+## cold and warm script runs of the streamlit app
+def measure_streamlit(path, timeout=600):
+    os.environ["ANALYDUCKS_DATA_PATH"] = path
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit-web-app-ducks.py"),
+                            default_timeout=timeout)
+    _, cold = _timed(app.run)
+    _, warm = _timed(app.run)
+    return {"cold_run_s": round(cold, 6), "warm_run_s": round(warm, 6),
+            "exceptions": [str(e.value) for e in app.exception],
+            "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+
+## run one measurement in a clean interpreter, so import time and peak memory aren't polluted by earlier sizes
+def run_isolated(kind, path, repeat=REPEAT):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", kind, path, "--repeat", str(repeat)],
+                            check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+## `fmt` is the file type the apps read the data from: xlsx like production, or csv / parquet for sizes excel can't hold
+def run_suite(sizes=SIZES, source=SOURCE_PATH, streamlit=False, repeat=REPEAT, seed=0, fmt="xlsx"):
+    catalog = DuckCatalog.from_workbook(source)
+    results = {
+        "started": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "source": source,
+        "seed": seed,
+        "format": fmt,
+        "sizes": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = write_ducks(bench_ducks(catalog, n, seed), os.path.join(tmp, "ducks-{}.{}".format(n, fmt)))
+            entry = {"size": n, "dash": run_isolated("dash", path, repeat)}
+            if streamlit:
+                entry["streamlit"] = run_isolated("streamlit", path, repeat)
+            results["sizes"].append(entry)
+            print("{:>9,} rows  ready {:6.2f}s  layout {:>9,} B  peak {:7.1f} MB".format(
+                n, entry["dash"]["import_to_ready_s"], entry["dash"]["layout_bytes"], entry["dash"]["peak_rss_mb"]),
+                file=sys.stderr)
+    return results
+
+
+def write_results(results, out=None):
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, "bench-{}.json".format(results["started"].replace(":", "")))
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Analyducks apps at several collection sizes.")
+    parser.add_argument("sizes", nargs="*", type=int, default=SIZES)
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument("--streamlit", action="store_true", help="also time script runs of the streamlit app")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", default="xlsx", choices=["xlsx", "csv", "parquet"])
+    parser.add_argument("--out", help="result file (default: bench_results/bench-<timestamp>.json)")
+    parser.add_argument("--worker", nargs=2, metavar=("KIND", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        kind, path = args.worker
+        result = measure_dash(path, args.repeat) if kind == "dash" else measure_streamlit(path)
+        print(json.dumps(result))
+    else:
+        print(write_results(run_suite(args.sizes, args.source, args.streamlit, args.repeat, args.seed, args.format), args.out))
@@ -4,10 +4,12 @@ import dash
 from dash import html, dcc  #, callback # If you need callbacks, import it here.
 import dash_bootstrap_components as dbc
 
-def create_card_A(name,about, city, country, date, weight, height, width, length):
+def create_card_A(name,about, city, country, date, weight, height, width, length, image=None, similar=None):
     card_A = dbc.Card(
     [
         # dbc.CardImg(src=image, top=True,style={"border-top":"#2C2F36","border-top-left-radius":"2%","border-top-right-radius":"2%"}),
+        ## `image` is an <img> tag (see duck_thumbs.ThumbnailStore.img_html); markdown is the way to get loading="lazy" onto it
+        *([dcc.Markdown(image, dangerously_allow_html=True)] if image else []),
         dbc.CardBody(
             [
                 html.H4(name, className="card-title"),
@@ -15,7 +17,10 @@ def create_card_A(name,about, city, country, date, weight, height, width, length
                 html.P("Purchase Location: "+city+", "+country, className="card-text"),
                 html.P("Purchase Date: "+str(date), className="card-text"),
                 html.P("Weight: "+str(weight)+"g", className="card-text"),
-                html.P("H x W x L: "+str(height)+"cm x "+str(weight)+"cm x "+str(length)+"cm", className="card-text")
+                html.P("H x W x L: "+str(height)+"cm x "+str(weight)+"cm x "+str(length)+"cm", className="card-text"),
+                ## nearest ducks by size and weight (duck_similar.SimilarDucks), collapsed until opened
+                *([html.Details([html.Summary("Ducks like me"), html.Ul([html.Li(str(n)) for n in similar])],
+                                className="card-text")] if similar else [])
             ]
         ),
     ],
@@ -24,4 +29,30 @@ def create_card_A(name,about, city, country, date, weight, height, width, length
            },
     className="cardA"
 )
-    return card_A
\ No newline at end of file
+    return card_A
+
+## number of duck cards rendered per page of the personality tab
+CARDS_PER_PAGE = 12
+
+
+def page_count(n_ducks, per_page=CARDS_PER_PAGE):
+    return max(1, -(-n_ducks // per_page))
+
+
+## cards for one page of ducks; each card is built once per duck and kept in `cache`
+## (one cache per data version, so edited ducks get a fresh card after a reload).
+## `image` maps a duck name to its <img> tag, when the cards should show a picture;
+## `similar` maps a duck id to the names of the ducks most like it
+def duck_card_page(df, page, cache, per_page=CARDS_PER_PAGE, image=None, similar=None):
+    start = (max(page, 1) - 1) * per_page
+    rows = df.iloc[start:start + per_page]
+    cards = []
+    for duck_id, name, about, city, country, dt, weight, height, width, length in zip(
+            rows.index, rows.Name, rows['About Me'], rows.Purchase_City, rows.Purchase_Country,
+            rows.Date_Bought, rows.Total_Weight, rows.Height, rows.Width, rows.Length):
+        if duck_id not in cache:
+            cache[duck_id] = create_card_A(name, about, city, country, dt, weight, height, width, length,
+                                           image(name) if image else None,
+                                           similar(duck_id) if similar else None)
+        cards.append(cache[duck_id])
+    return cards
@@ -0,0 +1,150 @@
+## imports
+
+import numpy as np
+import pandas as pd
+
+from duck_engine import build_aggregates
+
+## cube axes, in storage order
+CUBE_DIMS = ["Year", "ISO_Code", "Purchase_State", "Purchase_Method", "Buyer"]
+
+## refuse to allocate a dense cube bigger than this many cells (per measure); callers fall back to pandas
+MAX_CELLS = 20_000_000
+
+## filter keys understood by DuckCube.tables / filter_frame, and the column each one selects on
+FILTER_COLUMNS = {"iso": "ISO_Code", "methods": "Purchase_Method", "buyers": "Buyer"}
+
+
+def _labels(values):
+    codes, labels = pd.factorize(values, sort=True)
+    ## blank keys (e.g. non-US purchases have no state) get their own trailing slot so totals still add up
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = list(labels) + [None]
+    return codes, list(labels)
+
+
+def cube_cells(df):
+    return int(np.prod([df[dim].nunique(dropna=False) for dim in CUBE_DIMS], dtype=np.float64))
+
+
+## no filter set means "everything"
+def filters_active(filters):
+    return bool(filters) and any(filters.get(k) for k in ("years",) + tuple(FILTER_COLUMNS))
+
+
+## dense Quantity / Total_Weight / row-count cubes over Year x ISO x State x Method x Buyer;
+## any filtered chart table is a masked sum over these arrays instead of a groupby on the full frame
+class DuckCube:
+
+    def __init__(self, df):
+        codes = []
+        self.labels = {}
+        for dim in CUBE_DIMS:
+            c, labels = _labels(df[dim])
+            codes.append(c)
+            self.labels[dim] = labels
+        self.shape = tuple(len(self.labels[dim]) for dim in CUBE_DIMS)
+        if np.prod(self.shape, dtype=np.float64) > MAX_CELLS:
+            raise MemoryError("cube of shape {} is over MAX_CELLS".format(self.shape))
+
+        flat = np.ravel_multi_index(codes, self.shape)
+        size = int(np.prod(self.shape))
+        self.quantity = np.bincount(flat, weights=df["Quantity"].fillna(0), minlength=size).reshape(self.shape)
+        self.weight = np.bincount(flat, weights=df["Total_Weight"].fillna(0), minlength=size).reshape(self.shape)
+        self.rows = np.bincount(flat, minlength=size).reshape(self.shape)
+
+        ## country name for each ISO code, for the country choropleth hover
+        self.countries = df.drop_duplicates("ISO_Code").set_index("ISO_Code")["Purchase_Country"].to_dict()
+        self.year_dtype = df["Year"].dtype
+        self.quantity_dtype = df["Quantity"].dtype
+
+    def options(self, dim):
+        return [label for label in self.labels[dim] if label is not None]
+
+    def _mask(self, dim, selected):
+        labels = self.labels[dim]
+        if not selected:
+            return np.ones(len(labels), dtype=bool)
+        selected = set(selected)
+        return np.array([label in selected for label in labels])
+
+    ## undated ducks have a None year label: kept when no years are picked, outside every range otherwise
+    def _year_mask(self, years):
+        labels = self.labels["Year"]
+        if not years:
+            return np.ones(len(labels), dtype=bool)
+        return np.array([label is not None and years[0] <= label <= years[1] for label in labels])
+
+    ## sub-cubes for a filter dict {"years": (lo, hi), "iso": [...], "methods": [...], "buyers": [...]}
+    def slice(self, filters=None):
+        filters = filters or {}
+        masks = [
+            self._year_mask(filters.get("years")),
+            self._mask("ISO_Code", filters.get("iso")),
+            np.ones(self.shape[2], dtype=bool),
+            self._mask("Purchase_Method", filters.get("methods")),
+            self._mask("Buyer", filters.get("buyers")),
+        ]
+        index = np.ix_(*masks)
+        labels = {dim: [l for l, keep in zip(self.labels[dim], mask) if keep] for dim, mask in zip(CUBE_DIMS, masks)}
+        return labels, self.quantity[index], self.weight[index], self.rows[index]
+
+    ## the build_aggregates chart tables for a filter, reduced from the cube
+    def tables(self, filters=None):
+        labels, quantity, weight, rows = self.slice(filters)
+        axes = range(len(CUBE_DIMS))
+
+        ## groupby only returns groups that have rows, and drops blank keys
+        def rollup(dim, measure_cube, measure):
+            keep = tuple(a for a in axes if a != CUBE_DIMS.index(dim))
+            present = (rows.sum(axis=keep) > 0) & np.array([l is not None for l in labels[dim]], dtype=bool)
+            keys = [l for l, p in zip(labels[dim], present) if p]
+            return pd.DataFrame({dim: keys, measure: measure_cube.sum(axis=keep)[present]})
+
+        quantity_type = self.quantity_dtype
+        state_df = rollup("Purchase_State", quantity, "Quantity").astype({"Quantity": quantity_type})
+        state_df = state_df[state_df["Purchase_State"]!=""]
+        county_df = rollup("ISO_Code", quantity, "Quantity").astype({"Quantity": quantity_type})
+        county_df.insert(1, "Purchase_Country", county_df["ISO_Code"].map(self.countries))
+
+        yearly = rollup("Year", quantity, "Quantity").astype({"Quantity": quantity_type, "Year": self.year_dtype})
+        yearly["Total_Weight"] = rollup("Year", weight, "Total_Weight")["Total_Weight"].to_numpy()
+        yearly = yearly.set_index("Year")
+
+        return {
+            "state_df": state_df,
+            "county_df": county_df,
+            "purchase_method_df": rollup("Purchase_Method", quantity, "Quantity").astype({"Quantity": quantity_type}),
+            "buyer_df": rollup("Buyer", quantity, "Quantity").astype({"Quantity": quantity_type}),
+            "yearly_df": yearly[["Quantity"]].reset_index(),
+            "weight_df": yearly[["Total_Weight"]].reset_index(),
+            "weight_cum_df": yearly.cumsum().reset_index(),
+        }
+
+
+## rows of `df` matching a filter dict (used when a cube would be too large)
+def filter_frame(df, filters=None):
+    filters = filters or {}
+    mask = np.ones(len(df), dtype=bool)
+    if filters.get("years"):
+        lo, hi = filters["years"]
+        mask &= (df["Year"] >= lo).to_numpy() & (df["Year"] <= hi).to_numpy()
+    for key, col in FILTER_COLUMNS.items():
+        if filters.get(key):
+            mask &= df[col].isin(filters[key]).to_numpy()
+    return df[mask]
+
+
+## chart tables for a filter: cube reduction when there is a cube, pandas groupbys on the filtered rows otherwise
+def filtered_tables(cube, df, filters=None):
+    if cube is not None:
+        return cube.tables(filters)
+    return build_aggregates(filter_frame(df, filters))
+
+
+## cube for a prepared frame, or None when the dimensions are too high-cardinality for a dense array
+def build_cube(df):
+    if cube_cells(df) > MAX_CELLS:
+        return None
+    return DuckCube(df)
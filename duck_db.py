@@ -0,0 +1,471 @@
+## imports
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from duck_loader import read_ducks
+from duck_engine import prepare_ducks, GRAIN
+from duck_synth import COLUMNS
+from duck_geo import GeoClusters, GeoIndex, CLUSTER_MIN_POINTS, haversine_km, radius_box, rank_cities
+from duck_lod import LodScatter, POINT_BUDGET, AXES
+from duck_table import TABLE_COLUMNS, PAGE_SIZE, filter_text, split_filter_part
+from duck_kpis import KpiIndex
+from duck_search import SEARCH_FIELDS, MAX_CACHED, tokenize
+
+## where the importer writes the database
+DB_PATH = "./data/ducks.sqlite"
+
+## columns the dashboards filter, group or range-scan on
+INDEXED = ["Date_Bought", "ISO_Code", "Purchase_State", "Purchase_Method", "Buyer"]
+
+## sheet columns plus the two prepare_ducks adds; Date_Bought is stored as ISO text so it sorts and range-scans as a date
+NUMERIC = {"Latitude": "REAL", "Longitude": "REAL", "Quantity": "INTEGER", "Total_Weight": "REAL",
+           "Height": "REAL", "Width": "REAL", "Length": "REAL", "Year": "INTEGER", "Avg_Weight": "REAL"}
+DB_COLUMNS = COLUMNS + ["Year", "Avg_Weight"]
+
+## full-text table over the duck_search.SEARCH_FIELDS columns; prefix indexes keep short "as you type" prefixes fast
+SEARCH_TABLE = "ducks_search"
+SEARCH_PREFIXES = "1 2 3"
+
+## dash filter_query operators as sql
+SQL_OPERATORS = {"eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+
+
+def _quote(column):
+    return '"{}"'.format(column.replace('"', '""'))
+
+
+def _and(where, clause):
+    return (where + " AND " if where else " WHERE ") + clause
+
+
+## -------------------------------------------------------------------------------------------------
+## importer
+
+## load a workbook (or csv / parquet) into a fresh database file, then swap it in atomically so a running
+## app only ever sees a complete import
+def import_ducks(source, db_path=DB_PATH, sheet_name="Ducks"):
+    df = prepare_ducks(read_ducks(source, sheet_name))
+    df["Date_Bought"] = pd.to_datetime(df["Date_Bought"]).dt.strftime("%Y-%m-%d")
+    ## numbers in text columns (a duck named 32) are stored as text, like the table shows them
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+    tmp = "{}.{}.tmp".format(db_path, os.getpid())
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        columns = ", ".join("{} {}".format(_quote(col), NUMERIC.get(col, "TEXT")) for col in DB_COLUMNS)
+        conn.execute("CREATE TABLE ducks (id INTEGER PRIMARY KEY, {})".format(columns))
+        ## rows go in purchase-date order, so id order is the order the pandas path shows them in
+        conn.executemany("INSERT INTO ducks ({}) VALUES ({})".format(", ".join(_quote(c) for c in DB_COLUMNS),
+                                                                  ", ".join("?" * len(DB_COLUMNS))),
+                         df[DB_COLUMNS].astype(object).where(df[DB_COLUMNS].notna(), None).itertuples(index=False, name=None))
+        for col in INDEXED:
+            conn.execute("CREATE INDEX ix_ducks_{0} ON ducks ({1})".format(col.lower(), _quote(col)))
+        ## radius / box queries range-scan latitude and test longitude from the same index entries
+        conn.execute("CREATE INDEX ix_ducks_location ON ducks (Latitude, Longitude)")
+        ## external-content fts5 index: the text stays in ducks, only the token postings are added
+        conn.execute("CREATE VIRTUAL TABLE {} USING fts5({}, content='ducks', content_rowid='id', prefix='{}')".format(
+            SEARCH_TABLE, ", ".join(_quote(c) for c in SEARCH_FIELDS), SEARCH_PREFIXES))
+        conn.execute("INSERT INTO {0} ({0}) VALUES ('rebuild')".format(SEARCH_TABLE))
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, db_path)
+    return len(df)
+
+
+## -------------------------------------------------------------------------------------------------
+## queries
+
+## read-only access to an imported database; every aggregate is computed by sqlite and only the result
+## comes back, so memory follows the size of the charts rather than the size of the collection
+class DuckDB:
+
+    def __init__(self, path=DB_PATH):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+
+    ## one connection per thread (dash serves callbacks from several)
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True,
+                                                      check_same_thread=False)
+        return conn
+
+    def query(self, sql, params=()):
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def scalar(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchone()[0]
+
+    def __len__(self):
+        return self.scalar("SELECT COUNT(*) FROM ducks")
+
+    ## WHERE clause for a duck_cube filter dict {"years": [lo, hi], "iso": [...], "methods": [...], "buyers": [...]}
+    def where(self, filters=None):
+        filters = filters or {}
+        clauses, params = [], []
+        if filters.get("years"):
+            clauses.append("Year BETWEEN ? AND ?")
+            params.extend(int(y) for y in filters["years"])
+        for key, column in (("iso", "ISO_Code"), ("methods", "Purchase_Method"), ("buyers", "Buyer")):
+            if filters.get(key):
+                clauses.append("{} IN ({})".format(column, ", ".join("?" * len(filters[key]))))
+                params.extend(filters[key])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _rollup(self, keys, where, params, measure="Quantity", extra=""):
+        columns = ", ".join(keys)
+        where = _and(where, " AND ".join("{} IS NOT NULL".format(k) for k in keys) + extra)
+        return self.query("SELECT {0}, SUM({1}) AS {1} FROM ducks{2} GROUP BY {0} ORDER BY {0}".format(
+            columns, measure, where), params)
+
+    ## the duck_engine.build_aggregates tables, each one a GROUP BY in sqlite
+    def aggregates(self, filters=None):
+        where, params = self.where(filters)
+        grain = self.query("SELECT {0}, SUM(Quantity) AS Quantity, SUM(Total_Weight) AS Total_Weight "
+                           "FROM ducks{1} GROUP BY {0}".format(", ".join(GRAIN), where), params)
+        yearly = self.query("SELECT Year, SUM(Quantity) AS Quantity, SUM(Total_Weight) AS Total_Weight "
+                            "FROM ducks{} GROUP BY Year ORDER BY Year".format(_and(where, "Year IS NOT NULL")), params).set_index("Year")
+        return {
+            "grain": grain,
+            "state_df": self._rollup(["Purchase_State"], where, params, extra=" AND Purchase_State != ''"),
+            "county_df": self._rollup(["ISO_Code", "Purchase_Country"], where, params),
+            "purchase_method_df": self._rollup(["Purchase_Method"], where, params),
+            "buyer_df": self._rollup(["Buyer"], where, params),
+            "yearly_df": yearly[["Quantity"]].reset_index(),
+            "weight_df": yearly[["Total_Weight"]].reset_index(),
+            "weight_cum_df": yearly.cumsum().reset_index(),
+        }
+
+    ## Quantity / Total_Weight per purchase day, at most one row per calendar day
+    def daily(self):
+        return self.query("SELECT Date_Bought, SUM(Quantity) AS Quantity, SUM(Total_Weight) AS Total_Weight "
+                          "FROM ducks WHERE Date_Bought IS NOT NULL GROUP BY Date_Bought ORDER BY Date_Bought")
+
+    ## KPI index over the daily totals: same answers as one over every duck, a row per day instead of per duck
+    def kpi_index(self):
+        totals = self.conn.execute("SELECT ROUND(SUM(Total_Weight), 4), SUM(Quantity), COUNT(DISTINCT Purchase_Country), "
+                                   "COUNT(DISTINCT Purchase_City) FROM ducks").fetchone()
+        return KpiIndex.from_daily(self.daily(), dict(zip(
+            ["duck_weight", "total_ducks", "unique_countries", "unique_cities"], totals)))
+
+    def kpis(self, today=None):
+        return self.kpi_index().kpis(today)
+
+    ## values for the cross-filter panel
+    def filter_options(self):
+        return {
+            "years": [int(y) for y in self.query("SELECT DISTINCT Year FROM ducks WHERE Year IS NOT NULL ORDER BY Year")["Year"]],
+            "countries": list(self.conn.execute("SELECT ISO_Code, MIN(Purchase_Country) FROM ducks WHERE ISO_Code IS NOT NULL "
+                                                "GROUP BY ISO_Code ORDER BY 2").fetchall()),
+            "methods": [r[0] for r in self.conn.execute("SELECT DISTINCT Purchase_Method FROM ducks "
+                                                        "WHERE Purchase_Method IS NOT NULL ORDER BY 1")],
+            "buyers": [r[0] for r in self.conn.execute("SELECT DISTINCT Buyer FROM ducks WHERE Buyer IS NOT NULL ORDER BY 1")],
+        }
+
+    ## ducks start..stop in purchase order (the rows behind one page of duck cards)
+    def ducks(self, start, stop):
+        frame = self.query("SELECT * FROM ducks ORDER BY id LIMIT ? OFFSET ?", (max(stop - start, 0), start))
+        return frame.set_index("id")
+
+    ## ducks at the given row positions, in that order
+    def ducks_at(self, positions):
+        frame = self.query("SELECT ducks.* FROM ducks JOIN json_each(?) AS hits ON hits.value = ducks.id ORDER BY hits.key",
+                           (json.dumps([int(p) + 1 for p in positions]),))
+        return frame.set_index("id")
+
+    ## named columns of every duck in id (= row position + 1) order, e.g. to build the similarity index
+    def columns(self, columns):
+        return self.query("SELECT id, {} FROM ducks ORDER BY id".format(", ".join(_quote(c) for c in columns))).set_index("id")
+
+    ## names of the given duck ids, in the same order
+    def names(self, ids):
+        ids = [int(i) for i in ids]
+        names = dict(self.conn.execute("SELECT id, Name FROM ducks WHERE id IN ({})".format(", ".join("?" * len(ids))), ids).fetchall())
+        return [names.get(i) for i in ids]
+
+    ## -------------------------------------------------------------------------------------------------
+    ## collection table: same paging / sorting / filtering as duck_table.TableIndex, done by sqlite
+
+    def _table_filter(self, filter_query):
+        clauses, params = [], []
+        for part in (filter_query or "").split(" && "):
+            name, operator, value = split_filter_part(part)
+            if name not in TABLE_COLUMNS:
+                continue
+            column = _quote(name)
+            if operator in SQL_OPERATORS:
+                if name in NUMERIC:
+                    ## same as TableIndex.mask: a value that isn't a number matches no rows, or every row for ne
+                    value = pd.to_numeric(value, errors="coerce")
+                    if value != value:
+                        if operator != "ne":
+                            clauses.append("0")
+                        continue
+                    clauses.append("{} {} ?".format(column, SQL_OPERATORS[operator]))
+                    value = float(value)
+                else:
+                    clauses.append("CAST({} AS TEXT) {} ?".format(column, SQL_OPERATORS[operator]))
+                    value = filter_text(value)
+            elif operator == "contains":
+                clauses.append("instr(lower(CAST({} AS TEXT)), lower(?)) > 0".format(column))
+                value = filter_text(value)
+            elif operator == "datestartswith":
+                clauses.append("substr(CAST({} AS TEXT), 1, length(?)) = ?".format(column))
+                params.append(filter_text(value))
+                value = filter_text(value)
+            else:
+                continue
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    ## `hits` are ranked row positions from a duck_search.SearchIndex (row position = id - 1)
+    def page(self, page_current=0, page_size=PAGE_SIZE, sort_by=None, filter_query="", hits=None):
+        page_current = page_current or 0
+        page_size = page_size or PAGE_SIZE
+        where, params = self._table_filter(filter_query)
+
+        source, order = "ducks", "ducks.id"
+        if hits is not None:
+            ## the matches go in as one json array parameter; its array index is the search rank
+            source, order = "ducks JOIN json_each(?) AS hits ON hits.value = ducks.id", "hits.key"
+            params = [json.dumps([int(p) + 1 for p in hits])] + params
+        if sort_by and sort_by[0]["column_id"] in TABLE_COLUMNS:
+            column = "ducks." + _quote(sort_by[0]["column_id"])
+            direction = "DESC" if sort_by[0]["direction"] == "desc" else "ASC"
+            if sort_by[0]["column_id"] in NUMERIC:
+                ## blanks sort after every number (before them when descending), as in TableIndex.order
+                order = "{0} IS NULL {1}, {0} {1}, ducks.id {1}".format(column, direction)
+            else:
+                order = "lower(COALESCE({0}, '')) {1}, ducks.id {1}".format(column, direction)
+
+        rows = self.scalar("SELECT COUNT(*) FROM " + source + where, params)
+        frame = self.query("SELECT {} FROM {}{} ORDER BY {} LIMIT ? OFFSET ?".format(
+            ", ".join("ducks." + _quote(c) for c in TABLE_COLUMNS), source, where, order),
+            params + [page_size, page_current * page_size])
+        frame = frame.astype(object)
+        return frame.where(frame.notna(), None).to_dict("records"), max(1, -(-rows // page_size))
+
+    ## -------------------------------------------------------------------------------------------------
+    ## point layers
+
+    ## duck_geo.grid_clusters as a GROUP BY over grid cells, for the ducks matching a cross-filter
+    def grid_clusters(self, cell, filters=None):
+        where, params = self.where(filters)
+        frame = self.query(
+            "SELECT CAST((Latitude + 90) / ? AS INTEGER) AS r, CAST((Longitude + 180) / ? AS INTEGER) AS c, "
+            "COUNT(*) AS rows, SUM(COALESCE(Quantity, 0)) AS count, AVG(Latitude) AS lat, AVG(Longitude) AS lon, "
+            "MIN(Name) AS name FROM ducks{} GROUP BY r, c ORDER BY r, c".format(
+                _and(where, "Latitude IS NOT NULL AND Longitude IS NOT NULL")), [cell, cell] + params)
+        count = frame["count"].to_numpy(dtype=float)
+        rows = frame["rows"].to_numpy()
+        return {
+            "lat": frame["lat"].to_numpy(), "lon": frame["lon"].to_numpy(), "rows": rows, "count": count,
+            "label": np.where(rows == 1, frame["name"].astype(str).to_numpy(),
+                              np.char.add(count.astype(np.int64).astype(str), " ducks")),
+        }
+
+    def _voxel_sql(self, lo, span, resolution, where):
+        keys = ["MIN(CAST(({0} - {1!r}) / {2!r} * {3} AS INTEGER), {4})".format(axis, float(l), float(s), resolution, resolution - 1)
+                for axis, l, s in zip(AXES, lo, span)]
+        return "FROM ducks WHERE {} GROUP BY {}".format(where, ", ".join(keys))
+
+    ## duck_lod.voxel_downsample as GROUP BYs over voxel keys: a few counting passes to pick the resolution,
+    ## then one pass for the centroids (the pandas path also keeps outliers as their own points; this one doesn't)
+    def voxel_points(self, budget, lo=None, hi=None, inside=True):
+        complete = " AND ".join("{} IS NOT NULL".format(c) for c in AXES + ["Avg_Weight"])
+        box_lo, box_hi = self.bounds()
+        where = complete
+        if lo is not None:
+            box = " AND ".join("{0} BETWEEN {1!r} AND {2!r}".format(a, float(l), float(h)) for a, l, h in zip(AXES, lo, hi))
+            where = "{} AND {}({})".format(complete, "" if inside else "NOT ", box)
+        span = np.where(box_hi > box_lo, box_hi - box_lo, 1.0)
+
+        resolution = max(1, int(round(budget ** (1 / 3))))
+        for _ in range(8):
+            occupied = self.scalar("SELECT COUNT(*) FROM (SELECT 1 {})".format(self._voxel_sql(box_lo, span, resolution, where)))
+            if occupied > budget:
+                resolution = max(1, int(resolution / 1.26))
+            elif occupied < budget * 0.5 and resolution < 1024:
+                resolution = int(resolution * 1.26) + 1
+            else:
+                break
+        if self.scalar("SELECT COUNT(*) FROM (SELECT 1 {})".format(self._voxel_sql(box_lo, span, resolution, where))) > budget:
+            resolution = max(1, int(resolution / 1.26))
+
+        frame = self.query("SELECT ROUND(AVG(Length), 2) AS Length, ROUND(AVG(Width), 2) AS Width, "
+                           "ROUND(AVG(Height), 2) AS Height, ROUND(AVG(Avg_Weight), 2) AS Avg_Weight, COUNT(*) AS Count "
+                           + self._voxel_sql(box_lo, span, resolution, where))
+        frame["Name"] = np.char.add(frame["Count"].astype(str).to_numpy(), " ducks")
+        return frame
+
+    def bounds(self):
+        row = self.conn.execute("SELECT {} FROM ducks WHERE {}".format(
+            ", ".join("MIN({0}), MAX({0})".format(a) for a in AXES),
+            " AND ".join("{} IS NOT NULL".format(c) for c in AXES + ["Avg_Weight"]))).fetchone()
+        return np.array(row[0::2], dtype=float), np.array(row[1::2], dtype=float)
+
+
+## duck_geo.GeoClusters backed by the database: small collections still get one marker per duck,
+## large ones are clustered by sqlite without loading the coordinates
+class SqlGeoClusters(GeoClusters):
+
+    def __init__(self, db, min_points=CLUSTER_MIN_POINTS, filters=None):
+        self.db = db
+        self.filters = filters
+        where, params = db.where(filters)
+        self.clustered = db.scalar("SELECT COUNT(*) FROM ducks{}".format(where), params) > min_points
+        self.points = None if self.clustered else db.query(
+            "SELECT Latitude, Longitude, Name FROM ducks{} ORDER BY id".format(where), params)
+        self._traces = {}
+        self._lock = threading.Lock()
+
+    def clusters(self, cell):
+        return self.db.grid_clusters(cell, self.filters)
+
+
+## duck_geo.GeoIndex backed by the database: a box or radius query is a range scan of the (Latitude, Longitude)
+## index, so only the matching ducks (and a radius query's bounding box) come into memory. rows are the
+## `columns` of each duck, indexed by id
+class SqlGeoIndex(GeoIndex):
+
+    def __init__(self, db, columns):
+        self.db = db
+        self.columns = columns
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _select(self, where, params):
+        return self.db.query("SELECT id, {} FROM ducks WHERE Latitude IS NOT NULL AND Longitude IS NOT NULL AND {} "
+                             "ORDER BY id".format(", ".join(_quote(c) for c in self.columns), where), params).set_index("id")
+
+    ## latitude range plus a longitude range (or two, across the antimeridian); None west / east is every longitude
+    def _in_box(self, south, west, north, east):
+        where, params = "Latitude BETWEEN ? AND ?", [min(south, north), max(south, north)]
+        if west is None:
+            pass
+        elif west <= east:
+            where += " AND Longitude BETWEEN ? AND ?"
+            params += [west, east]
+        else:
+            where += " AND (Longitude >= ? OR Longitude <= ?)"
+            params += [west, east]
+        return self._select(where, params)
+
+    def _box(self, south, west, north, east):
+        return self._in_box(south, west, north, east)
+
+    def _within(self, lat, lon, km):
+        south, north, west, east = radius_box(lat, lon, km)
+        frame = self._in_box(south, west, north, east)
+        distance = haversine_km(lat, lon, frame["Latitude"].to_numpy(dtype=float), frame["Longitude"].to_numpy(dtype=float))
+        keep = distance <= km
+        frame, distance = frame[keep], distance[keep]
+        order = np.lexsort((frame.index.to_numpy(), distance))
+        return frame.iloc[order].assign(Distance_km=np.round(distance[order], 1))
+
+    def _city_distances(self, home):
+        cities = self.db.query(
+            "SELECT Purchase_City, Purchase_Country, SUM(COALESCE(Quantity, 0)) AS Ducks, AVG(Latitude) AS Latitude, "
+            "AVG(Longitude) AS Longitude FROM ducks WHERE Latitude IS NOT NULL AND Longitude IS NOT NULL "
+            "AND Purchase_City IS NOT NULL AND Purchase_Country IS NOT NULL "
+            "GROUP BY Purchase_City, Purchase_Country ORDER BY MIN(id)")
+        return rank_cities(cities, home)
+
+    def default_home(self):
+        top = self.db.conn.execute(
+            "SELECT AVG(Latitude), AVG(Longitude) FROM ducks WHERE Latitude IS NOT NULL AND Longitude IS NOT NULL "
+            "AND Purchase_City IS NOT NULL GROUP BY Purchase_City "
+            "ORDER BY SUM(COALESCE(Quantity, 0)) DESC, Purchase_City LIMIT 1").fetchone()
+        return (float(top[0]), float(top[1])) if top else (0.0, 0.0)
+
+
+## duck_lod.LodScatter backed by the database: rows are only loaded when they fit the point budget
+class SqlLodScatter(LodScatter):
+
+    def __init__(self, db, budget=POINT_BUDGET):
+        self.db = db
+        self.budget = budget
+        self.rows = self.db.scalar("SELECT COUNT(*) FROM ducks WHERE {}".format(
+            " AND ".join("{} IS NOT NULL".format(c) for c in AXES + ["Avg_Weight"])))
+        self._bounds = db.bounds()
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def downsampled(self):
+        return self.rows > self.budget
+
+    def bounds(self):
+        return self._bounds
+
+    def _points(self, budget, region):
+        if not self.downsampled:
+            return self.db.query("SELECT Length, Width, Height, Avg_Weight, Name FROM ducks WHERE {} ORDER BY id".format(
+                " AND ".join("{} IS NOT NULL".format(c) for c in AXES + ["Avg_Weight"]))).assign(Count=1)
+        if region is None:
+            return self.db.voxel_points(budget)
+        ## zoomed in: the region gets the full budget, everything else a coarse backdrop
+        lo, hi = np.asarray(region[0], dtype=float), np.asarray(region[1], dtype=float)
+        return pd.concat([self.db.voxel_points(budget, lo, hi, inside=True),
+                          self.db.voxel_points(max(1, budget // 4), lo, hi, inside=False)], ignore_index=True)
+
+
+## duck_search.SearchIndex answered by the importer's fts5 table, so the sqlite backend keeps no postings in memory:
+## every query word is a prefix, ducks must match all of them, and they are ranked by bm25 with the
+## SEARCH_FIELDS weights (purchase order among ties). returns row positions (id - 1), or None for an empty query
+class SqlSearch:
+
+    def __init__(self, db):
+        if not db.scalar("SELECT COUNT(*) FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)):
+            raise RuntimeError("{} has no {} table, re-run `python duck_db.py` to rebuild it".format(db.path, SEARCH_TABLE))
+        self.db = db
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def query(self, text):
+        words = list(dict.fromkeys(tokenize(text)))
+        if not words:
+            return None
+        key = " ".join(words)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        match = " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        rows = self.db.conn.execute(
+            "SELECT rowid FROM {0} WHERE {0} MATCH ? ORDER BY bm25({0}, {1}), rowid".format(
+                SEARCH_TABLE, ", ".join(repr(weight) for weight in SEARCH_FIELDS.values())), (match,)).fetchall()
+        ranked = np.array([row[0] - 1 for row in rows], dtype=np.int64)
+        ranked.setflags(write=False)
+
+        with self._lock:
+            if len(self._cache) > MAX_CACHED:
+                self._cache.clear()
+            self._cache[key] = ranked
+        return ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the ducks workbook (or a csv / parquet file) into sqlite.")
+    parser.add_argument("source", nargs="?", default="./data/duck_data.xlsx")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = import_ducks(args.source, args.db)
+    print("imported {:,} ducks into {} in {:.2f}s".format(rows, args.db, time.perf_counter() - start))
@@ -0,0 +1,76 @@
+## imports
+
+import datetime as dt
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+## finest grain every chart table can be rolled up from
+GRAIN = ["Year", "ISO_Code", "Purchase_Country", "Purchase_State", "Purchase_Method", "Buyer"]
+MEASURES = ["Quantity", "Total_Weight"]
+
+
+## convert date bought col to date, extract year, sort by purchase date and add avg weight
+def prepare_ducks(df, date_format=None):
+    df = df.copy()
+    df['Date_Bought'] = pd.to_datetime(df['Date_Bought'], format=date_format).dt.date
+    df['Year'] = pd.DatetimeIndex(df['Date_Bought']).year
+    df = df.sort_values(by=['Date_Bought'], ascending=True)
+
+    ## find avg weight measure, needed for rows where more than 1 duck is included in the total weight
+    df['Avg_Weight'] = np.round(df.Total_Weight/df.Quantity,2)
+    return df
+
+
+## single scan of the ducks frame, grouped at the finest grain (blank states etc. kept as their own group)
+def build_grain(df):
+    return df.groupby(GRAIN, dropna=False, sort=False)[MEASURES].sum().reset_index()
+
+
+def _rollup(grain, keys, measure="Quantity"):
+    return grain.groupby(keys)[[measure]].sum().reset_index()
+
+
+## roll the per-chart tables up from the grain instead of re-scanning every row for each one
+def build_aggregates(df, grain=None):
+    if grain is None:
+        grain = build_grain(df)
+
+    state_df = _rollup(grain, ["Purchase_State"])
+    state_df = state_df[state_df["Purchase_State"]!=""]
+
+    yearly = grain.groupby("Year")[MEASURES].sum()
+
+    return {
+        "grain": grain,
+        "state_df": state_df,
+        "county_df": _rollup(grain, ["ISO_Code", "Purchase_Country"]),
+        "purchase_method_df": _rollup(grain, ["Purchase_Method"]),
+        "buyer_df": _rollup(grain, ["Buyer"]),
+        "yearly_df": yearly[["Quantity"]].reset_index(),
+        "weight_df": yearly[["Total_Weight"]].reset_index(),
+        "weight_cum_df": yearly.cumsum().reset_index(),
+    }
+
+
+## same calendar day one year back (feb 29 falls back to feb 28)
+def one_year_before(today):
+    if today.month == 2 and today.day == 29:
+        return dt.date(today.year-1, 2, 28)
+    return dt.date(today.year-1, today.month, today.day)
+
+
+## KPI header values
+def build_kpis(df, today=None):
+    if today is None:
+        today = date.today()
+    last_year = one_year_before(today)
+
+    return {
+        "duck_weight": df["Total_Weight"].sum(),
+        "total_ducks": df["Quantity"].sum(),
+        "unique_countries": df.Purchase_Country.nunique(),
+        "unique_cities": df.Purchase_City.nunique(),
+        "ducks_bought_last_year": df[df["Date_Bought"]>=last_year].Quantity.sum(),
+    }
@@ -0,0 +1,123 @@
+## imports
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from duck_loader import read_ducks, read_manifest, EXTRACT_MANIFEST
+from duck_engine import prepare_ducks
+from duck_synth import COLUMNS
+
+## where the exporter writes the extract (one file per purchase year plus the manifest)
+EXTRACT_DIR = "./data/extract"
+
+## sheet columns plus the two prepare_ducks adds, so neither the dashboards nor the Power BI query derive them again
+EXTRACT_COLUMNS = COLUMNS + ["Year", "Avg_Weight"]
+
+## column types of the extract; every other column is text (a duck named 32 is the text "32", as Power BI types it)
+EXTRACT_TYPES = {"Date_Bought": "datetime64[ns]", "Latitude": "float64", "Longitude": "float64", "Quantity": "Int64",
+                 "Total_Weight": "float64", "Height": "float64", "Width": "float64", "Length": "float64",
+                 "Year": "Int64", "Avg_Weight": "float64"}
+
+EXTRACT_FORMATS = ["parquet", "csv"]
+
+
+## the prepared, typed frame the extract holds, in purchase order (sheet order among ducks bought the same
+## day, so an untouched year always serializes to the same rows)
+def extract_frame(raw):
+    df = prepare_ducks(raw[COLUMNS])
+    df = df.sort_index(kind="mergesort").sort_values("Date_Bought", kind="mergesort")
+    df["Date_Bought"] = pd.to_datetime(df["Date_Bought"])
+    for col in EXTRACT_COLUMNS:
+        if col in EXTRACT_TYPES:
+            df[col] = df[col].astype(EXTRACT_TYPES[col])
+        else:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(object)
+    return df[EXTRACT_COLUMNS].reset_index(drop=True)
+
+
+## partition key of each row: its purchase year, or "none" for ducks without a date
+def partition_keys(df):
+    return df["Year"].astype(object).where(df["Year"].notna(), "none").map(str)
+
+
+## content hash of one partition (row values only, so the same rows always hash the same)
+def partition_hash(part):
+    return hashlib.sha1(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes()).hexdigest()
+
+
+## write to a temp name and rename, so power bi or a dashboard never reads half a file
+def _publish(path, write):
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _write_partition(part, path, fmt):
+    if fmt == "csv":
+        _publish(path, lambda tmp: part.to_csv(tmp, index=False, date_format="%Y-%m-%d"))
+    else:
+        ## needs pyarrow (or fastparquet)
+        _publish(path, lambda tmp: part.to_parquet(tmp, index=False))
+
+
+## export the ducks as one file per purchase year, rewriting only the years whose rows changed since the
+## last export (or every year when the format or column types changed). the manifest is written last and
+## only when something changed, so readers either see the previous extract or the complete new one
+def export_ducks(source, out_dir=EXTRACT_DIR, fmt="parquet", sheet_name="Ducks"):
+    if fmt not in EXTRACT_FORMATS:
+        raise ValueError("unknown extract format {!r}, use {}".format(fmt, " or ".join(EXTRACT_FORMATS)))
+    df = extract_frame(read_ducks(source, sheet_name))
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    os.makedirs(out_dir, exist_ok=True)
+
+    old = read_manifest(out_dir)
+    reuse = old is not None and old["format"] == fmt and old["dtypes"] == dtypes
+    old_partitions = old["partitions"] if old is not None else {}
+
+    partitions, written, unchanged = {}, [], []
+    for key, part in df.groupby(partition_keys(df), sort=True):
+        entry = {"file": "ducks-{}.{}".format(key, fmt), "rows": len(part), "hash": partition_hash(part)}
+        partitions[key] = entry
+        if reuse and old_partitions.get(key) == entry and os.path.exists(os.path.join(out_dir, entry["file"])):
+            unchanged.append(key)
+            continue
+        _write_partition(part, os.path.join(out_dir, entry["file"]), fmt)
+        written.append(key)
+
+    current = {entry["file"] for entry in partitions.values()}
+    removed = sorted(key for key, entry in old_partitions.items() if entry["file"] not in current)
+    manifest = {"format": fmt, "rows": len(df), "dtypes": dtypes, "partitions": partitions}
+    if manifest != old:
+        def write_manifest(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+        _publish(os.path.join(out_dir, EXTRACT_MANIFEST), write_manifest)
+    ## files of years (or a format) no longer in the extract go only after the manifest stops listing them
+    for key in removed:
+        try:
+            os.remove(os.path.join(out_dir, old_partitions[key]["file"]))
+        except OSError:
+            pass
+    return {"rows": len(df), "written": written, "unchanged": unchanged, "removed": removed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the year-partitioned extract the Power BI model and the dashboards read.")
+    parser.add_argument("source", nargs="?", default="./data/duck_data.xlsx", help="workbook (or csv / parquet file)")
+    parser.add_argument("--out", default=EXTRACT_DIR)
+    parser.add_argument("--format", default="parquet", choices=EXTRACT_FORMATS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = export_ducks(args.source, args.out, args.format)
+    print("{:,} ducks in {}: {} years written, {} unchanged, {} removed ({:.2f}s)".format(
+        result["rows"], args.out, len(result["written"]), len(result["unchanged"]), len(result["removed"]),
+        time.perf_counter() - start), file=sys.stderr)
+    for key in result["written"]:
+        print("wrote", key)
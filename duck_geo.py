@@ -0,0 +1,245 @@
+## imports
+
+import threading
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objs as go
+
+## below this many purchase points the maps plot one marker per duck, like they always have
+CLUSTER_MIN_POINTS = 500
+
+## grid cell sizes (degrees) available to the maps, coarsest first; each zoom doubling halves the cell
+CELL_SIZES = [8.0, 4.0, 2.0, 1.0, 0.5, 0.25, 0.125, 0.0625]
+
+
+## cell size for a map at a given projection scale, starting from that map's base cell
+def cell_for_scale(scale, base_cell):
+    scale = scale or 1
+    level = CELL_SIZES.index(base_cell) + max(0, int(np.floor(np.log2(max(scale, 1)))))
+    return CELL_SIZES[min(level, len(CELL_SIZES) - 1)]
+
+
+## collapse points into lat/lon grid cells: one centroid per occupied cell, weighted by quantity
+def grid_clusters(lat, lon, quantity, names, cell):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    quantity = np.asarray(quantity, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon, quantity, names = lat[valid], lon[valid], quantity[valid], np.asarray(names, dtype=object)[valid]
+
+    n_cols = int(np.ceil(360 / cell)) + 1
+    key = np.floor((lat + 90) / cell).astype(np.int64) * n_cols + np.floor((lon + 180) / cell).astype(np.int64)
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+
+    rows = np.bincount(inverse)
+    count = np.bincount(inverse, weights=quantity)
+    return {
+        "lat": np.bincount(inverse, weights=lat) / rows,
+        "lon": np.bincount(inverse, weights=lon) / rows,
+        "rows": rows,
+        "count": count,
+        ## single-duck cells keep the duck's name as their label
+        "label": np.where(rows == 1, names[first].astype(str),
+                          np.char.add(count.astype(np.int64).astype(str), " ducks")),
+    }
+
+
+## purchase locations of one dataset version, with cluster layers computed once per cell size
+class GeoClusters:
+
+    def __init__(self, df, min_points=CLUSTER_MIN_POINTS):
+        self.points = df[["Latitude", "Longitude", "Name"]]
+        self.lat = df["Latitude"].to_numpy(dtype=float)
+        self.lon = df["Longitude"].to_numpy(dtype=float)
+        self.quantity = df["Quantity"].to_numpy(dtype=float)
+        self.names = df["Name"].to_numpy(dtype=object)
+        self.clustered = len(df) > min_points
+        self._traces = {}
+        self._lock = threading.Lock()
+
+    ## red marker overlay shared by the country and state maps; `cell` is ignored for small collections
+    def trace(self, cell=CELL_SIZES[1]):
+        key = cell if self.clustered else None
+        trace = self._traces.get(key)
+        if trace is None:
+            with self._lock:
+                trace = self._traces.get(key)
+                if trace is None:
+                    trace = self._traces[key] = self._build_trace(cell)
+        return trace
+
+    ## the overlay as a plain dict, for swapping into a cached figure dict
+    def trace_json(self, cell=CELL_SIZES[1]):
+        return self.trace(cell).to_plotly_json()
+
+    ## grid_clusters output for one cell size
+    def clusters(self, cell):
+        return grid_clusters(self.lat, self.lon, self.quantity, self.names, cell)
+
+    def _build_trace(self, cell):
+        if not self.clustered:
+            trace = px.scatter_geo(self.points, lon='Longitude', lat='Latitude', hover_name="Name").data[0]
+            trace.update(marker=dict(color="Red"))
+            return trace
+        c = self.clusters(cell)
+        ## marker size grows with the number of ducks in the cell
+        size = 6 + 24 * np.sqrt(c["count"] / max(c["count"].max(), 1))
+        return go.Scattergeo(lon=np.round(c["lon"], 4), lat=np.round(c["lat"], 4),
+                             hovertext=c["label"], customdata=c["count"],
+                             hovertemplate="%{hovertext}<extra></extra>", mode="markers",
+                             marker=dict(color="Red", size=np.round(size, 1), opacity=0.7,
+                                         line=dict(width=0.5, color="DarkRed")),
+                             showlegend=False)
+
+
+## -------------------------------------------------------------------------------------------------
+## geo queries
+
+## mean earth radius
+EARTH_RADIUS_KM = 6371.0088
+
+## grid cell (degrees) the query index buckets purchase points into
+QUERY_CELL = 1.0
+
+## km per degree of latitude
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+## great-circle distance in km; any of the arguments can be arrays
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+## lat/lon ring `km` from a point, for outlining a radius query on the maps
+def circle_points(lat, lon, km, n=72):
+    bearing = np.radians(np.linspace(0, 360, n + 1))
+    lat1, lon1, d = np.radians(lat), np.radians(lon), km / EARTH_RADIUS_KM
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(d) + np.cos(lat1) * np.sin(d) * np.cos(bearing))
+    lon2 = lon1 + np.arctan2(np.sin(bearing) * np.sin(d) * np.cos(lat1), np.cos(d) - np.sin(lat1) * np.sin(lat2))
+    return np.degrees(lat2), (np.degrees(lon2) + 540) % 360 - 180
+
+
+## lat/lon box around a radius query as (south, north, west, east), west > east when it crosses the antimeridian.
+## the latitude band is exact; the longitude band widens towards the poles, and west / east are None
+## (every longitude) once the circle reaches a pole or wraps all the way round
+def radius_box(lat, lon, km):
+    dlat = km / KM_PER_DEGREE
+    south, north = max(lat - dlat, -90), min(lat + dlat, 90)
+    widest = max(abs(south), abs(north))
+    if north >= 90 or south <= -90 or widest >= 89.9:
+        return south, north, None, None
+    dlon = km / (KM_PER_DEGREE * np.cos(np.radians(widest)))
+    if dlon >= 180:
+        return south, north, None, None
+    return south, north, (lon - dlon + 540) % 360 - 180, (lon + dlon + 540) % 360 - 180
+
+
+## per city ducks + centroid as a distance-from-home table, farthest first
+def rank_cities(cities, home):
+    cities["Distance_km"] = np.round(haversine_km(home[0], home[1], cities["Latitude"], cities["Longitude"]), 1)
+    cities["Ducks"] = cities["Ducks"].astype(np.int64)
+    return cities.sort_values(["Distance_km", "Purchase_City"], ascending=[False, True], kind="mergesort",
+                              ignore_index=True)
+
+
+## purchase points bucketed into a QUERY_CELL grid: a radius or box query only runs the exact
+## test on the points of the cells it overlaps. ducks are addressed by the index label of `frame`
+class GeoIndex:
+
+    def __init__(self, frame, cell=QUERY_CELL):
+        located = frame.dropna(subset=["Latitude", "Longitude"])
+        self.frame = located
+        self.cell = cell
+        self.lat = located["Latitude"].to_numpy(dtype=float)
+        self.lon = located["Longitude"].to_numpy(dtype=float)
+        self.n_rows = int(np.ceil(180 / cell)) + 1
+        self.n_cols = int(np.ceil(360 / cell)) + 1
+
+        ## points sorted by cell key; a cell's points are one contiguous run
+        keys = self._row(self.lat) * self.n_cols + self._col(self.lon)
+        self.order = np.argsort(keys, kind="mergesort")
+        self.keys = keys[self.order]
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90) / self.cell).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180) / self.cell).astype(np.int64), 0, self.n_cols - 1)
+
+    ## point positions in the cells rows lo_row..hi_row x the given columns
+    def _candidates(self, lo_row, hi_row, cols):
+        rows = np.arange(lo_row, hi_row + 1)
+        keys = (rows[:, None] * self.n_cols + np.asarray(cols)[None, :]).ravel()
+        starts = np.searchsorted(self.keys, keys, side="left")
+        stops = np.searchsorted(self.keys, keys, side="right")
+        ## concatenate the runs order[start:stop] without a python loop over cells
+        lengths = stops - starts
+        shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return self.order[np.arange(lengths.sum()) + shift]
+
+    ## grid columns spanning west..east (wrapping across the antimeridian when west > east)
+    def _columns(self, west, east):
+        lo, hi = int(self._col(west)), int(self._col(east))
+        if west <= east:
+            return np.arange(lo, hi + 1)
+        return np.concatenate([np.arange(lo, self.n_cols), np.arange(0, hi + 1)])
+
+    def _cached(self, key, build):
+        result = self._cache.get(key)
+        if result is None:
+            result = build()
+            with self._lock:
+                if len(self._cache) > 256:
+                    self._cache.clear()
+                self._cache[key] = result
+        return result
+
+    ## ducks inside a lat/lon box, as rows of `frame`; west > east means the box crosses the antimeridian
+    def box(self, south, west, north, east):
+        return self._cached(("box", south, west, north, east), lambda: self._box(south, west, north, east))
+
+    def _box(self, south, west, north, east):
+        south, north = min(south, north), max(south, north)
+        positions = self._candidates(int(self._row(south)), int(self._row(north)), self._columns(west, east))
+        lat, lon = self.lat[positions], self.lon[positions]
+        inside_lon = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+        positions = np.sort(positions[(lat >= south) & (lat <= north) & inside_lon])
+        return self.frame.iloc[positions]
+
+    ## ducks within `km` of a point, nearest first, with a Distance_km column
+    def within(self, lat, lon, km):
+        return self._cached(("within", lat, lon, km), lambda: self._within(lat, lon, km))
+
+    def _within(self, lat, lon, km):
+        south, north, west, east = radius_box(lat, lon, km)
+        cols = np.arange(self.n_cols) if west is None else self._columns(west, east)
+        positions = self._candidates(int(self._row(south)), int(self._row(north)), cols)
+        distance = haversine_km(lat, lon, self.lat[positions], self.lon[positions])
+        keep = distance <= km
+        positions, distance = positions[keep], distance[keep]
+        order = np.lexsort((positions, distance))
+        return self.frame.iloc[positions[order]].assign(Distance_km=np.round(distance[order], 1))
+
+    ## per city: ducks bought there and the distance from `home` (lat, lon) to the city, farthest first
+    def city_distances(self, home):
+        return self._cached(("cities", tuple(home)), lambda: self._city_distances(home))
+
+    def _city_distances(self, home):
+        frame = self.frame.assign(Quantity=self.frame["Quantity"].fillna(0))
+        cities = frame.groupby(["Purchase_City", "Purchase_Country"], sort=False).agg(
+            Ducks=("Quantity", "sum"), Latitude=("Latitude", "mean"), Longitude=("Longitude", "mean")).reset_index()
+        return rank_cities(cities, home)
+
+    ## home for the distance stats: the city most ducks were bought in
+    def default_home(self):
+        if not len(self.frame):
+            return (0.0, 0.0)
+        cities = self.frame.groupby("Purchase_City").agg(Ducks=("Quantity", "sum"), Latitude=("Latitude", "mean"),
+                                                         Longitude=("Longitude", "mean"))
+        top = cities.sort_values("Ducks", ascending=False, kind="mergesort").iloc[0]
+        return (float(top["Latitude"]), float(top["Longitude"]))
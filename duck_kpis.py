@@ -0,0 +1,72 @@
+## imports
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from duck_engine import build_kpis, one_year_before
+
+
+## purchase dates sorted once per dataset version, next to running totals of Quantity and Total_Weight:
+## the ducks bought in any date window are two binary searches and a subtraction, so the KPI header
+## can be recomputed for every page load instead of freezing "last year" at startup
+class KpiIndex:
+
+    def __init__(self, df):
+        ## the parts of the header that don't depend on the date
+        totals = {
+            "duck_weight": df["Total_Weight"].sum(),
+            "total_ducks": df["Quantity"].sum(),
+            "unique_countries": df.Purchase_Country.nunique(),
+            "unique_cities": df.Purchase_City.nunique(),
+        }
+        self._build(df["Date_Bought"], df["Quantity"], df["Total_Weight"], totals)
+
+    ## index over per-day totals (Date_Bought / Quantity / Total_Weight rows) that something else already
+    ## summed, e.g. AggregateStore's running sums or a GROUP BY in duck_db; windows come out the same as over the
+    ## individual ducks
+    @classmethod
+    def from_daily(cls, daily, totals):
+        index = cls.__new__(cls)
+        index._build(daily["Date_Bought"], daily["Quantity"], daily["Total_Weight"], totals)
+        return index
+
+    def _build(self, dates, quantity, weight, totals):
+        days = pd.to_datetime(dates).to_numpy(dtype="datetime64[D]")
+        quantity = quantity.to_numpy()
+        weight = weight.to_numpy(dtype=float)
+
+        ## ducks without a purchase date count towards the totals but never fall inside a window
+        dated = ~np.isnat(days)
+        order = np.argsort(days[dated], kind="mergesort")
+        self.days = days[dated][order]
+        self.cum_quantity = np.concatenate([[0], np.cumsum(quantity[dated][order])])
+        self.cum_weight = np.concatenate([[0.0], np.cumsum(np.nan_to_num(weight[dated][order]))])
+        self.totals = totals
+
+    def _position(self, day):
+        return int(np.searchsorted(self.days, np.datetime64(day, "D"), side="left"))
+
+    ## (quantity, weight) bought on or after `start` and before `end` (open ended when end is None)
+    def window(self, start, end=None):
+        lo = self._position(start)
+        hi = len(self.days) if end is None else self._position(end)
+        hi = max(hi, lo)
+        return self.cum_quantity[hi] - self.cum_quantity[lo], self.cum_weight[hi] - self.cum_weight[lo]
+
+    ## same values as duck_engine.build_kpis, for `today` (the current date when not given)
+    def kpis(self, today=None):
+        if today is None:
+            today = date.today()
+        kpis = dict(self.totals)
+        kpis["ducks_bought_last_year"] = self.window(one_year_before(today))[0]
+        return kpis
+
+    ## check mode: assert the indexed KPIs match a full scan of `df`
+    def check(self, df, today=None):
+        expected = build_kpis(df, today)
+        actual = self.kpis(today)
+        for name, value in expected.items():
+            assert np.isclose(actual[name], value), "{}: indexed {} != scanned {}".format(name, actual[name], value)
+        return True
@@ -0,0 +1,165 @@
+## imports
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+## snapshots live next to the workbooks, one per (workbook, sheet, mtime, size)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", ".cache")
+
+## an extract directory (see duck_extract.py) lists its partition files here; it is rewritten last, and only
+## when a partition changed, so it doubles as the extract's version stamp
+EXTRACT_MANIFEST = "manifest.json"
+
+
+## key a workbook on its path + mtime + size, so any save of the xlsx invalidates the snapshot
+## (an extract directory is keyed on its manifest)
+def source_signature(path):
+    if os.path.isdir(path):
+        stat = os.stat(os.path.join(path, EXTRACT_MANIFEST))
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _snapshot_prefix(path, sheet_name):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:10]
+    return "{}-{}-{}-".format(stem, sheet_name, path_hash)
+
+
+def snapshot_path(path, sheet_name="Ducks"):
+    _, mtime_ns, size = source_signature(path)
+    name = _snapshot_prefix(path, sheet_name) + "{}-{}.pkl".format(mtime_ns, size)
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+## read the sheet straight from excel (the slow path)
+def read_excel_ducks(path, sheet_name="Ducks"):
+    return pd.read_excel(path, sheet_name=sheet_name)
+
+
+## manifest of an extract directory, or None if there isn't one yet
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, EXTRACT_MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+## every partition of an extract directory, in year order (which is purchase order), with the typed columns
+## the manifest records (csv partitions are cast back to them)
+def read_extract(path):
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError("no {} in {}".format(EXTRACT_MANIFEST, path))
+    dtypes = {col: dtype for col, dtype in manifest["dtypes"].items() if col != "Date_Bought"}
+    parts = []
+    for key in sorted(manifest["partitions"], key=lambda key: (key == "none", key)):
+        file_path = os.path.join(path, manifest["partitions"][key]["file"])
+        if manifest["format"] == "csv":
+            parts.append(pd.read_csv(file_path, dtype=dtypes, parse_dates=["Date_Bought"]))
+        else:
+            parts.append(pd.read_parquet(file_path))
+    if not parts:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in manifest["dtypes"].items()})
+    return pd.concat(parts, ignore_index=True)
+
+
+## read ducks from any supported source: the workbook, csv / parquet exports (e.g. from duck_synth.py)
+## or an extract directory written by duck_extract.py
+def read_ducks(path, sheet_name="Ducks"):
+    if os.path.isdir(path):
+        return read_extract(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return pd.read_csv(path, parse_dates=["Date_Bought"])
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    return read_excel_ducks(path, sheet_name)
+
+
+def _write_snapshot(df, path, sheet_name, target):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    ## write to a temp file and rename, so concurrent workers never read a half written snapshot
+    tmp = "{}.{}.tmp".format(target, os.getpid())
+    with open(tmp, "wb") as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, target)
+
+    ## drop snapshots of older versions of the same workbook
+    prefix = _snapshot_prefix(path, sheet_name)
+    for name in os.listdir(SNAPSHOT_DIR):
+        old = os.path.join(SNAPSHOT_DIR, name)
+        if name.startswith(prefix) and name.endswith(".pkl") and old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+## load the ducks sheet (or csv / parquet file, or extract), reading the pickled snapshot when the workbook hasn't changed
+def load_ducks(path, sheet_name="Ducks", use_snapshot=True):
+    if not use_snapshot:
+        return read_ducks(path, sheet_name)
+
+    target = snapshot_path(path, sheet_name)
+    if os.path.exists(target):
+        try:
+            with open(target, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    df = read_ducks(path, sheet_name)
+    try:
+        _write_snapshot(df, path, sheet_name, target)
+    except OSError:
+        ## a read-only checkout still works, it just always takes the excel path
+        pass
+    return df
+
+
+## time the excel path against the snapshot path
+def load_report(path, sheet_name="Ducks", repeat=3):
+    excel_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read_excel_ducks(path, sheet_name)
+        excel_times.append(time.perf_counter() - start)
+
+    load_ducks(path, sheet_name)
+    snapshot_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        snap = load_ducks(path, sheet_name)
+        snapshot_times.append(time.perf_counter() - start)
+
+    excel_s = min(excel_times)
+    snapshot_s = min(snapshot_times)
+    return {
+        "path": path,
+        "sheet_name": sheet_name,
+        "rows": len(df),
+        "excel_s": excel_s,
+        "snapshot_s": snapshot_s,
+        "speedup": excel_s / snapshot_s if snapshot_s else float("inf"),
+        "frames_equal": df.equals(snap),
+        "snapshot": snapshot_path(path, sheet_name),
+    }
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ["./data/duck_data.xlsx", "./data/data.xlsx"]
+    for p in paths:
+        r = load_report(p)
+        print("{path} [{sheet_name}] rows={rows}".format(**r))
+        print("  read_excel: {:8.2f} ms".format(r["excel_s"] * 1000))
+        print("  snapshot:   {:8.2f} ms  ({:.1f}x faster, identical={})".format(
+            r["snapshot_s"] * 1000, r["speedup"], r["frames_equal"]))
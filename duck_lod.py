@@ -0,0 +1,149 @@
+## imports
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+## most points the 3d scatter sends to the browser
+POINT_BUDGET = 5000
+
+## share of the budget reserved for outliers, which are always drawn as themselves
+OUTLIER_SHARE = 0.1
+
+AXES = ["Length", "Width", "Height"]
+
+
+## rows far outside the interquartile range on any axis, most extreme first
+def outlier_positions(xyz, k=3.0):
+    q1, q3 = np.nanpercentile(xyz, [25, 75], axis=0)
+    iqr = np.where(q3 > q1, q3 - q1, 1.0)
+    distance = np.max(np.maximum(q1 - xyz, xyz - q3) / iqr, axis=1)
+    positions = np.flatnonzero(distance > k)
+    return positions[np.argsort(-distance[positions], kind="mergesort")]
+
+
+def _voxel_keys(xyz, lo, span, resolution):
+    cells = np.clip(((xyz - lo) / span * resolution).astype(np.int64), 0, resolution - 1)
+    return (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+
+
+## bin points into a voxel grid fine enough to land near `budget` occupied voxels;
+## each voxel becomes one representative point at its centroid, carrying the mean value and the row count
+def voxel_downsample(xyz, value, budget):
+    lo = xyz.min(axis=0)
+    span = np.where(xyz.max(axis=0) > lo, xyz.max(axis=0) - lo, 1.0)
+
+    ## occupied voxels grow roughly with resolution^3 until the data is exhausted, so search on the resolution
+    resolution = max(1, int(round(budget ** (1 / 3))))
+    keys = _voxel_keys(xyz, lo, span, resolution)
+    for _ in range(8):
+        occupied = len(np.unique(keys))
+        if occupied > budget:
+            resolution = max(1, int(resolution / 1.26))
+        elif occupied < budget * 0.5 and resolution < 1024:
+            resolution = int(resolution * 1.26) + 1
+        else:
+            break
+        keys = _voxel_keys(xyz, lo, span, resolution)
+    if len(np.unique(keys)) > budget:
+        resolution = max(1, int(resolution / 1.26))
+        keys = _voxel_keys(xyz, lo, span, resolution)
+
+    _, inverse = np.unique(keys, return_inverse=True)
+    count = np.bincount(inverse)
+    centroid = np.column_stack([np.bincount(inverse, weights=xyz[:, i]) / count for i in range(3)])
+    return centroid, np.bincount(inverse, weights=value) / count, count
+
+
+## the 3d scatter rows for one dataset version, reduced to a point budget and cached per (budget, region)
+class LodScatter:
+
+    def __init__(self, df, budget=POINT_BUDGET):
+        frame = df[AXES + ["Avg_Weight", "Name"]].dropna(subset=AXES + ["Avg_Weight"])
+        self.df = frame
+        self.xyz = frame[AXES].to_numpy(dtype=float)
+        self.value = frame["Avg_Weight"].to_numpy(dtype=float)
+        self.budget = budget
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def downsampled(self):
+        return len(self.df) > self.budget
+
+    def bounds(self):
+        return self.xyz.min(axis=0), self.xyz.max(axis=0)
+
+    ## frame with Length/Width/Height/Avg_Weight/Count/Name; exact rows when they fit the budget
+    def points(self, budget=None, region=None):
+        budget = budget or self.budget
+        key = (budget, None if region is None else tuple(np.round(np.ravel(region), 3)))
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._points(budget, region)
+            with self._lock:
+                if len(self._cache) > 32:
+                    self._cache.clear()
+                self._cache[key] = cached
+        return cached
+
+    def _points(self, budget, region):
+        if region is None:
+            if not self.downsampled:
+                return self.df.assign(Count=1)
+            return self._reduce(np.arange(len(self.df)), budget)
+
+        ## zoomed in: the region gets the full budget, everything else a coarse backdrop
+        lo, hi = np.asarray(region[0], dtype=float), np.asarray(region[1], dtype=float)
+        inside = np.all((self.xyz >= lo) & (self.xyz <= hi), axis=1)
+        inner = np.flatnonzero(inside)
+        outer = np.flatnonzero(~inside)
+        parts = []
+        if len(inner):
+            parts.append(self.df.iloc[inner].assign(Count=1) if len(inner) <= budget else self._reduce(inner, budget))
+        if len(outer):
+            backdrop = max(1, budget // 4)
+            parts.append(self.df.iloc[outer].assign(Count=1) if len(outer) <= backdrop else self._reduce(outer, backdrop))
+        return pd.concat(parts, ignore_index=True)
+
+    def _reduce(self, positions, budget):
+        xyz = self.xyz[positions]
+        value = self.value[positions]
+
+        ## outliers are kept as individual points, the rest is voxel-binned
+        outliers = outlier_positions(xyz)[:int(budget * OUTLIER_SHARE)]
+        rest = np.ones(len(positions), dtype=bool)
+        rest[outliers] = False
+
+        kept = self.df.iloc[positions[outliers]].assign(Count=1)
+        if not rest.any():
+            return kept
+        centroid, mean_value, count = voxel_downsample(xyz[rest], value[rest], budget - len(outliers))
+        binned = pd.DataFrame({
+            "Length": np.round(centroid[:, 0], 2),
+            "Width": np.round(centroid[:, 1], 2),
+            "Height": np.round(centroid[:, 2], 2),
+            "Avg_Weight": np.round(mean_value, 2),
+            "Count": count,
+            "Name": np.char.add(count.astype(str), " ducks"),
+        })
+        return pd.concat([kept, binned], ignore_index=True)
+
+
+## axis-aligned region the 3d camera is looking at, from plotly's scene camera (None when not zoomed in)
+def camera_region(camera, lo, hi, default_eye=(0, 2, 1), min_zoom=1.5):
+    eye = camera.get("eye") or {}
+    center = camera.get("center") or {}
+    distance = np.linalg.norm([eye.get("x", 0), eye.get("y", 0), eye.get("z", 0)])
+    if not distance:
+        return None
+    zoom = np.linalg.norm(default_eye) / distance
+    if zoom < min_zoom:
+        return None
+
+    span = hi - lo
+    ## plotly's scene center is in normalized units where the axis box spans -0.5..0.5
+    mid = (lo + hi) / 2 + np.array([center.get("x", 0), center.get("y", 0), center.get("z", 0)]) * span
+    half = span / (2 * zoom)
+    return mid - half, mid + half
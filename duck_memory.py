@@ -0,0 +1,92 @@
+## imports
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+## smaps_rollup fields reported per process (kB)
+FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+
+
+## memory of one process from /proc/<pid>/smaps_rollup: Pss splits shared pages between the
+## processes mapping them, so summing Pss over master + workers is what the machine really pays
+def process_memory(pid="self"):
+    report = {}
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+                report[parts[0].rstrip(":")] = int(parts[1])
+    report["Shared"] = report.get("Shared_Clean", 0) + report.get("Shared_Dirty", 0)
+    report["Private"] = report.get("Private_Clean", 0) + report.get("Private_Dirty", 0)
+    return report
+
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir("/proc/{}/task".format(pid)):
+        with open("/proc/{}/task/{}/children".format(pid, task)) as f:
+            children.extend(int(child) for child in f.read().split())
+    return sorted(children)
+
+
+## per-process memory of a gunicorn master and its workers, plus the total Pss
+def worker_report(master_pid):
+    processes = [dict(pid=master_pid, role="master", **process_memory(master_pid))]
+    for pid in child_pids(master_pid):
+        processes.append(dict(pid=pid, role="worker", **process_memory(pid)))
+    return {"processes": processes, "total_pss_kb": sum(p["Pss"] for p in processes)}
+
+
+## start gunicorn with the repo's config, let every worker serve some requests, and report its memory
+def measure_gunicorn(preload, workers=4, port=8765, data_path=None, requests=20, timeout=300):
+    env = dict(os.environ, ANALYDUCKS_PRELOAD="1" if preload else "0", WEB_CONCURRENCY=str(workers))
+    if data_path:
+        env["ANALYDUCKS_DATA_PATH"] = data_path
+    root = os.path.dirname(os.path.abspath(__file__))
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+                               "--bind", "127.0.0.1:{}".format(port), "analyducks:server"],
+                              cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = "http://127.0.0.1:{}".format(port)
+        deadline = time.time() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(url + "/_dash-layout", timeout=timeout).read()
+                break
+            except OSError:
+                if master.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("gunicorn did not come up")
+                time.sleep(0.5)
+        ## spread some page loads over the workers so each one touches the dataset like real traffic
+        for _ in range(requests * workers):
+            urllib.request.urlopen(url + "/_dash-layout", timeout=timeout).read()
+            urllib.request.urlopen(url + "/figures/three_d_fig.json", timeout=timeout).read()
+        report = worker_report(master.pid)
+        report.update(preload=preload, workers=workers)
+        return report
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-worker memory of the gunicorn deployment, with and without preload.")
+    parser.add_argument("--pid", type=int, help="report on an already running gunicorn master instead")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--data", help="workbook / csv / parquet to serve (ANALYDUCKS_DATA_PATH)")
+    args = parser.parse_args()
+
+    if args.pid:
+        print(json.dumps(worker_report(args.pid), indent=2))
+    else:
+        for preload in (False, True):
+            r = measure_gunicorn(preload, args.workers, data_path=args.data)
+            print("preload={} workers={}  total Pss {:,} kB".format(preload, args.workers, r["total_pss_kb"]))
+            for p in r["processes"]:
+                print("  {role:6} {pid:>7}  Rss {Rss:>9,}  Pss {Pss:>9,}  Shared {Shared:>9,}  Private {Private:>9,} kB".format(**p))
@@ -0,0 +1,114 @@
+## imports
+
+import re
+import threading
+from bisect import bisect_left
+
+import numpy as np
+
+## searched columns and how much a hit in each one counts towards a duck's rank
+SEARCH_FIELDS = {"Name": 4.0, "Purchase_City": 2.0, "Purchase_Retailer": 2.0, "About Me": 1.0}
+
+## whole-token hits rank above prefix hits (the last query word is usually still being typed)
+EXACT_BOOST = 2.0
+
+## a very short prefix can expand to much of the vocabulary; only this many terms are merged per query word
+MAX_EXPANSIONS = 256
+
+## distinct queries remembered per index
+MAX_CACHED = 512
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+## token -> (duck positions, scores) over the searched columns of one dataset version. positions are row
+## positions in purchase order, the same order as the table and the card pages. every query word matches the
+## tokens it is a prefix of (a range of the sorted vocabulary), ducks must match every word, and they come back
+## ranked by field-weighted hits, best first
+class SearchIndex:
+
+    def __init__(self, df):
+        self.size = len(df)
+        postings = {}
+        for column, weight in SEARCH_FIELDS.items():
+            if column not in df.columns:
+                continue
+            for position, text in enumerate(df[column].to_numpy()):
+                if text is None or text != text:
+                    continue
+                for token in tokenize(text):
+                    scores = postings.setdefault(token, {})
+                    scores[position] = scores.get(position, 0.0) + weight
+
+        self.vocabulary = sorted(postings)
+        self.positions = []
+        self.scores = []
+        for token in self.vocabulary:
+            hits = postings[token]
+            positions = np.fromiter(hits.keys(), dtype=np.int64, count=len(hits))
+            order = np.argsort(positions, kind="mergesort")
+            self.positions.append(positions[order])
+            self.scores.append(np.fromiter(hits.values(), dtype=np.float64, count=len(hits))[order])
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    ## vocabulary indexes of the tokens starting with `prefix`
+    def _expand(self, prefix):
+        lo = bisect_left(self.vocabulary, prefix)
+        hi = bisect_left(self.vocabulary, prefix + "\U0010ffff", lo)
+        return range(lo, min(hi, lo + MAX_EXPANSIONS))
+
+    ## (sorted positions, scores) of ducks with some token starting with `word`; per duck, its best matching token counts
+    def _word(self, word):
+        terms = self._expand(word)
+        boost = lambda t: EXACT_BOOST if self.vocabulary[t] == word else 1.0
+        if len(terms) == 1:
+            t = terms[0]
+            return self.positions[t], self.scores[t] * boost(t)
+        if sum(len(self.positions[t]) for t in terms) > self.size // 16:
+            ## common prefixes: a dense max over every duck beats sorting the merged postings
+            best = np.zeros(self.size)
+            for t in terms:
+                best[self.positions[t]] = np.maximum(best[self.positions[t]], self.scores[t] * boost(t))
+            positions = np.flatnonzero(best)
+            return positions, best[positions]
+        if not len(terms):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        positions = np.concatenate([self.positions[t] for t in terms])
+        scores = np.concatenate([self.scores[t] * boost(t) for t in terms])
+        order = np.lexsort((-scores, positions))
+        positions, scores = positions[order], scores[order]
+        first = np.ones(len(positions), dtype=bool)
+        first[1:] = positions[1:] != positions[:-1]
+        return positions[first], scores[first]
+
+    ## ranked positions of the ducks matching every word of `text` (None for an empty query)
+    def query(self, text):
+        words = list(dict.fromkeys(tokenize(text)))
+        if not words:
+            return None
+        key = " ".join(words)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        positions, scores = self._word(words[0])
+        for word in words[1:]:
+            if not len(positions):
+                break
+            other, other_scores = self._word(word)
+            positions, left, right = np.intersect1d(positions, other, assume_unique=True, return_indices=True)
+            scores = scores[left] + other_scores[right]
+        ## best score first, purchase order among ties
+        ranked = positions[np.lexsort((positions, -scores))]
+        ranked.setflags(write=False)
+
+        with self._lock:
+            if len(self._cache) > MAX_CACHED:
+                self._cache.clear()
+            self._cache[key] = ranked
+        return ranked
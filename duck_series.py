@@ -0,0 +1,112 @@
+## imports
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+## calendar buckets the purchase charts can be drawn at
+GRANULARITIES = {"D": "Daily", "W": "Weekly", "M": "Monthly"}
+
+## trailing windows (days) for the rolling purchase / weight lines
+ROLLING_WINDOWS = [30, 90, 365]
+
+## Total_Weight has one decimal in the sheet; differences of running sums are rounded back to tidy values
+WEIGHT_DECIMALS = 4
+
+
+## first day of every bucket from `first` to `last` (weeks start on monday, months on the 1st)
+def bucket_starts(first, last, granularity="M"):
+    first, last = np.datetime64(first, "D"), np.datetime64(last, "D")
+    if granularity == "D":
+        return np.arange(first, last + 1)
+    if granularity == "W":
+        ## 1970-01-01 was a thursday, so (days + 3) % 7 is 0 on mondays
+        monday = first - (first.astype(np.int64) + 3) % 7
+        return np.arange(monday, last + 1, 7)
+    if granularity == "M":
+        return np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    raise ValueError("unknown granularity {!r}, use one of {}".format(granularity, list(GRANULARITIES)))
+
+
+## first day after the bucket starting on `start`
+def bucket_end(start, granularity="M"):
+    if granularity == "M":
+        return (start.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    return start + (7 if granularity == "W" else 1)
+
+
+## calendar-bucketed and rolling-window purchase totals, read off the sorted dates and running sums of a
+## duck_kpis.KpiIndex: every bucket or window is two positions in the running sums, never a groupby over
+## the ducks. each series is computed once per granularity / window and cached
+class PurchaseSeries:
+
+    def __init__(self, kpi_index):
+        self.days = kpi_index.days
+        self.cum_quantity = kpi_index.cum_quantity
+        self.cum_weight = kpi_index.cum_weight
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    ## running Quantity / Total_Weight of every duck bought before each of `edges`
+    def _sums_before(self, edges):
+        positions = np.searchsorted(self.days, edges, side="left")
+        return self.cum_quantity[positions], self.cum_weight[positions]
+
+    def _cached(self, key, build):
+        frame = self._cache.get(key)
+        if frame is None:
+            frame = build()
+            with self._lock:
+                self._cache[key] = frame
+        return frame
+
+    ## one row per bucket: Date (bucket start), Quantity, Total_Weight and their cumulative values
+    def resample(self, granularity="M"):
+        return self._cached(("resample", granularity), lambda: self._resample(granularity))
+
+    def _resample(self, granularity):
+        if not len(self.days):
+            return pd.DataFrame(columns=["Date", "Quantity", "Total_Weight", "Cumulative_Quantity", "Cumulative_Weight"])
+        starts = bucket_starts(self.days[0], self.days[-1], granularity)
+        quantity, weight = self._sums_before(np.append(starts, bucket_end(starts[-1], granularity)))
+        return pd.DataFrame({
+            "Date": pd.to_datetime(starts),
+            "Quantity": np.diff(quantity),
+            "Total_Weight": np.round(np.diff(weight), WEIGHT_DECIMALS),
+            "Cumulative_Quantity": quantity[1:],
+            "Cumulative_Weight": np.round(weight[1:], WEIGHT_DECIMALS),
+        })
+
+    ## one row per calendar day: Quantity / Total_Weight bought in the `window` days ending that day
+    def rolling(self, window=30):
+        return self._cached(("rolling", window), lambda: self._rolling(window))
+
+    def _rolling(self, window):
+        if not len(self.days):
+            return pd.DataFrame(columns=["Date", "Quantity", "Total_Weight"])
+        days = bucket_starts(self.days[0], self.days[-1], "D")
+        quantity_to, weight_to = self._sums_before(days + 1)
+        quantity_from, weight_from = self._sums_before(days + 1 - window)
+        return pd.DataFrame({
+            "Date": pd.to_datetime(days),
+            "Quantity": quantity_to - quantity_from,
+            "Total_Weight": np.round(weight_to - weight_from, WEIGHT_DECIMALS),
+        })
+
+    ## the query api: a resampled series, or a rolling one when `window` is given, cut to [start, end]
+    def query(self, granularity="M", start=None, end=None, window=None):
+        frame = self.rolling(window) if window else self.resample(granularity)
+        if start is not None:
+            frame = frame[frame["Date"] >= pd.Timestamp(start)]
+        if end is not None:
+            frame = frame[frame["Date"] <= pd.Timestamp(end)]
+        return frame.reset_index(drop=True)
+
+    ## compute every granularity and window up front (e.g. before gunicorn forks its workers)
+    def warm(self):
+        for granularity in GRANULARITIES:
+            self.resample(granularity)
+        for window in ROLLING_WINDOWS:
+            self.rolling(window)
+        return self
@@ -0,0 +1,91 @@
+## imports
+
+import threading
+
+import numpy as np
+
+## optional: scikit-learn (already in requirements.txt) provides the kd-tree; without it every lookup is brute force
+try:
+    from sklearn.neighbors import KDTree
+except ImportError:
+    KDTree = None
+
+## what "alike" means: shape and heft, each standardized so no one unit dominates the distance
+SIMILAR_DIMS = ["Length", "Width", "Height", "Avg_Weight"]
+
+## below this many ducks a vectorized scan of every duck is faster than building and walking a tree
+BRUTE_FORCE_MAX = 4096
+
+## ducks listed in each card's "ducks like me" panel
+SIMILAR_K = 3
+
+
+## nearest neighbours of every duck in standardized Length / Width / Height / Avg_Weight space, indexed once
+## per dataset version. ducks are addressed by the index label of `frame` (the same id the card cache uses);
+## ducks missing a dimension are left out. names come from the frame's Name column, or from `names` (ids -> names)
+## when the frame has none, so a caller can keep them out of memory: per duck this holds only the four
+## standardized dimensions, their squared norm, the id and its sort position (about 56 bytes)
+class SimilarDucks:
+
+    def __init__(self, frame, names=None):
+        complete = frame.dropna(subset=SIMILAR_DIMS)
+        values = complete[SIMILAR_DIMS].to_numpy(dtype=float)
+        self.mean = values.mean(axis=0) if len(values) else np.zeros(len(SIMILAR_DIMS))
+        std = values.std(axis=0) if len(values) else np.ones(len(SIMILAR_DIMS))
+        self.std = np.where(std > 0, std, 1.0)
+        self.points = (values - self.mean) / self.std
+        self.norms = (self.points ** 2).sum(axis=1)
+        self.ids = complete.index.to_numpy()
+        self.names = complete["Name"].to_numpy(dtype=object) if "Name" in complete.columns else None
+        self._names = names
+        ## id -> row by binary search over the sorted ids, rather than a dict entry per duck
+        self._by_id = np.argsort(self.ids, kind="mergesort")
+        self._sorted_ids = self.ids[self._by_id]
+        self.tree = KDTree(self.points) if KDTree is not None and len(self.points) > BRUTE_FORCE_MAX else None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    ## row of a duck id, or None for ducks that aren't indexed
+    def _row(self, duck_id):
+        at = np.searchsorted(self._sorted_ids, duck_id)
+        if at < len(self._sorted_ids) and self._sorted_ids[at] == duck_id:
+            return int(self._by_id[at])
+        return None
+
+    def __contains__(self, duck_id):
+        return self._row(duck_id) is not None
+
+    ## (rows, distances) of the k nearest points to each query point, nearest first
+    def _nearest(self, queries, k):
+        k = min(k, len(self.points))
+        if self.tree is not None:
+            distances, rows = self.tree.query(queries, k=k)
+            return rows, distances
+        ## brute force: |p - q|^2 = |p|^2 - 2 p.q + |q|^2 as one matrix product against every duck,
+        ## then a partial sort for the k smallest
+        squared = self.norms[None, :] - 2 * queries @ self.points.T + (queries ** 2).sum(axis=1)[:, None]
+        squared = np.maximum(squared, 0)
+        rows = np.argpartition(squared, k - 1, axis=1)[:, :k] if k < len(self.points) else np.tile(np.arange(k), (len(queries), 1))
+        nearest = np.take_along_axis(squared, rows, axis=1)
+        order = np.argsort(nearest, axis=1, kind="mergesort")
+        return np.take_along_axis(rows, order, axis=1), np.sqrt(np.take_along_axis(nearest, order, axis=1))
+
+    ## the k ducks most like `duck_id` as [(id, name, distance)], itself excluded; [] for unknown ducks
+    def similar(self, duck_id, k=SIMILAR_K):
+        key = (duck_id, k)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        row = self._row(duck_id)
+        if row is None or len(self.points) < 2:
+            return []
+        rows, distances = self._nearest(self.points[row:row + 1], k + 1)
+        nearest = [(r, d) for r, d in zip(rows[0], distances[0]) if r != row][:k]
+        ids = [self.ids[r] for r, _ in nearest]
+        names = [self.names[r] for r, _ in nearest] if self.names is not None else self._names(ids)
+        result = [(duck_id, name, round(float(d), 3)) for duck_id, name, (_, d) in zip(ids, names, nearest)]
+        with self._lock:
+            if len(self._cache) > 65536:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
@@ -0,0 +1,207 @@
+## imports
+
+from collections import Counter, defaultdict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from duck_engine import GRAIN, MEASURES, build_grain, build_aggregates, build_kpis, one_year_before
+from duck_kpis import KpiIndex
+
+## rollup tables kept by the store, as (name, grain columns)
+ROLLUPS = [
+    ("state_df", ["Purchase_State"]),
+    ("county_df", ["ISO_Code", "Purchase_Country"]),
+    ("purchase_method_df", ["Purchase_Method"]),
+    ("buyer_df", ["Buyer"]),
+    ("year", ["Year"]),
+]
+
+
+## one uint64 per raw row, used to tell an append from an edit without keeping the old frame around
+def row_hashes(raw):
+    return pd.util.hash_pandas_object(raw, index=False).values
+
+
+## rows added to the end of the sheet since `old_hashes`, or None if anything before them changed
+def appended_rows(old_hashes, raw, new_hashes=None):
+    if new_hashes is None:
+        new_hashes = row_hashes(raw)
+    n = len(old_hashes)
+    if len(new_hashes) < n or not np.array_equal(new_hashes[:n], old_hashes):
+        return None
+    return raw.iloc[n:]
+
+
+def _key(value):
+    ## NaN != NaN, so blank keys are stored as None (and dropped on rollup like groupby does)
+    return None if pd.isna(value) else value
+
+
+## running sums for every derived table, updated in O(new rows) as purchases are appended. the grain feeds the
+## cross-filter cube and the per-day sums feed the KPI / purchase series index, so on an append those are
+## O(groups) / O(days) rebuilds too; the row-level indexes are not sums and are still rebuilt from the full
+## frame by analyducks.build_dataset
+class AggregateStore:
+
+    def __init__(self, df=None):
+        self._reset()
+        if df is not None:
+            self.rebuild(df)
+
+    def _reset(self):
+        self.rows = 0
+        self.grain = defaultdict(lambda: [0, 0.0])
+        self.tables = {name: defaultdict(lambda: [0, 0.0]) for name, _ in ROLLUPS}
+        self.countries = Counter()
+        self.cities = Counter()
+        self.daily_quantity = defaultdict(int)
+        self.daily_weight = defaultdict(float)
+        self.total_ducks = 0
+        self.duck_weight = 0.0
+        self.dtypes = None
+        self._aggregates = None
+
+    ## full rebuild from a prepared frame (used on first load and whenever rows were edited or deleted)
+    def rebuild(self, df):
+        self._reset()
+        self.append(df)
+        return self
+
+    ## fold prepared new rows into every running sum
+    def append(self, rows):
+        if not len(rows):
+            return self
+        if self.dtypes is None:
+            self.dtypes = rows[GRAIN + MEASURES].dtypes.to_dict()
+
+        ## group the new rows once at the finest grain, then push each group into the rollups
+        grain = build_grain(rows)
+        positions = {col: GRAIN.index(col) for col in GRAIN}
+        for values in zip(*[grain[col] for col in GRAIN + MEASURES]):
+            key = tuple(_key(v) for v in values[:len(GRAIN)])
+            quantity, weight = values[len(GRAIN)], values[len(GRAIN) + 1]
+            sums = self.grain[key]
+            sums[0] += quantity
+            sums[1] += weight
+            for name, cols in ROLLUPS:
+                sub = tuple(key[positions[col]] for col in cols)
+                if None in sub:
+                    continue
+                sums = self.tables[name][sub]
+                sums[0] += quantity
+                sums[1] += weight
+
+        self.countries.update(rows["Purchase_Country"].dropna())
+        self.cities.update(rows["Purchase_City"].dropna())
+        daily = rows.groupby("Date_Bought")[MEASURES].sum()
+        for day, quantity, weight in zip(daily.index, daily["Quantity"], daily["Total_Weight"]):
+            self.daily_quantity[day] += quantity
+            self.daily_weight[day] += weight
+        self.total_ducks += rows["Quantity"].sum()
+        self.duck_weight += rows["Total_Weight"].sum()
+        self.rows += len(rows)
+        self._aggregates = None
+        return self
+
+    ## independent copy, so the version being served is never mutated by the next append
+    def copy(self):
+        other = AggregateStore()
+        other.rows = self.rows
+        other.grain.update({k: list(v) for k, v in self.grain.items()})
+        for name, table in self.tables.items():
+            other.tables[name].update({k: list(v) for k, v in table.items()})
+        other.countries = self.countries.copy()
+        other.cities = self.cities.copy()
+        other.daily_quantity.update(self.daily_quantity)
+        other.daily_weight.update(self.daily_weight)
+        other.total_ducks = self.total_ducks
+        other.duck_weight = self.duck_weight
+        other.dtypes = self.dtypes
+        return other
+
+    def _frame(self, cols, table, measure=None, sort=True):
+        ## rollups come out sorted like groupby; the grain can hold None keys so it stays in insertion order
+        keys = sorted(table) if sort else list(table)
+        data = {col: [k[i] for k in keys] for i, col in enumerate(cols)}
+        for i, m in enumerate(MEASURES):
+            if measure is None or m == measure:
+                data[m] = [table[k][i] for k in keys]
+        df = pd.DataFrame(data, columns=list(data))
+        return df.astype({col: self.dtypes[col] for col in df.columns})
+
+    ## same tables as duck_engine.build_aggregates, materialized from the running sums
+    def aggregates(self):
+        if self._aggregates is not None:
+            return self._aggregates
+        if self.dtypes is None:
+            raise ValueError("AggregateStore is empty")
+
+        grain = self._frame(GRAIN, self.grain, sort=False).fillna(value=np.nan)
+        state_df = self._frame(["Purchase_State"], self.tables["state_df"], "Quantity")
+        state_df = state_df[state_df["Purchase_State"]!=""]
+        yearly = self._frame(["Year"], self.tables["year"]).set_index("Year")
+
+        self._aggregates = {
+            "grain": grain,
+            "state_df": state_df,
+            "county_df": self._frame(["ISO_Code", "Purchase_Country"], self.tables["county_df"], "Quantity"),
+            "purchase_method_df": self._frame(["Purchase_Method"], self.tables["purchase_method_df"], "Quantity"),
+            "buyer_df": self._frame(["Buyer"], self.tables["buyer_df"], "Quantity"),
+            "yearly_df": yearly[["Quantity"]].reset_index(),
+            "weight_df": yearly[["Total_Weight"]].reset_index(),
+            "weight_cum_df": yearly.cumsum().reset_index(),
+        }
+        return self._aggregates
+
+    ## same values as duck_engine.build_kpis
+    def kpis(self, today=None):
+        if today is None:
+            today = date.today()
+        last_year = one_year_before(today)
+        return {
+            "duck_weight": self.duck_weight,
+            "total_ducks": self.total_ducks,
+            "unique_countries": len(self.countries),
+            "unique_cities": len(self.cities),
+            "ducks_bought_last_year": sum(q for day, q in self.daily_quantity.items() if day >= last_year),
+        }
+
+    ## duck_kpis.KpiIndex over the running per-day sums (the same windows as indexing every duck)
+    def kpi_index(self):
+        days = sorted(self.daily_quantity)
+        daily = pd.DataFrame({
+            "Date_Bought": pd.to_datetime(pd.Series(days, dtype=object)),
+            "Quantity": pd.Series([self.daily_quantity[day] for day in days], dtype=np.int64),
+            "Total_Weight": pd.Series([self.daily_weight[day] for day in days], dtype=float),
+        })
+        return KpiIndex.from_daily(daily, {
+            "duck_weight": self.duck_weight,
+            "total_ducks": self.total_ducks,
+            "unique_countries": len(self.countries),
+            "unique_cities": len(self.cities),
+        })
+
+    ## check mode: assert the incremental tables match a full rebuild of `df`
+    def check(self, df, today=None):
+        expected = build_aggregates(df)
+        actual = self.aggregates()
+        for name in expected:
+            if name == "grain":
+                continue
+            pd.testing.assert_frame_equal(actual[name].reset_index(drop=True),
+                                          expected[name].reset_index(drop=True),
+                                          check_exact=False, obj=name)
+        pd.testing.assert_frame_equal(_sorted_grain(actual["grain"]), _sorted_grain(expected["grain"]),
+                                      check_exact=False, obj="grain")
+
+        expected_kpis = build_kpis(df, today)
+        actual_kpis = self.kpis(today)
+        for name, value in expected_kpis.items():
+            assert np.isclose(actual_kpis[name], value), "{}: incremental {} != full {}".format(name, actual_kpis[name], value)
+        return True
+
+
+def _sorted_grain(grain):
+    return grain.sort_values(GRAIN, na_position="first").reset_index(drop=True)
@@ -0,0 +1,145 @@
+## imports
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from duck_loader import read_excel_ducks
+
+## the Ducks sheet columns, in workbook order (also what the Power BI Sheet1 query types;
+## 'Avg Weight' is added by that query, and Year / Avg_Weight by prepare_ducks, so neither is written here)
+COLUMNS = ["Duck", "Name", "Purchase_Method", "Purchase_Retailer", "Purchase_City", "Purchase_State",
+           "Purchase_Country", "ISO_Code", "Date_Bought", "Latitude", "Longitude", "About Me", "Buyer",
+           "Quantity", "Total_Weight", "Height", "Width", "Length"]
+
+## real collection the distributions are learned from
+SOURCE_PATH = "./data/duck_data.xlsx"
+
+## a worksheet holds 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1_048_575
+
+## spread of generated purchases around their city (degrees, about 2km) and of sizes around their model duck
+LOCATION_JITTER = 0.02
+SIZE_JITTER = 0.08
+
+## purchase dates are moved up to this many days from the real purchase they're modelled on
+DATE_JITTER_DAYS = 120
+
+
+## empirical distributions of the real collection; every generated row is built from these
+class DuckCatalog:
+
+    def __init__(self, raw):
+        raw = raw[COLUMNS].reset_index(drop=True)
+        ## a few names and bios are plain numbers in the sheet; keep every text column text
+        ## (Power BI types them as text too) so the frame also round-trips through csv and parquet
+        for col in raw.columns[raw.dtypes == object]:
+            raw[col] = raw[col].where(raw[col].isna(), raw[col].astype(str))
+        self.raw = raw
+        ## where/how a duck was bought is sampled as one unit, so city, state, country, iso code,
+        ## coordinates, method and retailer always agree with each other
+        self.purchases = raw[["Purchase_Method", "Purchase_Retailer", "Purchase_City", "Purchase_State",
+                              "Purchase_Country", "ISO_Code", "Latitude", "Longitude"]]
+        buyers = raw["Buyer"].value_counts()
+        self.buyers, self.buyer_p = buyers.index.to_numpy(dtype=object), (buyers / buyers.sum()).to_numpy()
+        quantity = raw["Quantity"].value_counts()
+        self.quantities, self.quantity_p = quantity.index.to_numpy(), (quantity / quantity.sum()).to_numpy()
+        self.sizes = raw[["Height", "Width", "Length"]].to_numpy(dtype=float)
+        self.unit_weight = (raw["Total_Weight"] / raw["Quantity"]).to_numpy(dtype=float)
+        self.dates = pd.to_datetime(raw["Date_Bought"]).to_numpy(dtype="datetime64[D]")
+        self.first_date, self.last_date = self.dates.min(), self.dates.max()
+
+    @classmethod
+    def from_workbook(cls, path=SOURCE_PATH, sheet_name="Ducks"):
+        return cls(read_excel_ducks(path, sheet_name))
+
+
+## `n` synthetic ducks with the real sheet's columns and dtypes, sorted by purchase date like the workbook.
+## the same seed always gives the same frame
+def generate_ducks(n, seed=0, catalog=None):
+    catalog = catalog or DuckCatalog.from_workbook()
+    rng = np.random.default_rng(seed)
+    m = len(catalog.raw)
+
+    ## location / method / retailer of a real purchase, scattered around its city
+    purchase = catalog.purchases.iloc[rng.integers(0, m, n)].reset_index(drop=True)
+    purchase["Latitude"] = np.round(purchase["Latitude"].to_numpy() + rng.normal(0, LOCATION_JITTER, n), 6)
+    purchase["Longitude"] = np.round(purchase["Longitude"].to_numpy() + rng.normal(0, LOCATION_JITTER, n), 6)
+
+    ## shape of a real duck, scaled as a whole and wobbled per axis; weight follows the volume
+    model = rng.integers(0, m, n)
+    scale = rng.lognormal(0, SIZE_JITTER, n)
+    sizes = catalog.sizes[model] * scale[:, None] * rng.lognormal(0, SIZE_JITTER / 2, (n, 3))
+    unit_weight = catalog.unit_weight[model] * scale ** 3 * rng.lognormal(0, SIZE_JITTER / 2, n)
+    quantity = rng.choice(catalog.quantities, n, p=catalog.quantity_p)
+
+    ## purchase dates follow the real collection's pace, kept inside its first..last purchase
+    days = catalog.dates[rng.integers(0, m, n)] + rng.integers(-DATE_JITTER_DAYS, DATE_JITTER_DAYS + 1, n).astype("timedelta64[D]")
+    days = np.clip(days, catalog.first_date, catalog.last_date)
+
+    ## a real duck's kind and bio, and its name with a serial so every generated name is distinct
+    persona = catalog.raw.iloc[rng.integers(0, m, n)].reset_index(drop=True)
+    serial = pd.Series(np.arange(1, n + 1)).astype(str)
+
+    df = pd.DataFrame({
+        "Duck": persona["Duck"],
+        "Name": persona["Name"].astype(str) + " " + serial,
+        "Purchase_Method": purchase["Purchase_Method"],
+        "Purchase_Retailer": purchase["Purchase_Retailer"],
+        "Purchase_City": purchase["Purchase_City"],
+        "Purchase_State": purchase["Purchase_State"],
+        "Purchase_Country": purchase["Purchase_Country"],
+        "ISO_Code": purchase["ISO_Code"],
+        "Date_Bought": pd.to_datetime(days).astype("datetime64[ns]"),
+        "Latitude": purchase["Latitude"],
+        "Longitude": purchase["Longitude"],
+        "About Me": persona["About Me"],
+        "Buyer": rng.choice(catalog.buyers, n, p=catalog.buyer_p),
+        "Quantity": quantity.astype(np.int64),
+        "Total_Weight": np.maximum(np.round(unit_weight * quantity, 1), 0.1),
+        "Height": np.round(sizes[:, 0], 2),
+        "Width": np.round(sizes[:, 1], 2),
+        "Length": np.round(sizes[:, 2], 2),
+    })
+    return df.sort_values("Date_Bought", kind="mergesort").reset_index(drop=True)
+
+
+## write ducks as .xlsx (a "Ducks" sheet, like the real workbooks), .csv or .parquet, picked by extension
+def write_ducks(df, path):
+    ext = os.path.splitext(path)[1].lower()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if ext == ".xlsx":
+        if len(df) > XLSX_MAX_ROWS:
+            raise ValueError("{:,} rows won't fit in one worksheet (max {:,}), write csv or parquet".format(len(df), XLSX_MAX_ROWS))
+        with pd.ExcelWriter(path) as writer:
+            df.to_excel(writer, sheet_name="Ducks", index=False)
+    elif ext == ".csv":
+        df.to_csv(path, index=False, date_format="%Y-%m-%d")
+    elif ext == ".parquet":
+        ## needs pyarrow (or fastparquet)
+        df.to_parquet(path, index=False)
+    else:
+        raise ValueError("unknown ducks file type {!r}, use .xlsx, .csv or .parquet".format(ext))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Ducks dataset for load testing.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--source", default=SOURCE_PATH, help="workbook to learn the distributions from")
+    parser.add_argument("--out", action="append",
+                        help="output file(s), .xlsx/.csv/.parquet (default: data/synthetic/ducks-<rows>.parquet)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ducks = generate_ducks(args.rows, args.seed, DuckCatalog.from_workbook(args.source))
+    print("generated {:,} ducks in {:.2f}s".format(len(ducks), time.perf_counter() - start), file=sys.stderr)
+    for out in args.out or [os.path.join("data", "synthetic", "ducks-{}.parquet".format(args.rows))]:
+        start = time.perf_counter()
+        print(write_ducks(ducks, out), "({:.2f}s)".format(time.perf_counter() - start))
@@ -0,0 +1,194 @@
+## imports
+
+import json
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import plotly
+from dash import dash_table
+
+## columns shown in the collection table
+TABLE_COLUMNS = ["Name","Purchase_City","Purchase_Country","Date_Bought","About Me","Total_Weight","Height","Width","Length"]
+
+PAGE_SIZE = 20
+
+## dash filter_query operators, longest first so "<=" wins over "<"
+FILTER_OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+## split one "{col} op value" part of a dash filter_query into (col, op, value)
+def split_filter_part(filter_part):
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ""
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+## a filter value as text, for text columns and contains / datestartswith: split_filter_part reads
+## "2022" and "32" as numbers, which must still match the date 2022-... and the duck named 32
+def filter_text(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+## text columns as arrow-backed strings when pyarrow is installed: one contiguous buffer per column
+## instead of a python object per cell, so pages forked workers only read stay shared
+def arrow_strings(frame):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return frame
+    text = [col for col in frame.columns if frame[col].dtype == object]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return frame.astype({col: "string[pyarrow]" for col in text})
+
+
+## the table rows for one dataset version, with cached sort orders so a page request is a slice, not a sort
+class TableIndex:
+
+    def __init__(self, df):
+        frame = df[TABLE_COLUMNS].reset_index(drop=True)
+        ## iso strings sort the same as the dates and serialize without a custom encoder
+        frame["Date_Bought"] = pd.to_datetime(frame["Date_Bought"]).dt.strftime("%Y-%m-%d")
+        ## cells that are numbers in a text column (a duck named 32) are compared and sorted as text anyway
+        for col in frame.columns[frame.dtypes == object]:
+            frame[col] = frame[col].where(frame[col].isna(), frame[col].astype(str))
+        self.frame = arrow_strings(frame)
+        self._orders = {}
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    ## row positions sorted by one column, computed once per (column, direction)
+    def order(self, column, direction="asc"):
+        key = (column, direction)
+        if key not in self._orders:
+            values = self.frame[column]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.fillna("").astype(str).str.lower()
+            order = np.argsort(values.to_numpy(), kind="mergesort")
+            if direction == "desc":
+                order = order[::-1]
+            self._orders[key] = order
+        return self._orders[key]
+
+    ## boolean mask for a dash filter_query, cached per query string
+    def mask(self, filter_query):
+        if not filter_query:
+            return None
+        if filter_query in self._masks:
+            return self._masks[filter_query]
+
+        mask = np.ones(len(self.frame), dtype=bool)
+        for part in filter_query.split(' && '):
+            col_name, operator, value = split_filter_part(part)
+            if col_name not in self.frame.columns:
+                continue
+            col = self.frame[col_name]
+            if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+                if pd.api.types.is_numeric_dtype(col):
+                    ## a value that isn't a number ({Height} > abc) compares as NaN: no rows match, or every row for ne
+                    value = pd.to_numeric(value, errors="coerce")
+                else:
+                    col = col.astype(str)
+                    value = filter_text(value)
+                part_mask = getattr(col, operator)(value)
+            elif operator == 'contains':
+                part_mask = col.astype(str).str.contains(filter_text(value), case=False, regex=False)
+            elif operator == 'datestartswith':
+                part_mask = col.astype(str).str.startswith(filter_text(value))
+            else:
+                continue
+            mask &= part_mask.fillna(False).to_numpy(dtype=bool)
+
+        if len(self._masks) > 64:
+            self._masks.clear()
+        self._masks[filter_query] = mask
+        return mask
+
+    ## one page of records plus the page count for the current sort/filter; `hits` (ranked row positions from
+    ## duck_search.SearchIndex) limits the rows to a search's matches, in rank order unless a sort is picked
+    def page(self, page_current=0, page_size=PAGE_SIZE, sort_by=None, filter_query="", hits=None):
+        page_current = page_current or 0
+        page_size = page_size or PAGE_SIZE
+
+        if sort_by:
+            positions = self.order(sort_by[0]['column_id'], sort_by[0]['direction'])
+            if hits is not None:
+                matched = np.zeros(len(self.frame), dtype=bool)
+                matched[hits] = True
+                positions = positions[matched[positions]]
+        elif hits is not None:
+            positions = hits
+        else:
+            positions = np.arange(len(self.frame))
+
+        mask = self.mask(filter_query)
+        if mask is not None:
+            positions = positions[mask[positions]]
+
+        page_count = max(1, -(-len(positions) // page_size))
+        start = page_current * page_size
+        rows = self.frame.iloc[positions[start:start + page_size]].astype(object)
+        return rows.where(rows.notna(), None).to_dict('records'), page_count
+
+
+## bytes the browser downloads for a component tree
+def layout_payload_size(component):
+    return len(json.dumps(component, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8"))
+
+
+## compare embedding every row in the layout against the backend paged table
+def payload_report(df, page_size=PAGE_SIZE):
+    index = TableIndex(df)
+    columns = [{"name": i, "id": i} for i in TABLE_COLUMNS]
+    embedded = dash_table.DataTable(data=index.frame.to_dict('records'), columns=columns)
+    first_page, page_count = index.page(0, page_size)
+    paged = dash_table.DataTable(data=first_page, columns=columns, page_current=0, page_size=page_size,
+                                 page_count=page_count, page_action='custom',
+                                 sort_action='custom', filter_action='custom')
+    return {
+        "rows": len(index),
+        "embedded_bytes": layout_payload_size(embedded),
+        "paged_bytes": layout_payload_size(paged),
+    }
+
+
+if __name__ == "__main__":
+    from duck_loader import load_ducks
+    from duck_engine import prepare_ducks
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "./data/duck_data.xlsx"
+    r = payload_report(prepare_ducks(load_ducks(path)))
+    print("{} rows".format(r["rows"]))
+    print("  table in layout, all rows:     {:>10,} bytes".format(r["embedded_bytes"]))
+    print("  table in layout, first page:   {:>10,} bytes".format(r["paged_bytes"]))
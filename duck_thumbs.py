@@ -0,0 +1,124 @@
+## imports
+
+import argparse
+import hashlib
+import html
+import os
+import shutil
+import threading
+
+## optional: without pillow the original image is published under its content hash instead of being resized
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+## picture used for every duck that doesn't have its own
+DEFAULT_IMAGE = "./img/DuckFamily.jpg"
+
+## per-duck pictures, looked up by duck name (e.g. ./img/ducks/Quackby.jpg)
+DUCK_IMAGE_DIR = "./img/ducks"
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".webp"]
+
+## where thumbnails are written; streamlit serves ./static at app/static when static serving is on
+THUMB_DIR = "./static/thumbs"
+
+## thumbnail widths in px; the browser picks one from the srcset for the width the card is drawn at
+THUMB_WIDTHS = [160, 320, 640, 1280]
+
+JPEG_QUALITY = 82
+
+
+## resized copies of the duck pictures, named by a hash of the source bytes: an unchanged picture maps to the
+## same files forever (so they can be cached as immutable), and ducks sharing a picture share its thumbnails
+class ThumbnailStore:
+
+    def __init__(self, thumb_dir=THUMB_DIR, widths=THUMB_WIDTHS):
+        self.thumb_dir = thumb_dir
+        self.widths = widths
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    ## source picture for a duck: its own file when there is one, the family picture otherwise
+    def source(self, name):
+        stem = str(name).replace("/", "_").replace("\\", "_")
+        for ext in IMAGE_EXTENSIONS:
+            path = os.path.join(DUCK_IMAGE_DIR, stem + ext)
+            if os.path.isfile(path):
+                return path
+        return DEFAULT_IMAGE
+
+    ## {width: file name} of the thumbnails for a picture, written on first use and reused after that
+    def thumbnails(self, path):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        thumbs = self._sets.get(key)
+        if thumbs is None:
+            with self._lock:
+                thumbs = self._sets.get(key)
+                if thumbs is None:
+                    thumbs = self._sets[key] = self._write(path)
+        return thumbs
+
+    def _write(self, path):
+        with open(path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        os.makedirs(self.thumb_dir, exist_ok=True)
+
+        if Image is None:
+            name = digest + os.path.splitext(path)[1].lower()
+            if not os.path.exists(os.path.join(self.thumb_dir, name)):
+                self._publish(name, lambda tmp: shutil.copyfile(path, tmp))
+            return {None: name}
+
+        thumbs = {}
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            ## never upscale: widths past the original collapse into one full-width copy
+            widths = sorted({min(width, image.width) for width in self.widths})
+            for width in widths:
+                name = "{}-{}.jpg".format(digest, width)
+                if not os.path.exists(os.path.join(self.thumb_dir, name)):
+                    height = max(1, round(image.height * width / image.width))
+                    resized = image.resize((width, height), Image.LANCZOS)
+                    self._publish(name, lambda tmp: resized.save(tmp, "JPEG", quality=JPEG_QUALITY,
+                                                                 optimize=True, progressive=True))
+                thumbs[width] = name
+        return thumbs
+
+    ## write to a temp name and rename, so a server never hands out half a file
+    def _publish(self, name, write):
+        final = os.path.join(self.thumb_dir, name)
+        tmp = "{}.{}.tmp".format(final, os.getpid())
+        write(tmp)
+        os.replace(tmp, final)
+
+    ## lazily loaded <img> for a duck, with a srcset over the thumbnail widths; `url_prefix` is where the
+    ## thumb dir is served (/thumbs in dash, app/static/thumbs in streamlit); `path` overrides the duck's picture
+    def img_html(self, name, url_prefix, sizes="(max-width: 768px) 100vw, 25vw", style="width:100%", path=None):
+        thumbs = self.thumbnails(path or self.source(name))
+        url = lambda file_name: "{}/{}".format(url_prefix.rstrip("/"), file_name)
+        widths = [w for w in thumbs if w is not None]
+        ## the smallest size that still looks sharp on a typical card is the fallback src
+        src = url(thumbs[widths[min(1, len(widths) - 1)]] if widths else thumbs[None])
+        srcset = ", ".join("{} {}w".format(url(thumbs[w]), w) for w in widths)
+        return '<img src="{}"{} sizes="{}" loading="lazy" decoding="async" alt="{}" style="{}">'.format(
+            html.escape(src), ' srcset="{}"'.format(html.escape(srcset)) if srcset else "",
+            html.escape(sizes), html.escape(str(name)), html.escape(style))
+
+    ## generate thumbnails for every duck up front (e.g. at deploy time)
+    def warm(self, names):
+        for name in names:
+            self.thumbnails(self.source(name))
+        return self
+
+
+if __name__ == "__main__":
+    from duck_loader import read_ducks
+
+    parser = argparse.ArgumentParser(description="Write the card thumbnails for every duck in the workbook.")
+    parser.add_argument("source", nargs="?", default="./data/duck_data.xlsx")
+    args = parser.parse_args()
+
+    store = ThumbnailStore().warm(read_ducks(args.source, "Ducks")["Name"])
+    print("{} thumbnails in {}".format(len(os.listdir(store.thumb_dir)), store.thumb_dir))
@@ -0,0 +1,62 @@
+## imports
+
+import logging
+import os
+import threading
+import time
+
+from duck_loader import source_signature
+
+logger = logging.getLogger(__name__)
+
+
+## holds the current build of a workbook and swaps in a new one when the file changes.
+## `build(path, signature, previous)` gets the version being replaced (None on first load) so it can
+## reuse work from it. builds happen on a background thread; readers grab `watcher.current` once per request
+## and keep using that version even if a newer one is swapped in while they run.
+class DatasetWatcher:
+
+    def __init__(self, path, build, interval=5.0):
+        self.path = path
+        self.build = build
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.signature = source_signature(path)
+        self.current = build(path, self.signature, None)
+
+    ## rebuild if the workbook's mtime/size changed; returns True when a new version was swapped in
+    def refresh(self):
+        with self._lock:
+            try:
+                signature = source_signature(self.path)
+            except OSError:
+                ## mid-save or briefly missing, keep serving what we have
+                return False
+            if signature == self.signature:
+                return False
+            try:
+                dataset = self.build(self.path, signature, self.current)
+            except Exception:
+                ## a half saved workbook can fail to parse, try again on the next poll
+                logger.exception("rebuild of %s failed, keeping version %s", self.path, self.current["version"])
+                return False
+            self.signature = signature
+            self.current = dataset
+            logger.info("swapped in %s version %s", self.path, dataset["version"])
+            return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+    ## start polling in a daemon thread (once per process, threads don't survive a fork)
+    def start(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return self
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="duck-watcher", daemon=True)
+        self._thread.start()
+        return self
@@ -0,0 +1,104 @@
+## imports
+
+import gzip
+import hashlib
+import json
+import threading
+
+import plotly
+import plotly.io as pio
+from flask import Response
+
+## optional fast encoder / extra compression; everything works without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_ENGINE = "orjson" if orjson is not None else "json"
+
+
+## encode any plain/numpy/pandas-ish object to json bytes with the fastest encoder available
+def dumps(obj):
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8")
+
+
+## one serialized response body, kept raw and pre-compressed, with a strong content etag
+class Payload:
+
+    def __init__(self, raw, mimetype="application/json"):
+        self.raw = raw
+        self.mimetype = mimetype
+        self.gzip = gzip.compress(raw, compresslevel=6)
+        self.br = brotli.compress(raw) if brotli is not None else None
+        self.etag = '"{}"'.format(hashlib.sha1(raw).hexdigest())
+
+    ## flask response for `request`: 304 on a matching If-None-Match, else the best encoding the client accepts
+    def response(self, request):
+        headers = {
+            "ETag": self.etag,
+            "Vary": "Accept-Encoding",
+            ## always revalidate, the etag makes that a cheap 304
+            "Cache-Control": "no-cache",
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        if self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status=304, headers=headers)
+
+        ## Accept-Encoding parsed with its q-values: the highest-q encoding we have (br on a tie), never one at q=0
+        accept = request.accept_encodings
+        encodings = [(name, body) for name, body in [("br", self.br), ("gzip", self.gzip)]
+                     if body is not None and accept.quality(name) > 0]
+        if encodings:
+            name, body = max(encodings, key=lambda encoding: accept.quality(encoding[0]))
+            headers["Content-Encoding"] = name
+        else:
+            body = self.raw
+        return Response(body, mimetype=self.mimetype, headers=headers)
+
+
+## figures of one dataset version, each serialized at most once
+class FigureRegistry:
+
+    def __init__(self, version, figures):
+        self.version = version
+        self.figures = figures
+        self._payloads = {}
+        self._parsed = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.figures
+
+    def payload(self, name):
+        payload = self._payloads.get(name)
+        if payload is None:
+            with self._lock:
+                payload = self._payloads.get(name)
+                if payload is None:
+                    raw = pio.to_json(self.figures[name], validate=False, engine=JSON_ENGINE).encode("utf-8")
+                    payload = self._payloads[name] = Payload(raw)
+        return payload
+
+    ## the figure as plain dicts (decoded once from the cached bytes) for embedding in dash components
+    def figure_json(self, name):
+        parsed = self._parsed.get(name)
+        if parsed is None:
+            parsed = self._parsed[name] = json.loads(self.payload(name).raw)
+        return parsed
+
+    ## serialize everything up front, e.g. on the watcher thread before a version is swapped in
+    def warm(self):
+        for name in self.figures:
+            self.payload(name)
+        return self
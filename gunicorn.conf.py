@@ -0,0 +1,31 @@
+## gunicorn settings for the Procfile deployment.
+## with preload on (the default) the dataset, figure bytes and tab bodies are built once in the master;
+## forked workers share those pages copy-on-write instead of each importing analyducks and building their own.
+
+import gc
+import os
+
+os.environ.setdefault("ANALYDUCKS_PRELOAD", "1")
+preload_app = os.environ["ANALYDUCKS_PRELOAD"] == "1"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+if preload_app:
+    ## a collection pass writes to every object it visits, which would un-share the pages;
+    ## keep it off while the app loads in the master
+    gc.disable()
+
+
+## everything built so far moves to the permanent generation, so workers' collections never scan it
+def when_ready(server):
+    if preload_app:
+        gc.freeze()
+
+
+## threads don't survive a fork: each worker polls the workbook itself (a reloaded version is private to that worker)
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        import analyducks
+        if analyducks.RELOAD_INTERVAL > 0:
+            analyducks.dataset_watcher.start()
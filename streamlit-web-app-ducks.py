@@ -5,45 +5,335 @@ import pandas as pd
 # import altair as alt
 # import plotly.figure_factory as ff
 import plotly.express as px
-# import plotly.graph_objs as go
+import plotly.graph_objs as go
 
 import datetime as dt
 from datetime import date
-# import os
+import os
 
 import numpy as np
 # import dash_bootstrap_components as dbc
 
+from duck_loader import load_ducks, source_signature
+from duck_engine import prepare_ducks, build_aggregates
+from duck_kpis import KpiIndex
+from duck_series import PurchaseSeries, GRANULARITIES, ROLLING_WINDOWS
+from duck_geo import GeoClusters
+from duck_lod import LodScatter
+from duck_cube import build_cube, filtered_tables, filters_active
+from duck_thumbs import ThumbnailStore
+from duck_search import SearchIndex
+from duck_similar import SimilarDucks, SIMILAR_DIMS
+
 
 # from streamlit_card import card
 
-## read in excel dataset
-df = pd.read_excel("data/data.xlsx", sheet_name="Ducks")
+DATA_PATH = os.environ.get("ANALYDUCKS_DATA_PATH", "data/data.xlsx")
+
+## cache hierarchy: raw frame -> aggregates -> figures, every layer keyed on the workbook signature
+## (path + mtime + size) so saving the xlsx invalidates all of them on the next rerun
+
+## raw frame layer
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_frame(signature):
+    ## read in excel dataset (served from the pickled snapshot unless the workbook changed)
+    df = load_ducks(DATA_PATH, sheet_name="Ducks")
+
+    ## convert dates, add year + avg weight
+    return prepare_ducks(df, date_format='%m/%d/%Y')
+
+## cube layer: dense Year x Country x State x Method x Buyer sums, so sidebar filters don't re-run groupbys
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_cube(signature):
+    return build_cube(load_frame(signature))
+
+## aggregate layer: state, country, purchase method, buyer, year, weight, and cumulative weight tables in one pass
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_aggregates(signature):
+    aggregates = build_aggregates(load_frame(signature))
+    aggregates["buyer_df"] = aggregates["buyer_df"].sort_values(by=['Quantity'],ascending=True)
+    return aggregates
+
+## KPI layer: sorted purchase dates + running totals, so "last year" is re-evaluated cheaply on every rerun
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_kpi_index(signature):
+    return KpiIndex(load_frame(signature))
+
+## time series layer: calendar buckets and rolling windows off the KPI index's sorted dates, cached per granularity
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_series(signature):
+    return PurchaseSeries(load_kpi_index(signature))
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_series_figures(signature, granularity, window):
+    series = load_series(signature)
+
+    ## bar plot showing ducks bought per day / week / month
+    series_fig = px.bar(series.resample(granularity), x="Date", y="Quantity")
+    series_fig.update_layout(title_text="Rubber Ducks Bought ({})".format(GRANULARITIES[granularity]),
+                             title_x=0.3,
+                             xaxis_title="Purchase Date",
+                             yaxis_title="Quantity",
+                             paper_bgcolor="rgba(0,0,0,0)"
+                             )
+
+    ## ducks and grams bought over the trailing window, weight on its own axis
+    rolling = series.rolling(window)
+    rolling_fig = go.Figure([
+        go.Scatter(x=rolling["Date"], y=rolling["Quantity"], name="Ducks", mode="lines"),
+        go.Scatter(x=rolling["Date"], y=rolling["Total_Weight"], name="Weight (g)", mode="lines", yaxis="y2"),
+    ])
+    rolling_fig.update_layout(title_text="Purchases Over The Trailing {} Days".format(window),
+                              title_x=0.3,
+                              xaxis_title="Purchase Date",
+                              yaxis=dict(title="Quantity"),
+                              yaxis2=dict(title="Weight (g)", overlaying="y", side="right"),
+                              legend=dict(orientation="h", y=-0.2),
+                              paper_bgcolor="rgba(0,0,0,0)"
+                              )
+    return series_fig, rolling_fig
+
+## card picture layer: content-hashed thumbnails in ./static/thumbs, which streamlit serves at app/static/thumbs
+## (enableStaticServing in .streamlit/config.toml); the <img> tags are built once per workbook version
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_thumbnails():
+    return ThumbnailStore()
+
+## search layer: inverted index over name / about me / city / retailer; queries return ranked row positions
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_search_index(signature):
+    return SearchIndex(load_frame(signature))
+
+## row positions the card grid and table list: every duck, or a search's ranked matches
+def listed_positions(signature, query):
+    hits = load_search_index(signature).query(query)
+    return np.arange(len(load_frame(signature))) if hits is None else hits
+
+## neighbour layer: ducks nearest in standardized size / weight, for each card's "ducks like me" line
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_similar(signature):
+    return SimilarDucks(load_frame(signature)[["Name"] + SIMILAR_DIMS])
+
+## card layer: (image, name, about, similar names) for one page of the grid, so a rerun only touches the cards on screen
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_card_page(signature, page, per_page, query=""):
+    positions = listed_positions(signature, query)[page * per_page:(page + 1) * per_page]
+    rows = load_frame(signature).iloc[positions]
+    thumbnails = load_thumbnails()
+    similar = load_similar(signature)
+    return [(thumbnails.img_html(name, "app/static/thumbs"), name, about,
+             [str(like) for _, like, _ in similar.similar(duck_id)])
+            for duck_id, name, about in zip(rows.index, rows["Name"], rows["About Me"])]
+
+## lowercased names in card order, for the search box
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_name_index(signature):
+    return load_frame(signature)["Name"].astype(str).str.lower().to_numpy().astype(str)
+
+## position (within the listed ducks) of the first one whose name is, starts with, or contains `text`
+def find_duck(signature, text, query=""):
+    text = text.strip().lower()
+    if not text:
+        return None
+    names = load_name_index(signature)[listed_positions(signature, query)]
+    for hits in (names == text, np.char.startswith(names, text), np.char.find(names, text) >= 0):
+        positions = np.flatnonzero(hits)
+        if len(positions):
+            return int(positions[0])
+    return None
+
+## purchase locations; one marker per duck for small collections, grid clusters once it's large
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_geo_clusters(signature):
+    return GeoClusters(load_frame(signature))
+
+## charts drawn from the aggregate tables (everything but the 3d scatter and the bare location map)
+def chart_figures(aggregates, geo_clusters):
+    state_df = aggregates["state_df"]
+    county_df = aggregates["county_df"]
+    purchase_method_df = aggregates["purchase_method_df"]
+    buyer_df = aggregates["buyer_df"]
+    yearly_df = aggregates["yearly_df"]
+    weight_df = aggregates["weight_df"]
+    weight_cum_df = aggregates["weight_cum_df"]
+
+    ###################### General Data graphs ##############################
+
+    ## pie chart showing purchase method of ducks
+
+    purchase_fig = px.pie(purchase_method_df, values='Quantity', names='Purchase_Method')
+    purchase_fig.update_layout(title_text="Purchase Method Distribution",
+                               title_x=0.2,
+                               paper_bgcolor="rgb(235,204,52)",
+                               plot_bgcolor="rgb(206,212,218)",
+                               font=dict(color="black")
+                               )
+
+    # st.plotly_chart(purchase_fig, use_container_width=True)
+
+    owner_bar = px.bar(buyer_df,x="Buyer", y="Quantity")
+    owner_bar.update_layout(title_text="Rubber Duck Distribution by Purchaser", 
+                            title_x=0.2,
+                            xaxis_title="Purchaser", 
+                            yaxis_title="Quantity",
+                            paper_bgcolor="rgb(235,204,52)",
+                            plot_bgcolor="rgb(206,212,218)",
+                            font=dict(color="black")
+                            )
+
+    # st.plotly_chart(owner_bar, use_container_width=True)
+
+    ###################### Purchase and weight graphs ##############################
+
+    ## bar plot showing number of ducks bought per year 
+
+    year_bar = px.bar(yearly_df,x="Year", y="Quantity")
+    year_bar.update_layout(title_text="Rubber Ducks Bought Per Year", 
+                           title_x=0.3,
+                           xaxis_title="Purchase Year",
+                           yaxis_title="Quantity",
+                           paper_bgcolor="rgba(0,0,0,0)"
+                           )
+
+    # st.plotly_chart(year_bar, use_container_width=True)
+
+    ## bar plot showing number of ducks bought per year, cumulative
+
+    year_bar_cumulative = px.line(weight_cum_df,x="Year", y="Quantity")
+    year_bar_cumulative.update_layout(title_text="Total Rubber Ducks Owned",
+                                      title_x=0.3,
+                                      xaxis_title="Purchase Year", 
+                                      yaxis_title="Quantity",
+                                      paper_bgcolor="rgba(0,0,0,0)"
+                                      )
+
+    # st.plotly_chart(year_bar_cumulative, use_container_width=True)
+
+
+    ## bar plot showing weight of ducks bought each year
+
+    weight_bar = px.bar(weight_df,x="Year", y="Total_Weight")
+    weight_bar.update_layout(title_text="Weight (g) of Annual Purchases",
+                             title_x=0.3,
+                             xaxis_title="Purchase Year",
+                             yaxis_title="Weight (g)",
+                             paper_bgcolor="rgba(0,0,0,0)"
+                             )
+
+    # st.plotly_chart(weight_bar, use_container_width=True)
+
+
+    ## bar plot showing weight of ducks bought each year, cumulative
+
+    weight_bar_cumulative = px.line(weight_cum_df,x="Year", y="Total_Weight")
+    weight_bar_cumulative.update_layout(title_text="Cumulative Collection Weight (g)",
+                                        title_x=0.3,
+                                        xaxis_title="Purchase Year", 
+                                        yaxis_title="Cumulative Weight (g)",
+                                        paper_bgcolor="rgba(0,0,0,0)"
+                                        )
+
+    # st.plotly_chart(weight_bar_cumulative, use_container_width=True)
 
-## convert date bought col to date, and extract year into a column
-df['Date_Bought'] = pd.to_datetime(df['Date_Bought'],format='%m/%d/%Y').dt.date
-# df['Year'] = pd.to_datetime(df['Date_Bought'],format='%Y')
-df['Year'] = pd.DatetimeIndex(df['Date_Bought']).year
-df = df.sort_values(by=['Date_Bought'], ascending=True)
+    ###################### Mapping graphs ##############################
 
-## find avg weight measure, needed for rows where more than 1 duck is included in the total weight
-df['Avg_Weight'] = np.round(df.Total_Weight/df.Quantity,2)
 
-## transform and create new dfs to find ducks bought by state, country, purchase method, buyer, year, weight, and cumulative weight
-state_df = df.groupby(["Purchase_State"]).agg({"Quantity":"sum"}).reset_index()
-state_df = state_df[state_df["Purchase_State"]!=""]
+    # st.plotly_chart(year_bar_cumulative, use_container_width=True)
 
-county_df = df.groupby(["ISO_Code","Purchase_Country"]).agg({"Quantity":"sum"}).reset_index()
+    ## choropleth showing duck purchase by country
 
-purchase_method_df = df.groupby(["Purchase_Method"]).agg({"Quantity":"sum"}).reset_index()
+    country_fig = px.choropleth(county_df, locations="ISO_Code",
+                        color="Quantity", 
+                        hover_name="Purchase_Country"
+                        # color_continuous_scale="YlGn"
+                        )
+    country_fig.add_trace(geo_clusters.trace(4.0))
+
+    country_fig.update_geos(
+        visible=True, resolution=50, scope="world", showcountries=True, countrycolor="Black"
+    )
+    country_fig.update_geos(projection_type="natural earth")
+    country_fig.update_layout(title_text="Rubber Duck Purchase By Country",title_x=0.3,width=1000)
+
+    # st.plotly_chart(country_fig, use_container_width=True)
+
+    ## choropleth showing duck purchase by US state
+
+    state_fig = px.choropleth(state_df,locations="Purchase_State", 
+                              locationmode="USA-states", 
+                              color="Quantity", 
+                              scope="usa"
+                            #   color_continuous_scale="YlGn"
+                              )
+    state_fig.update_layout(title_text="Rubber Duck Purchase By State",title_x=0.3)
+    state_fig.add_trace(geo_clusters.trace(1.0))
+
+    # st.plotly_chart(state_fig, use_container_width=True)
+
+    return {
+        "purchase_fig": purchase_fig,
+        "owner_bar": owner_bar,
+        "year_bar": year_bar,
+        "year_bar_cumulative": year_bar_cumulative,
+        "weight_bar": weight_bar,
+        "weight_bar_cumulative": weight_bar_cumulative,
+        "country_fig": country_fig,
+        "state_fig": state_fig,
+    }
+
+## figure layer: plotly objects are cached as resources so reruns reuse them instead of rebuilding ten figures
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_figures(signature):
+    df = load_frame(signature)
+    geo_clusters = load_geo_clusters(signature)
+    figures = chart_figures(load_aggregates(signature), geo_clusters)
+
+    ## 3d scatter of length, height, width (voxel-binned down to the point budget for large collections)
+
+    three_d_points = LodScatter(df).points()
+    three_d_fig = px.scatter_3d(three_d_points, x='Length', 
+                                y='Width', 
+                                z="Height",
+                                size='Avg_Weight',
+                                color='Avg_Weight',
+                                labels={'Avg_Weight':'Avg. Weight'}
+                                )
+
+    three_d_fig.update_layout(title_text="Rubber Duck Length vs Width vs Height (cm)",
+                              title_x=0.2,
+                              paper_bgcolor="rgb(235,204,52)",
+                              plot_bgcolor="rgb(255,0,0)",
+                              font=dict(color="black")
+                              )
+    camera = dict(
+        eye=dict(x=0, y=2, z=1),
+        # up=dict(x=1, y=1, z=0),
+    )
+
+    # camera = dict(
+    #     center=dict(x=0, y=0, z=0))
 
-buyer_df = df.groupby(["Buyer"]).agg({"Quantity":"sum"}).reset_index()
-buyer_df = buyer_df.sort_values(by=['Quantity'],ascending=True)
-yearly_df = df.groupby(["Year"]).agg({"Quantity":"sum"}).reset_index()
+    three_d_fig.update_layout(scene_camera=camera)
 
-weight_df = df.groupby(["Year"]).agg({"Total_Weight":"sum"}).reset_index()
+    figures["three_d_fig"] = three_d_fig
+    figures["map_fig"] = go.Figure(geo_clusters.trace(4.0))
+    return figures
 
-weight_cum_df = df.groupby(['Year']).sum().cumsum().reset_index()
+## filtered figure layer: one entry per sidebar selection; the point-level figures (3d scatter, location
+## markers) always show the whole collection, so only the chart tables are recomputed from the cube
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_filtered_figures(signature, filters):
+    if not filters_active(filters):
+        return load_figures(signature)
+    aggregates = filtered_tables(load_cube(signature), load_frame(signature), filters)
+    aggregates["buyer_df"] = aggregates["buyer_df"].sort_values(by=['Quantity'],ascending=True)
+    figures = dict(load_figures(signature))
+    figures.update(chart_figures(aggregates, load_geo_clusters(signature)))
+    return figures
+
+## cheap stat of the workbook each rerun; a new mtime/size is a cache miss for every layer
+signature = source_signature(DATA_PATH)
+df = load_frame(signature)
 
 ## insert a title for the app and instructions
 st.set_page_config(page_title="Analyducks", layout="wide")
@@ -72,24 +362,12 @@ st.markdown(
 # <div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="852.7999877929688" data-testid="stVerticalBlock" class="st-emotion-cache-pplk8x e1f1d6gn1"><div data-testid="stHorizontalBlock" class="st-emotion-cache-ocqkz7 e1f1d6gn4"><div data-testid="column" class="st-emotion-cache-j5r0tf e1f1d6gn2"><div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="157.7624969482422" data-testid="stVerticalBlock" class="st-emotion-cache-9xwmxx e1f1d6gn1"><div data-stale="false" width="157.7624969482422" class="element-container st-emotion-cache-az4wv8 e1f1d6gn3" data-testid="element-container"><div data-testid="stMetric"><label data-testid="stMetricLabel" visibility="0" class="st-emotion-cache-1tenn4l e1i5pmia2"><div class="st-emotion-cache-1wivap2 e1i5pmia3"><div data-testid="stMarkdownContainer" class="st-emotion-cache-xujc5b e1nzilvr5"><p>Total Ducks Owned</p></div></div></label><div data-testid="stMetricValue" class="st-emotion-cache-1xarl3l e1i5pmia1"><div class="st-emotion-cache-1wivap2 e1i5pmia3"> 133 </div></div></div></div></div></div></div><div data-testid="column" class="st-emotion-cache-j5r0tf e1f1d6gn2"><div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="157.7624969482422" data-testid="stVerticalBlock" class="st-emotion-cache-9xwmxx e1f1d6gn1"><div data-stale="false" width="157.7624969482422" class="element-container st-emotion-cache-az4wv8 e1f1d6gn3" data-testid="element-container"><div data-testid="stMetric"><label data-testid="stMetricLabel" visibility="0" class="st-emotion-cache-1tenn4l e1i5pmia2"><div class="st-emotion-cache-1wivap2 e1i5pmia3"><div data-testid="stMarkdownContainer" class="st-emotion-cache-xujc5b e1nzilvr5"><p>Ducks Bought Within Last Year</p></div></div></label><div data-testid="stMetricValue" class="st-emotion-cache-1xarl3l e1i5pmia1"><div class="st-emotion-cache-1wivap2 e1i5pmia3"> 78 </div></div></div></div></div></div></div><div data-testid="column" class="st-emotion-cache-j5r0tf e1f1d6gn2"><div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="157.7624969482422" data-testid="stVerticalBlock" class="st-emotion-cache-9xwmxx e1f1d6gn1"><div data-stale="false" width="157.7624969482422" class="element-container st-emotion-cache-az4wv8 e1f1d6gn3" data-testid="element-container"><div data-testid="stMetric"><label data-testid="stMetricLabel" visibility="0" class="st-emotion-cache-1tenn4l e1i5pmia2"><div class="st-emotion-cache-1wivap2 e1i5pmia3"><div data-testid="stMarkdownContainer" class="st-emotion-cache-xujc5b e1nzilvr5"><p>Duck Collection Weight (g)</p></div></div></label><div data-testid="stMetricValue" class="st-emotion-cache-1xarl3l e1i5pmia1"><div class="st-emotion-cache-1wivap2 e1i5pmia3"> 5209.2 </div></div></div></div></div></div></div><div data-testid="column" class="st-emotion-cache-j5r0tf e1f1d6gn2"><div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="157.7624969482422" data-testid="stVerticalBlock" class="st-emotion-cache-9xwmxx e1f1d6gn1"><div data-stale="false" width="157.7624969482422" class="element-container st-emotion-cache-az4wv8 e1f1d6gn3" data-testid="element-container"><div data-testid="stMetric"><label data-testid="stMetricLabel" visibility="0" class="st-emotion-cache-1tenn4l e1i5pmia2"><div class="st-emotion-cache-1wivap2 e1i5pmia3"><div data-testid="stMarkdownContainer" class="st-emotion-cache-xujc5b e1nzilvr5"><p>Unique Countries of Purchase</p></div></div></label><div data-testid="stMetricValue" class="st-emotion-cache-1xarl3l e1i5pmia1"><div class="st-emotion-cache-1wivap2 e1i5pmia3"> 8 </div></div></div></div></div></div></div><div data-testid="column" class="st-emotion-cache-j5r0tf e1f1d6gn2"><div class="st-emotion-cache-1wmy9hl e1f1d6gn0"><div width="157.7624969482422" data-testid="stVerticalBlock" class="st-emotion-cache-9xwmxx e1f1d6gn1"><div data-stale="false" width="157.7624969482422" class="element-container st-emotion-cache-az4wv8 e1f1d6gn3" data-testid="element-container"><div data-testid="stMetric"><label data-testid="stMetricLabel" visibility="0" class="st-emotion-cache-1tenn4l e1i5pmia2"><div class="st-emotion-cache-1wivap2 e1i5pmia3"><div data-testid="stMarkdownContainer" class="st-emotion-cache-xujc5b e1nzilvr5"><p>Unique Cities of Purchase</p></div></div></label><div data-testid="stMetricValue" class="st-emotion-cache-1xarl3l e1i5pmia1"><div class="st-emotion-cache-1wivap2 e1i5pmia3"> 40 </div></div></div></div></div></div></div></div></div></div>
 ###################### KPI Calcs ##############################
 
-# weight KPI
-duck_weight = df["Total_Weight"].sum()
-
-# total ducks bought KPI
-total_ducks = df["Quantity"].sum()
-
-# unique purchase countries KPI
-unique_countries = df.Purchase_Country.nunique()
-
-# unique purchase cities KPI
-unique_cities = df.Purchase_City.nunique()
-
-# ducks bought within last year KPI
-today = date.today()
-today_yr = today.year
-today_day = today.day
-today_month = today.month
-ducks_bought_last_year = df[df["Date_Bought"]>=dt.date(today_yr-1,today_month,today_day)].Quantity.sum()
+kpis = load_kpi_index(signature).kpis(date.today())
+duck_weight = kpis["duck_weight"]
+total_ducks = kpis["total_ducks"]
+unique_countries = kpis["unique_countries"]
+unique_cities = kpis["unique_cities"]
+ducks_bought_last_year = kpis["ducks_bought_last_year"]
 
 with st.container():
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -140,181 +418,84 @@ with st.container():
 # </style>
 # ''', unsafe_allow_html=True)
 
-###################### General Data graphs ##############################
-
-
-
-
-## pie chart showing purchase method of ducks
-
-purchase_fig = px.pie(purchase_method_df, values='Quantity', names='Purchase_Method')
-purchase_fig.update_layout(title_text="Purchase Method Distribution",
-                           title_x=0.2,
-                           paper_bgcolor="rgb(235,204,52)",
-                           plot_bgcolor="rgb(206,212,218)",
-                           font=dict(color="black")
-                           )
-
-# st.plotly_chart(purchase_fig, use_container_width=True)
-
-owner_bar = px.bar(buyer_df,x="Buyer", y="Quantity")
-owner_bar.update_layout(title_text="Rubber Duck Distribution by Purchaser", 
-                        title_x=0.2,
-                        xaxis_title="Purchaser", 
-                        yaxis_title="Quantity",
-                        paper_bgcolor="rgb(235,204,52)",
-                        plot_bgcolor="rgb(206,212,218)",
-                        font=dict(color="black")
-                        )
-
-# st.plotly_chart(owner_bar, use_container_width=True)
-
-## 3d scatter of length, height, width
-
-three_d_fig = px.scatter_3d(df, x='Length', 
-                            y='Width', 
-                            z="Height",
-                            size='Avg_Weight',
-                            color='Avg_Weight',
-                            labels={'Avg_Weight':'Avg. Weight'}
-                            )
+###################### Filters ##############################
+
+## cross-filter for the charts; the KPIs above and the table below stay whole-collection
+years = sorted(df["Year"].dropna().unique().tolist())
+with st.sidebar:
+    st.header("Filters")
+    if len(years) > 1:
+        year_range = st.slider("Purchase Year", min_value=int(years[0]), max_value=int(years[-1]),
+                               value=(int(years[0]), int(years[-1])))
+    else:
+        year_range = None
+    iso_filter = st.multiselect("Country", sorted(df["ISO_Code"].dropna().unique()))
+    method_filter = st.multiselect("Purchase Method", sorted(df["Purchase_Method"].dropna().unique()))
+    buyer_filter = st.multiselect("Purchaser", sorted(df["Buyer"].dropna().unique()))
+
+## a full-range year slider is the same as no year filter, and shares the unfiltered cache entry
+if year_range is not None and year_range == (int(years[0]), int(years[-1])):
+    year_range = None
+filters = {"years": year_range, "iso": tuple(iso_filter), "methods": tuple(method_filter), "buyers": tuple(buyer_filter)}
+figures = load_filtered_figures(signature, filters)
 
-three_d_fig.update_layout(title_text="Rubber Duck Length vs Width vs Height (cm)",
-                          title_x=0.2,
-                          paper_bgcolor="rgb(235,204,52)",
-                          plot_bgcolor="rgb(255,0,0)",
-                          font=dict(color="black")
-                          )
-camera = dict(
-    eye=dict(x=0, y=2, z=1),
-    # up=dict(x=1, y=1, z=0),
-)
-
-# camera = dict(
-#     center=dict(x=0, y=0, z=0))
+###################### General Data graphs ##############################
 
-three_d_fig.update_layout(scene_camera=camera)
+purchase_fig = figures["purchase_fig"]
+owner_bar = figures["owner_bar"]
+three_d_fig = figures["three_d_fig"]
+year_bar = figures["year_bar"]
+year_bar_cumulative = figures["year_bar_cumulative"]
+weight_bar = figures["weight_bar"]
+weight_bar_cumulative = figures["weight_bar_cumulative"]
+map_fig = figures["map_fig"]
+country_fig = figures["country_fig"]
+state_fig = figures["state_fig"]
 
 gen1,gen2,gen3 = st.columns(3)
-gen1.plotly_chart(purchase_fig, use_container_width=True,theme=None)
-gen2.plotly_chart(owner_bar, use_container_width=True,theme=None)
-gen3.plotly_chart(three_d_fig, use_container_width=True,theme=None)
+gen1.plotly_chart(purchase_fig, width="stretch",theme=None)
+gen2.plotly_chart(owner_bar, width="stretch",theme=None)
+gen3.plotly_chart(three_d_fig, width="stretch",theme=None)
 
 ###################### Purchase and weight graphs ##############################
 
-## bar plot showing number of ducks bought per year 
-
-year_bar = px.bar(yearly_df,x="Year", y="Quantity")
-year_bar.update_layout(title_text="Rubber Ducks Bought Per Year", 
-                       title_x=0.3,
-                       xaxis_title="Purchase Year",
-                       yaxis_title="Quantity",
-                       paper_bgcolor="rgba(0,0,0,0)"
-                       )
-
-# st.plotly_chart(year_bar, use_container_width=True)
-
-## bar plot showing number of ducks bought per year, cumulative
-
-year_bar_cumulative = px.line(weight_cum_df,x="Year", y="Quantity")
-year_bar_cumulative.update_layout(title_text="Total Rubber Ducks Owned",
-                                  title_x=0.3,
-                                  xaxis_title="Purchase Year", 
-                                  yaxis_title="Quantity",
-                                  paper_bgcolor="rgba(0,0,0,0)"
-                                  )
-
-# st.plotly_chart(year_bar_cumulative, use_container_width=True)
-
-
-## bar plot showing weight of ducks bought each year
-
-weight_bar = px.bar(weight_df,x="Year", y="Total_Weight")
-weight_bar.update_layout(title_text="Weight (g) of Annual Purchases",
-                         title_x=0.3,
-                         xaxis_title="Purchase Year",
-                         yaxis_title="Weight (g)",
-                         paper_bgcolor="rgba(0,0,0,0)"
-                         )
-
-# st.plotly_chart(weight_bar, use_container_width=True)
-
-
-## bar plot showing weight of ducks bought each year, cumulative
-
-weight_bar_cumulative = px.line(weight_cum_df,x="Year", y="Total_Weight")
-weight_bar_cumulative.update_layout(title_text="Cumulative Collection Weight (g)",
-                                    title_x=0.3,
-                                    xaxis_title="Purchase Year", 
-                                    yaxis_title="Cumulative Weight (g)",
-                                    paper_bgcolor="rgba(0,0,0,0)"
-                                    )
-
-# st.plotly_chart(weight_bar_cumulative, use_container_width=True)
-
 purchase1,purchase2 = st.columns(2)
-purchase1.plotly_chart(year_bar, use_container_width=True,theme=None)
-purchase2.plotly_chart(year_bar_cumulative, use_container_width=True,theme=None)
+purchase1.plotly_chart(year_bar, width="stretch",theme=None)
+purchase2.plotly_chart(year_bar_cumulative, width="stretch",theme=None)
 
 weight1,weight2 = st.columns(2)
-weight1.plotly_chart(weight_bar, use_container_width=True,theme=None)
-weight2.plotly_chart(weight_bar_cumulative, use_container_width=True,theme=None)
-
-
-###################### Mapping graphs ##############################
-
-
-# st.plotly_chart(year_bar_cumulative, use_container_width=True)
-
-map_fig = px.scatter_geo(df,
-        lon = 'Longitude',
-        lat = 'Latitude',
-        hover_name="Name"      
-        )
-
-map_fig.update_traces(marker=dict(color="Red"))
+weight1.plotly_chart(weight_bar, width="stretch",theme=None)
+weight2.plotly_chart(weight_bar_cumulative, width="stretch",theme=None)
 
-# st.plotly_chart(map_fig, use_container_width=True)
+## purchases over time, at the picked granularity / trailing window
+granularity_col, window_col = st.columns(2)
+granularity = granularity_col.radio("Granularity", list(GRANULARITIES), index=2,
+                                    format_func=GRANULARITIES.get, horizontal=True)
+window = window_col.radio("Rolling Window", ROLLING_WINDOWS, index=1,
+                          format_func="{} days".format, horizontal=True)
+series_fig, rolling_fig = load_series_figures(signature, granularity, window)
 
-## choropleth showing duck purchase by country
+series1,series2 = st.columns(2)
+series1.plotly_chart(series_fig, width="stretch",theme=None)
+series2.plotly_chart(rolling_fig, width="stretch",theme=None)
 
-country_fig = px.choropleth(county_df, locations="ISO_Code",
-                    color="Quantity", 
-                    hover_name="Purchase_Country"
-                    # color_continuous_scale="YlGn"
-                    )
-country_fig.add_trace(map_fig.data[0])
-
-country_fig.update_geos(
-    visible=True, resolution=50, scope="world", showcountries=True, countrycolor="Black"
-)
-country_fig.update_geos(projection_type="natural earth")
-country_fig.update_layout(title_text="Rubber Duck Purchase By Country",title_x=0.3,width=1000)
-
-# st.plotly_chart(country_fig, use_container_width=True)
-
-## choropleth showing duck purchase by US state
-
-state_fig = px.choropleth(state_df,locations="Purchase_State", 
-                          locationmode="USA-states", 
-                          color="Quantity", 
-                          scope="usa"
-                        #   color_continuous_scale="YlGn"
-                          )
-state_fig.update_layout(title_text="Rubber Duck Purchase By State",title_x=0.3)
-state_fig.add_trace(map_fig.data[0])
-
-# st.plotly_chart(state_fig, use_container_width=True)
 
+###################### Mapping graphs ##############################
 
 map1,map2 = st.columns(2)
-map1.plotly_chart(country_fig, use_container_width=True,theme=None)
-map2.plotly_chart(state_fig, use_container_width=True,theme=None)
+map1.plotly_chart(country_fig, width="stretch",theme=None)
+map2.plotly_chart(state_fig, width="stretch",theme=None)
 
 ###################### Duck info graphs ##############################
 
 
-st.write(df[["Name","Purchase_City","Purchase_Country","Date_Bought","About Me","Total_Weight","Height","Width","Length"]])
+## full-text search over the flock; narrows this table and the card grid below to the ranked matches
+def new_search():
+    st.session_state.card_page = 1
+
+query = st.text_input("Search the flock", key="duck_query", placeholder="Name, story, city or shop", on_change=new_search)
+listed = listed_positions(signature, query)
+st.write(df.iloc[listed][["Name","Purchase_City","Purchase_Country","Date_Bought","About Me","Total_Weight","Height","Width","Length"]])
 
 # hasClicked = card(
 #   title="Hello World!",
@@ -347,19 +528,46 @@ st.write(df[["Name","Purchase_City","Purchase_Country","Date_Bought","About Me",
 # for i, x in enumerate(cols):
 #     x.selectbox(f"Input # {i}",[1,2,3], key=i)
  
-img_nm = "DuckFamily.jpg"    
-names = [i for i in df['Name']]   
-desc = [i for i in df['About Me']]     
-ducks = len(df['Quantity'])
+###################### Duck cards ##############################
+
+## the grid is drawn a page at a time; the page cursor lives in session state, so paging or searching
+## re-renders only the cards on screen, and each page's content comes from load_card_page's cache
 n_cols=5
-n_rows=int(1+ducks//n_cols)
-rows = [st.columns(n_cols,gap="small") for _ in range(n_rows)]
-cols = [column for row in rows for column in row]
-st.write(n_rows)
-for col,i,d in zip(cols,names,desc):
-    col.image("./img/DuckFamily.jpg")
-    col.subheader(i)
-    col.write(d)
+cards_per_page = 4*n_cols
+n_pages = max(1, -(-len(listed) // cards_per_page))
+
+## widget callbacks run before the rerun, so the cursor is already moved when the page is drawn
+def step_page(step, n_pages):
+    st.session_state.card_page = min(max(st.session_state.card_page + step, 1), n_pages)
+
+def jump_to_duck(signature, per_page, query):
+    position = find_duck(signature, st.session_state.card_search, query)
+    st.session_state.card_match = position
+    if position is not None:
+        st.session_state.card_page = position // per_page + 1
+
+if "card_page" not in st.session_state or st.session_state.card_page > n_pages:
+    st.session_state.card_page = 1
+
+nav = st.columns([4, 1, 1, 1])
+nav[0].text_input("Find a duck", key="card_search", placeholder="Duck name",
+                  on_change=jump_to_duck, args=(signature, cards_per_page, query))
+nav[1].button("Previous", on_click=step_page, args=(-1, n_pages), width="stretch")
+nav[2].number_input("Page", min_value=1, max_value=n_pages, step=1, key="card_page")
+nav[3].button("Next", on_click=step_page, args=(1, n_pages), width="stretch")
+if st.session_state.get("card_search") and st.session_state.get("card_match") is None:
+    nav[0].caption("No duck matches \"{}\"".format(st.session_state.card_search))
+st.caption("Page {} of {} ({} ducks)".format(st.session_state.card_page, n_pages, len(listed)))
+
+cards = load_card_page(signature, st.session_state.card_page - 1, cards_per_page, query)
+for start in range(0, len(cards), n_cols):
+    for col,(image,i,d,like) in zip(st.columns(n_cols,gap="small"), cards[start:start+n_cols]):
+        ## lazily loaded thumbnail instead of re-encoding the full size picture for every card
+        col.markdown(image, unsafe_allow_html=True)
+        col.subheader(i)
+        col.write(d)
+        if like:
+            col.caption("Ducks like me: " + ", ".join(like))
     # with col:
     #     res=card(
     #         title=i,
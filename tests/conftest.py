@@ -0,0 +1,32 @@
+## shared fixtures: the sample workbook's ducks, and a bigger synthetic flock generated from them
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from duck_loader import read_excel_ducks
+from duck_engine import prepare_ducks
+from duck_synth import DuckCatalog, generate_ducks
+
+WORKBOOK = os.path.join(ROOT, "data", "duck_data.xlsx")
+
+
+## the Ducks sheet as read from the workbook (session wide, so tests copy before changing it)
+@pytest.fixture(scope="session")
+def raw_ducks():
+    return read_excel_ducks(WORKBOOK)
+
+
+@pytest.fixture(scope="session")
+def ducks(raw_ducks):
+    return prepare_ducks(raw_ducks)
+
+
+## a few thousand ducks: enough for the clustered / indexed code paths to kick in
+@pytest.fixture(scope="session")
+def flock(raw_ducks):
+    return prepare_ducks(generate_ducks(3000, seed=1, catalog=DuckCatalog(raw_ducks)))
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from duck_cube import DuckCube, build_cube, filter_frame, filtered_tables, filters_active
+from duck_engine import build_aggregates, prepare_ducks
+from duck_store import AggregateStore
+
+
+## the chart tables (build_aggregates also returns its grain, which the cube doesn't)
+CHART_TABLES = ["state_df", "county_df", "purchase_method_df", "buyer_df", "yearly_df", "weight_df", "weight_cum_df"]
+
+
+def assert_same_tables(actual, expected):
+    for name in CHART_TABLES:
+        pd.testing.assert_frame_equal(actual[name].reset_index(drop=True), expected[name].reset_index(drop=True),
+                                      check_exact=False, check_dtype=False, obj=name)
+
+
+def selections(df):
+    methods = df["Purchase_Method"].dropna().unique().tolist()
+    buyers = df["Buyer"].dropna().unique().tolist()
+    return [
+        {},
+        {"years": [2022, 2023]},
+        {"iso": ["USA"]},
+        {"iso": ["ITA", "ISR"], "years": [2000, 2030]},
+        {"methods": methods[:1]},
+        {"buyers": buyers[-1:], "methods": methods},
+        {"iso": ["nowhere"]},
+    ]
+
+
+@pytest.mark.parametrize("frame", ["ducks", "flock"])
+def test_cube_tables_match_filtered_groupbys(request, frame):
+    df = request.getfixturevalue(frame)
+    cube = DuckCube(df)
+    for filters in selections(df):
+        assert_same_tables(cube.tables(filters), build_aggregates(filter_frame(df, filters)))
+
+
+## the sqlite backend (and an append on the xlsx one) builds the cube from the grouped grain instead of the rows
+def test_cube_from_grain(flock):
+    grain = AggregateStore(flock).aggregates()["grain"]
+    from_rows, from_grain = DuckCube(flock), build_cube(grain)
+    for filters in selections(flock):
+        assert_same_tables(from_grain.tables(filters), from_rows.tables(filters))
+
+
+def test_filtered_tables_without_cube(ducks):
+    filters = {"iso": ["USA"], "years": [2023, 2023]}
+    assert_same_tables(filtered_tables(None, ducks, filters), filtered_tables(DuckCube(ducks), ducks, filters))
+
+
+def test_filters_active():
+    assert not filters_active(None)
+    assert not filters_active({"iso": [], "years": None})
+    assert filters_active({"buyers": ["Allan"]})
+
+
+def test_options(ducks):
+    cube = DuckCube(ducks)
+    assert cube.options("ISO_Code") == sorted(ducks["ISO_Code"].dropna().unique())
+
+
+## a duck without a Date_Bought has no year: it counts when no years are picked and drops out when some are
+def test_undated_duck(raw_ducks):
+    raw = raw_ducks.copy()
+    raw.loc[raw.index[0], "Date_Bought"] = None
+    undated = prepare_ducks(raw)
+    from_rows, from_grain = DuckCube(undated), build_cube(AggregateStore(undated).aggregates()["grain"])
+    for filters in selections(undated):
+        expected = build_aggregates(filter_frame(undated, filters))
+        assert_same_tables(from_rows.tables(filters), expected)
+        assert_same_tables(from_grain.tables(filters), expected)
@@ -0,0 +1,93 @@
+import os
+
+import pandas as pd
+import pytest
+
+from duck_extract import export_ducks, extract_frame, partition_keys
+from duck_loader import EXTRACT_MANIFEST, read_ducks, read_manifest
+
+from conftest import WORKBOOK
+
+
+## the sheet as a csv source the tests can edit
+@pytest.fixture
+def source(raw_ducks, tmp_path):
+    path = str(tmp_path / "ducks.csv")
+    raw_ducks.to_csv(path, index=False)
+    return path
+
+
+## blank text cells come back from parquet as None rather than NaN
+def assert_same_extract(actual, expected):
+    def blanks_as_none(frame):
+        return frame.apply(lambda col: col.where(col.notna(), None) if col.dtype == object else col)
+    pd.testing.assert_frame_equal(blanks_as_none(actual), blanks_as_none(expected))
+
+
+def year_of(raw, key):
+    return pd.to_datetime(raw["Date_Bought"]).dt.year == int(key)
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "csv"])
+def test_round_trip(raw_ducks, tmp_path, fmt):
+    out = str(tmp_path / "extract")
+    result = export_ducks(WORKBOOK, out, fmt)
+    expected = extract_frame(raw_ducks)
+    assert result["rows"] == len(expected) and not result["unchanged"]
+    assert_same_extract(read_ducks(out), expected)
+    assert sorted(result["written"]) == sorted(partition_keys(expected).unique())
+
+
+def test_unchanged_export_writes_nothing(source, tmp_path):
+    out = str(tmp_path / "extract")
+    first = export_ducks(source, out)
+    manifest_time = os.stat(os.path.join(out, EXTRACT_MANIFEST)).st_mtime_ns
+    again = export_ducks(source, out)
+    assert again["written"] == [] and sorted(again["unchanged"]) == sorted(first["written"])
+    assert os.stat(os.path.join(out, EXTRACT_MANIFEST)).st_mtime_ns == manifest_time
+
+
+## editing one duck rewrites only its year; the other partition files are left alone
+def test_partial_re_export(source, tmp_path):
+    out = str(tmp_path / "extract")
+    export_ducks(source, out)
+    manifest = read_manifest(out)
+    times = {key: os.stat(os.path.join(out, entry["file"])).st_mtime_ns for key, entry in manifest["partitions"].items()}
+
+    raw = pd.read_csv(source)
+    row = raw.index[year_of(raw, "2022")][0]
+    raw.loc[row, "Quantity"] = raw.loc[row, "Quantity"] + 1
+    raw.to_csv(source, index=False)
+    result = export_ducks(source, out)
+
+    assert result["written"] == ["2022"] and result["removed"] == []
+    for key, entry in read_manifest(out)["partitions"].items():
+        changed = os.stat(os.path.join(out, entry["file"])).st_mtime_ns != times[key]
+        assert changed == (key == "2022")
+    assert read_ducks(out)["Quantity"].sum() == extract_frame(read_ducks(source))["Quantity"].sum()
+
+
+def test_dropped_year_is_removed(source, tmp_path):
+    out = str(tmp_path / "extract")
+    export_ducks(source, out)
+    raw = pd.read_csv(source)
+    raw[~year_of(raw, "2024")].to_csv(source, index=False)
+
+    result = export_ducks(source, out)
+    assert result["removed"] == ["2024"] and result["written"] == []
+    assert not os.path.exists(os.path.join(out, "ducks-2024.parquet"))
+    assert "2024" not in read_manifest(out)["partitions"]
+
+
+def test_format_change_rewrites_everything(source, tmp_path):
+    out = str(tmp_path / "extract")
+    parquet = export_ducks(source, out, "parquet")
+    csv = export_ducks(source, out, "csv")
+    assert sorted(csv["written"]) == sorted(parquet["written"]) and csv["unchanged"] == []
+    assert not [name for name in os.listdir(out) if name.endswith(".parquet")]
+    assert_same_extract(read_ducks(out), extract_frame(read_ducks(source)))
+
+
+def test_unknown_format(source, tmp_path):
+    with pytest.raises(ValueError):
+        export_ducks(source, str(tmp_path / "extract"), "xlsx")
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duck_db import DuckDB, SqlGeoIndex, import_ducks
+from duck_geo import GeoIndex, grid_clusters, haversine_km, radius_box
+
+from conftest import WORKBOOK
+
+GEO_COLUMNS = ["Name", "Latitude", "Longitude", "Purchase_City", "Purchase_Country", "Quantity"]
+
+RADIUS_QUERIES = [(40.7, -74.0, 100), (45, -75, 2000), (0, 179.5, 800), (-1, -179.9, 500), (85, 170, 1500),
+                  (-89, 0, 500), (10, 10, 20000), (51.5, -0.1, 0.5)]
+
+BOX_QUERIES = [(24, -125, 50, -66), (-10, 170, 60, -170), (50, -10, 40, 20), (-90, -180, 90, 180), (10, 10, 10, 10)]
+
+
+## points spread over the whole globe, with a few exactly on the antimeridian and near the poles
+@pytest.fixture(scope="module")
+def world():
+    rng = np.random.default_rng(3)
+    n = 4000
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    lon = rng.uniform(-180, 180, n)
+    lat[:4], lon[:4] = [0, 0, 89.95, -89.95], [180, -180, 10, -170]
+    return pd.DataFrame({"Name": ["duck {}".format(i) for i in range(n)], "Latitude": np.round(lat, 5),
+                         "Longitude": np.round(lon, 5), "Purchase_City": rng.choice(["A", "B", "C"], n),
+                         "Purchase_Country": "X", "Quantity": rng.integers(1, 4, n)})
+
+
+def brute_within(frame, lat, lon, km):
+    distance = haversine_km(lat, lon, frame["Latitude"], frame["Longitude"])
+    inside = np.flatnonzero(distance <= km)
+    return inside[np.lexsort((inside, distance[inside]))].tolist()
+
+
+def brute_box(frame, south, west, north, east):
+    south, north = min(south, north), max(south, north)
+    lat, lon = frame["Latitude"].to_numpy(), frame["Longitude"].to_numpy()
+    inside_lon = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+    return np.flatnonzero((lat >= south) & (lat <= north) & inside_lon).tolist()
+
+
+@pytest.mark.parametrize("query", RADIUS_QUERIES)
+def test_within_matches_brute_force(world, query):
+    matches = GeoIndex(world).within(*query)
+    assert [world.index.get_loc(i) for i in matches.index] == brute_within(world, *query)
+    assert (matches["Distance_km"].diff().dropna() >= 0).all()
+
+
+@pytest.mark.parametrize("query", BOX_QUERIES)
+def test_box_matches_brute_force(world, query):
+    assert [world.index.get_loc(i) for i in GeoIndex(world).box(*query).index] == brute_box(world, *query)
+
+
+## every point inside the radius is inside the bounding box the sqlite backend range-scans
+@pytest.mark.parametrize("query", RADIUS_QUERIES)
+def test_radius_box_covers_circle(world, query):
+    south, north, west, east = radius_box(*query)
+    inside = world.iloc[brute_within(world, *query)]
+    assert inside["Latitude"].between(south, north).all()
+    if west is not None:
+        lon = inside["Longitude"]
+        assert ((lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)).all()
+
+
+def test_unlocated_ducks_are_skipped(world):
+    frame = world.copy()
+    frame.loc[frame.index[:10], "Latitude"] = np.nan
+    assert not set(GeoIndex(frame).box(-90, -180, 90, 180).index) & set(frame.index[:10])
+
+
+def test_city_distances_and_home(ducks):
+    index = GeoIndex(ducks[GEO_COLUMNS])
+    home = index.default_home()
+    cities = index.city_distances(home)
+    assert cities["Ducks"].sum() == ducks.dropna(subset=["Latitude", "Longitude", "Purchase_City"])["Quantity"].fillna(0).sum()
+    assert cities["Distance_km"].is_monotonic_decreasing
+    assert cities["Distance_km"].iloc[-1] < 50
+
+
+def test_grid_clusters_keep_every_duck(world):
+    c = grid_clusters(world["Latitude"], world["Longitude"], world["Quantity"], world["Name"], 8.0)
+    assert c["rows"].sum() == len(world) and c["count"].sum() == world["Quantity"].sum()
+
+
+## the sqlite backend runs the same queries as range scans of its (Latitude, Longitude) index
+@pytest.fixture(scope="module")
+def indexes(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "ducks.sqlite")
+    import_ducks(WORKBOOK, path)
+    db = DuckDB(path)
+    return GeoIndex(db.columns(GEO_COLUMNS)), SqlGeoIndex(db, GEO_COLUMNS)
+
+
+def assert_same_rows(actual, expected):
+    ## (an empty sqlite result has no integer ids to infer the index type from)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_index_type=False)
+
+
+@pytest.mark.parametrize("query", RADIUS_QUERIES)
+def test_sql_within(indexes, query):
+    memory, sql = indexes
+    assert_same_rows(sql.within(*query), memory.within(*query))
+
+
+@pytest.mark.parametrize("query", BOX_QUERIES)
+def test_sql_box(indexes, query):
+    memory, sql = indexes
+    assert_same_rows(sql.box(*query), memory.box(*query))
+
+
+def test_sql_city_distances_and_home(indexes):
+    memory, sql = indexes
+    assert sql.default_home() == pytest.approx(memory.default_home())
+    home = memory.default_home()
+    assert_same_rows(sql.city_distances(home), memory.city_distances(home))
@@ -0,0 +1,49 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from duck_engine import build_kpis, one_year_before
+from duck_kpis import KpiIndex
+
+DAYS = [date(2019, 1, 1), date(2022, 6, 30), date(2023, 3, 1), date(2023, 12, 31), date(2024, 2, 29), date(2040, 1, 1)]
+
+
+@pytest.mark.parametrize("today", DAYS)
+@pytest.mark.parametrize("frame", ["ducks", "flock"])
+def test_kpis_match_full_scan(request, frame, today):
+    df = request.getfixturevalue(frame)
+    assert KpiIndex(df).kpis(today) == pytest.approx(build_kpis(df, today))
+
+
+## a purchase exactly one year back still counts, the day before doesn't
+def test_window_edges():
+    df = pd.DataFrame({
+        "Date_Bought": pd.to_datetime(["2022-06-14", "2022-06-15", "2023-06-15", None]),
+        "Quantity": [1, 2, 4, 8],
+        "Total_Weight": [10.0, 20.0, 40.0, 80.0],
+        "Purchase_Country": ["USA"] * 4,
+        "Purchase_City": ["Boston"] * 4,
+    })
+    index = KpiIndex(df)
+    assert index.kpis(date(2023, 6, 15))["ducks_bought_last_year"] == 6
+    ## undated ducks count in the totals only
+    assert index.kpis(date(2023, 6, 15))["total_ducks"] == 15
+    assert index.window(date(2022, 6, 15), date(2023, 6, 15)) == (2, 20.0)
+    assert index.window(date(2030, 1, 1)) == (0, 0.0)
+    assert index.window(date(2023, 1, 1), date(2022, 1, 1)) == (0, 0.0)
+
+
+def test_one_year_before_leap_day():
+    assert one_year_before(date(2024, 2, 29)) == date(2023, 2, 28)
+    assert one_year_before(date(2024, 3, 1)) == date(2023, 3, 1)
+
+
+## the store indexes per-day sums rather than the ducks; the windows must not change
+def test_from_daily(flock):
+    daily = flock.groupby("Date_Bought")[["Quantity", "Total_Weight"]].sum().reset_index()
+    per_duck = KpiIndex(flock)
+    per_day = KpiIndex.from_daily(daily, per_duck.totals)
+    for today in DAYS:
+        assert per_day.kpis(today) == pytest.approx(per_duck.kpis(today))
+        assert per_day.window(one_year_before(today), today) == pytest.approx(per_duck.window(one_year_before(today), today))
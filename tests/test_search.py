@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from duck_db import DuckDB, SqlSearch, import_ducks
+from duck_search import SEARCH_FIELDS, SearchIndex, tokenize
+
+from conftest import WORKBOOK
+
+QUERIES = ["duck", "du", "pond", "james pond", "new york", "ama", "the duck", "rubber du", "b", "qu", "zzzz", "Duck!"]
+
+
+## ducks with a token starting with every word of the query, in any searched column
+def brute_force(df, text):
+    words = tokenize(text)
+    tokens = [set() for _ in range(len(df))]
+    for column in SEARCH_FIELDS:
+        for position, value in enumerate(df[column].to_numpy()):
+            if value is not None and value == value:
+                tokens[position].update(tokenize(value))
+    return sorted(p for p, have in enumerate(tokens) if all(any(t.startswith(w) for t in have) for w in words))
+
+
+@pytest.fixture(scope="module")
+def index(ducks):
+    return SearchIndex(ducks)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "ducks.sqlite")
+    import_ducks(WORKBOOK, path)
+    return DuckDB(path)
+
+
+@pytest.mark.parametrize("text", QUERIES)
+def test_matches_brute_force(ducks, index, text):
+    assert sorted(index.query(text).tolist()) == brute_force(ducks, text)
+
+
+## the dense path for common prefixes gives the same matches as merging postings
+@pytest.mark.parametrize("text", ["d", "du", "duck", "s", "the", "ro"])
+def test_common_prefixes_on_flock(flock, text):
+    assert sorted(SearchIndex(flock).query(text).tolist()) == brute_force(flock, text)
+
+
+def test_ranking(ducks, index):
+    ranked = index.query("duck")
+    assert len(ranked) == len(set(ranked.tolist()))
+    ## a name hit outranks a hit only in the about me text
+    names = ducks["Name"].astype(str).str.lower()
+    in_name = [p for p in ranked if "duck" in tokenize(names.iloc[p])]
+    about_only = [p for p in ranked if not any(t.startswith("duck") for column in ["Name", "Purchase_City", "Purchase_Retailer"]
+                                                for t in tokenize(ducks[column].iloc[p]))]
+    assert in_name and about_only
+    assert list(ranked).index(in_name[0]) < list(ranked).index(about_only[0])
+
+
+def test_exact_token_outranks_prefix():
+    df = pd.DataFrame({"Name": ["Pondering", "Pond"], "Purchase_City": [None, None], "Purchase_Retailer": [None, None],
+                       "About Me": [None, None]})
+    assert SearchIndex(df).query("pond").tolist() == [1, 0]
+
+
+def test_empty_and_cached(index):
+    assert index.query("") is None and index.query("  !! ") is None
+    assert len(index.query("zzzzqx")) == 0
+    first = index.query("duck pond")
+    assert index.query("duck pond") is first
+    assert not first.flags.writeable
+
+
+## the sqlite backend answers from an fts5 table; same ducks for the same words
+@pytest.mark.parametrize("text", QUERIES)
+def test_sqlite_search_matches(ducks, index, db, text):
+    hits = SqlSearch(db).query(text)
+    expected = ducks["Name"].astype(str).iloc[index.query(text)]
+    assert sorted(db.ducks_at(hits)["Name"].astype(str)) == sorted(expected)
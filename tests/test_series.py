@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from duck_kpis import KpiIndex
+from duck_series import PurchaseSeries, bucket_starts, ROLLING_WINDOWS
+
+## pandas rules for the same calendar buckets: days, weeks starting monday, months starting on the 1st
+PANDAS_RULES = {"D": dict(rule="D"), "W": dict(rule="W-MON", label="left", closed="left"), "M": dict(rule="MS")}
+
+
+def daily_sums(df):
+    dated = df.dropna(subset=["Date_Bought"])
+    return dated.set_index(pd.DatetimeIndex(pd.to_datetime(dated["Date_Bought"])))[["Quantity", "Total_Weight"]].astype(float).sort_index()
+
+
+@pytest.fixture(scope="module", params=["ducks", "flock"])
+def frame(request):
+    return request.getfixturevalue(request.param)
+
+
+@pytest.mark.parametrize("granularity", ["D", "W", "M"])
+def test_resample_matches_pandas(frame, granularity):
+    series = PurchaseSeries(KpiIndex(frame)).resample(granularity)
+    expected = daily_sums(frame).resample(**PANDAS_RULES[granularity]).sum()
+    np.testing.assert_array_equal(series["Date"].to_numpy(), expected.index.to_numpy())
+    np.testing.assert_allclose(series["Quantity"], expected["Quantity"])
+    np.testing.assert_allclose(series["Total_Weight"], expected["Total_Weight"], atol=1e-6)
+    np.testing.assert_allclose(series["Cumulative_Quantity"], expected["Quantity"].cumsum())
+    np.testing.assert_allclose(series["Cumulative_Weight"], expected["Total_Weight"].cumsum(), atol=1e-6)
+
+
+@pytest.mark.parametrize("window", ROLLING_WINDOWS)
+def test_rolling_matches_pandas(frame, window):
+    series = PurchaseSeries(KpiIndex(frame)).rolling(window)
+    expected = daily_sums(frame).resample("D").sum().rolling(window, min_periods=1).sum()
+    np.testing.assert_array_equal(series["Date"].to_numpy(), expected.index.to_numpy())
+    np.testing.assert_allclose(series["Quantity"], expected["Quantity"])
+    np.testing.assert_allclose(series["Total_Weight"], expected["Total_Weight"], atol=1e-6)
+
+
+def test_query_cuts_range(ducks):
+    series = PurchaseSeries(KpiIndex(ducks))
+    cut = series.query("M", start="2023-01-01", end="2023-06-30")
+    assert cut["Date"].min() >= pd.Timestamp("2023-01-01") and cut["Date"].max() <= pd.Timestamp("2023-06-30")
+    assert series.query(window=30).equals(series.rolling(30))
+
+
+def test_bucket_starts():
+    weeks = bucket_starts("2024-01-03", "2024-01-20", "W")
+    assert [str(d) for d in weeks] == ["2024-01-01", "2024-01-08", "2024-01-15"]
+    months = bucket_starts("2023-11-15", "2024-02-01", "M")
+    assert [str(d) for d in months] == ["2023-11-01", "2023-12-01", "2024-01-01", "2024-02-01"]
+    with pytest.raises(ValueError):
+        bucket_starts("2024-01-01", "2024-02-01", "Y")
+
+
+def test_empty_collection():
+    empty = pd.DataFrame({"Date_Bought": pd.to_datetime([]), "Quantity": [], "Total_Weight": [],
+                          "Purchase_Country": [], "Purchase_City": []})
+    series = PurchaseSeries(KpiIndex(empty))
+    assert series.resample("M").empty and series.rolling(30).empty
@@ -0,0 +1,52 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from duck_engine import prepare_ducks
+from duck_kpis import KpiIndex
+from duck_store import AggregateStore, appended_rows, row_hashes
+
+
+def assert_same_tables(actual, expected):
+    for name in expected:
+        if name == "grain":
+            continue
+        pd.testing.assert_frame_equal(actual[name].reset_index(drop=True), expected[name].reset_index(drop=True),
+                                      check_exact=False, obj=name)
+
+
+@pytest.mark.parametrize("split", [1, 40, 125])
+def test_append_matches_full_rebuild(raw_ducks, split):
+    store = AggregateStore(prepare_ducks(raw_ducks.iloc[:split]))
+    store.append(prepare_ducks(raw_ducks.iloc[split:]))
+
+    full = prepare_ducks(raw_ducks)
+    assert store.check(full, today=date(2023, 6, 1))
+    assert_same_tables(store.aggregates(), AggregateStore(full).aggregates())
+
+
+def test_append_to_copy_leaves_original(raw_ducks):
+    store = AggregateStore(prepare_ducks(raw_ducks.iloc[:60]))
+    before = store.aggregates()["yearly_df"].copy()
+    store.copy().append(prepare_ducks(raw_ducks.iloc[60:]))
+    pd.testing.assert_frame_equal(store.aggregates()["yearly_df"], before)
+    assert store.rows == 60
+
+
+def test_appended_rows(raw_ducks):
+    old = row_hashes(raw_ducks.iloc[:100])
+    assert appended_rows(old, raw_ducks).index.tolist() == raw_ducks.index[100:].tolist()
+
+    edited = raw_ducks.copy()
+    edited.loc[edited.index[5], "Name"] = "Renamed"
+    assert appended_rows(old, edited) is None
+    assert appended_rows(old, raw_ducks.iloc[:50]) is None
+
+
+def test_kpi_index_from_running_sums(raw_ducks, ducks):
+    store = AggregateStore(prepare_ducks(raw_ducks.iloc[:70])).append(prepare_ducks(raw_ducks.iloc[70:]))
+    indexed, reference = store.kpi_index(), KpiIndex(ducks)
+    for today in [date(2020, 1, 1), date(2022, 3, 15), date(2030, 1, 1)]:
+        assert indexed.kpis(today) == pytest.approx(reference.kpis(today))
+    assert indexed.window(date(2019, 1, 1), date(2021, 1, 1)) == pytest.approx(reference.window(date(2019, 1, 1), date(2021, 1, 1)))
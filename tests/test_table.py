@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from duck_db import DuckDB, import_ducks
+from duck_table import TableIndex, filter_text, split_filter_part
+
+from conftest import WORKBOOK
+
+
+@pytest.fixture(scope="module")
+def table(ducks):
+    return TableIndex(ducks)
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "ducks.sqlite")
+    import_ducks(WORKBOOK, path)
+    return DuckDB(path)
+
+
+def names(records):
+    return sorted(str(row["Name"]) for row in records)
+
+
+def test_split_filter_part():
+    assert split_filter_part("{Height} >= 10") == ("Height", "ge", 10.0)
+    assert split_filter_part('{Name} contains "Bob"') == ("Name", "contains", "Bob")
+    assert split_filter_part("{Height} > abc") == ("Height", "gt", "abc")
+
+
+def test_filter_text():
+    assert [filter_text(v) for v in (2022.0, 2.5, "abc")] == ["2022", "2.5", "abc"]
+
+
+def test_numeric_filter(table, ducks):
+    rows, _ = table.page(0, 1000, filter_query="{Height} > 10")
+    assert names(rows) == sorted(ducks.loc[ducks["Height"] > 10, "Name"].astype(str))
+
+
+def test_contains_and_combined_filter(table, ducks):
+    rows, _ = table.page(0, 1000, filter_query="{Purchase_Country} contains us && {Total_Weight} <= 50")
+    expected = ducks[ducks["Purchase_Country"].str.contains("us", case=False) & (ducks["Total_Weight"] <= 50)]
+    assert names(rows) == sorted(expected["Name"].astype(str))
+
+
+## a value that isn't a number on a numeric column matches nothing (everything for ne) instead of raising
+@pytest.mark.parametrize("query, expected", [("{Height} > abc", 0), ("{Height} eq abc", 0), ("{Height} ne abc", None)])
+def test_non_numeric_value_on_numeric_column(table, db, query, expected):
+    expected = len(table) if expected is None else expected
+    rows, page_count = table.page(0, 1000, filter_query=query)
+    assert len(rows) == expected and page_count == 1
+    sql_rows, _ = db.page(0, 1000, filter_query=query)
+    assert len(sql_rows) == expected
+
+
+## values that parse as numbers still match as text: a purchase year, and the ducks named with a number
+@pytest.mark.parametrize("query, column, prefix", [("{Date_Bought} datestartswith 2023", "Date_Bought", "2023"),
+                                                   ("{Name} eq 32", "Name", None), ("{Name} contains 3", "Name", None)])
+def test_numeric_looking_text_values(table, db, ducks, query, column, prefix):
+    text = ducks[column].astype(str)
+    if prefix is not None:
+        expected = text.str.startswith(prefix)
+    elif "eq" in query:
+        expected = text == "32"
+    else:
+        expected = text.str.contains("3")
+    rows, _ = table.page(0, 1000, filter_query=query)
+    assert len(rows) == expected.sum() > 0
+    assert names(db.page(0, 1000, filter_query=query)[0]) == names(rows)
+
+
+@pytest.mark.parametrize("query", ["{Height} > 10", "{Purchase_Country} contains ital", "{Date_Bought} datestartswith 2022-0",
+                                   "{Name} eq Spyduck", "{Total_Weight} lt 30 && {Width} ge 5"])
+def test_sqlite_filters_match(table, db, query):
+    assert names(db.page(0, 1000, filter_query=query)[0]) == names(table.page(0, 1000, filter_query=query)[0])
+
+
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+def test_numeric_sort(table, ducks, direction):
+    rows, _ = table.page(0, len(ducks), sort_by=[{"column_id": "Total_Weight", "direction": direction}])
+    weights = [row["Total_Weight"] for row in rows if row["Total_Weight"] is not None]
+    assert weights == sorted(weights, reverse=direction == "desc")
+
+
+def test_text_sort_ignores_case(table):
+    rows, _ = table.page(0, len(table), sort_by=[{"column_id": "Name", "direction": "asc"}])
+    keys = [str(row["Name"] or "").lower() for row in rows]
+    assert keys == sorted(keys)
+
+
+def test_paging(table):
+    first, page_count = table.page(0, 20)
+    last, _ = table.page(page_count - 1, 20)
+    assert page_count == -(-len(table) // 20)
+    assert len(first) == 20 and 0 < len(last) <= 20
+
+
+## search hits keep their rank order unless a sort is picked, and a filter narrows them further
+def test_hits(table):
+    hits = np.array([5, 2, 9, 0])
+    rows, _ = table.page(0, 20, hits=hits)
+    assert [row["Name"] for row in rows] == [table.frame["Name"].iloc[i] for i in hits]
+    rows, _ = table.page(0, 20, sort_by=[{"column_id": "Name", "direction": "asc"}], hits=hits)
+    assert sorted(str(row["Name"]) for row in rows) == sorted(str(table.frame["Name"].iloc[i]) for i in hits)